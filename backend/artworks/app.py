@@ -0,0 +1,509 @@
+'''
+Business: Artwork management - create, read, search and tag-filter artworks, artwork detail pages
+Args: event with httpMethod, body, queryStringParameters; context with request_id
+Returns: HTTP response with artwork data
+'''
+
+import json
+from datetime import datetime
+import os
+from typing import Dict, Any, List, Optional, Tuple
+from psycopg2.extras import RealDictCursor
+from db import get_pool, get_read_connection, consistency_token, prewarm, CONSISTENCY_HEADER
+from metrics import instrumented, dumps
+from admission import admission_controller, admitted, Endpoint, READ, WRITE, HEAVY
+from pagination import wants_page, page_size, decode_cursor, split_page
+from cache import response_cache, cache_key, publish_invalidation
+from responses import header, fingerprint, etag_matches, not_modified, gzip_body, encode_body, compressed
+from views import view_counter
+from encoding import RecordCursor, dumps as encode_json
+from tokens import authenticated, deny_list
+
+ARTWORK_COLUMNS = """
+    a.id, a.user_id, a.title, a.description, a.image_url, a.tags, a.views,
+    a.created_at, a.updated_at, u.username, u.avatar_url as artist_avatar,
+    a.likes_count as likes, a.comments_count as comments, a.hot_score
+"""
+
+ARTWORK_SELECT = "SELECT" + ARTWORK_COLUMNS + """
+    FROM artworks a
+    JOIN users u ON a.user_id = u.id
+"""
+
+# Artwork page in one statement: the artwork and artist repeat on each row of
+# the first comment page (one row with NULL comment columns when there are none)
+ARTWORK_DETAIL = "SELECT" + ARTWORK_COLUMNS + """,
+           u.bio as artist_bio, u.followers_count as artist_followers,
+           EXISTS (SELECT 1 FROM artwork_likes l
+                   WHERE l.artwork_id = a.id AND l.user_id = %(viewer)s) as viewer_liked,
+           EXISTS (SELECT 1 FROM user_follows f
+                   WHERE f.follower_id = %(viewer)s AND f.following_id = a.user_id) as viewer_follows,
+           c.id as comment_id, c.user_id as comment_user_id, c.comment_text,
+           c.created_at as comment_created_at, c.updated_at as comment_updated_at,
+           c.username as comment_username, c.avatar_url as comment_avatar_url
+    FROM artworks a
+    JOIN users u ON a.user_id = u.id
+    LEFT JOIN LATERAL (
+        SELECT c.id, c.user_id, c.comment_text, c.created_at, c.updated_at, cu.username, cu.avatar_url
+        FROM artwork_comments c
+        JOIN users cu ON c.user_id = cu.id
+        WHERE c.artwork_id = a.id
+        ORDER BY c.created_at DESC, c.id DESC
+        LIMIT %(limit)s
+    ) c ON true
+    WHERE a.id = %(id)s
+    ORDER BY c.created_at DESC, c.id DESC
+"""
+
+DETAIL_FIELDS = ('id', 'updated_at', 'likes', 'comments', 'viewer_liked', 'viewer_follows', 'comment_id')
+
+# Ranks the newest SEARCH_CANDIDATES matches so common terms stay cheap and
+# every page comes from the same candidate set, then highlights only the rows
+# of the requested page
+ARTWORK_SEARCH = """
+    WITH q AS (SELECT websearch_to_tsquery('russian', %s) AS query),
+    candidates AS (
+        SELECT a.id, a.search_vector
+        FROM artworks a, q
+        WHERE a.search_vector @@ q.query
+        ORDER BY a.created_at DESC, a.id DESC
+        LIMIT %s
+    ),
+    ranked AS (
+        SELECT c.id, ts_rank_cd(c.search_vector, q.query) AS rank
+        FROM candidates c, q
+    ),
+    page AS (
+        SELECT id, rank FROM ranked
+        WHERE (rank, id) < (%s::real, %s)
+        ORDER BY rank DESC, id DESC
+        LIMIT %s
+    )
+    SELECT""" + ARTWORK_COLUMNS + """, page.rank,
+           ts_headline('russian', a.title, q.query, 'HighlightAll=true, StartSel=<mark>, StopSel=</mark>') as title_highlight,
+           ts_headline('russian', coalesce(a.description, ''), q.query,
+                       'MaxFragments=2, MaxWords=20, MinWords=5, StartSel=<mark>, StopSel=</mark>') as snippet
+    FROM page
+    JOIN artworks a ON a.id = page.id
+    JOIN users u ON a.user_id = u.id
+    CROSS JOIN q
+    ORDER BY page.rank DESC, page.id DESC
+"""
+
+# Same rows as ARTWORK_SELECT without the join, just enough to derive the ETag
+ARTWORK_VERSION_SELECT = """
+    SELECT a.id, a.updated_at, a.likes_count as likes, a.comments_count as comments
+    FROM artworks a
+"""
+
+# views is left out: every write-behind view flush would otherwise change the ETag
+VERSION_FIELDS = ('id', 'updated_at', 'likes', 'comments')
+
+TAG_FACETS = """
+    SELECT tag, count FROM tag_counts
+    WHERE scope = %s AND count > 0
+    ORDER BY count DESC, tag
+    LIMIT %s
+"""
+
+FACET_FIELDS = ('tag', 'count')
+
+# Pushed timeline rows merged with the latest posts of followed popular
+# artists. Popular artists are found by probing the viewer's follow edges
+# for the globally small popular set, so cost does not grow with follows.
+FOLLOWING_FEED = """
+    WITH popular AS (
+        SELECT p.id FROM users p
+        JOIN user_follows f ON f.following_id = p.id AND f.follower_id = %(viewer)s
+        WHERE p.followers_count >= %(fanout_limit)s
+    ),
+    candidates AS (
+        (SELECT artwork_id AS id, created_at FROM artwork_feed
+         WHERE user_id = %(viewer)s AND (created_at, artwork_id) < (%(after_ts)s::timestamp, %(after_id)s)
+         ORDER BY created_at DESC, artwork_id DESC
+         LIMIT %(limit)s)
+        UNION
+        (SELECT recent.id, recent.created_at FROM popular
+         CROSS JOIN LATERAL (
+             SELECT id, created_at FROM artworks
+             WHERE user_id = popular.id AND (created_at, id) < (%(after_ts)s::timestamp, %(after_id)s)
+             ORDER BY created_at DESC, id DESC
+             LIMIT %(limit)s
+         ) recent)
+    ),
+    page AS (
+        SELECT id FROM candidates ORDER BY created_at DESC, id DESC LIMIT %(limit)s
+    )
+    SELECT""" + ARTWORK_COLUMNS + """
+    FROM page
+    JOIN artworks a ON a.id = page.id
+    JOIN users u ON a.user_id = u.id
+    ORDER BY a.created_at DESC, a.id DESC
+"""
+
+# Followers of an artist below the limit get new artworks pushed into artwork_feed
+FEED_FANOUT_LIMIT = int(os.environ.get('FEED_FANOUT_LIMIT', '1000'))
+
+MAX_BULK_IDS = 100
+MAX_FILTER_TAGS = 10
+SEARCH_CANDIDATES = 1000
+DEFAULT_FACETS = 20
+
+# sort=<name> for list pages: keyset column, its row key, cursor cast and parser
+SORTS = {
+    'new': {'column': 'a.created_at', 'key': 'created_at', 'cast': 'timestamp', 'parse': datetime.fromisoformat},
+    'hot': {'column': 'a.hot_score', 'key': 'hot_score', 'cast': 'double precision', 'parse': float},
+    'top': {'column': 'a.likes_count', 'key': 'likes', 'cast': 'integer', 'parse': int},
+}
+
+# window=<name> for sort=top, in days
+TOP_WINDOWS = {'day': 1, 'week': 7, 'month': 30, 'year': 365, 'all': None}
+
+artwork_views = view_counter('artworks')
+
+# Cheap single-item reads outrank list scans and search when the instance is saturated
+admission = admission_controller('artworks', {
+    'item': Endpoint(READ, limit=4, max_wait=1.0),
+    'list': Endpoint(HEAVY, limit=2, max_wait=0.5),
+    'search': Endpoint(HEAVY, limit=1, max_wait=0.5),
+    'write': Endpoint(WRITE, limit=3, max_wait=2.0),
+})
+
+# Planned on each pooled connection during init: the front page, artwork pages and detail pages
+WARM_UP = (
+    (ARTWORK_SELECT + "ORDER BY a.created_at DESC LIMIT 50", None),
+    (ARTWORK_SELECT + "WHERE a.id = %s", (0,)),
+    (ARTWORK_DETAIL, {'id': 0, 'viewer': None, 'limit': 21}),
+)
+
+
+def _artwork_detail(rows: List[Dict[str, Any]], limit: int) -> Dict[str, Any]:
+    first = rows[0]
+    artwork = {key: value for key, value in first.items()
+               if not key.startswith(('comment_', 'viewer_')) and key not in ('artist_bio', 'artist_followers')}
+    comments = [{
+        'id': row['comment_id'],
+        'artwork_id': first['id'],
+        'user_id': row['comment_user_id'],
+        'comment_text': row['comment_text'],
+        'created_at': row['comment_created_at'],
+        'updated_at': row['comment_updated_at'],
+        'username': row['comment_username'],
+        'avatar_url': row['comment_avatar_url'],
+    } for row in rows if row['comment_id'] is not None]
+    items, next_cursor = split_page(comments, limit)
+    
+    return {
+        'artwork': artwork,
+        'artist': {
+            'id': first['user_id'],
+            'username': first['username'],
+            'avatar_url': first['artist_avatar'],
+            'bio': first['artist_bio'],
+            'followers_count': first['artist_followers'],
+        },
+        'comments': {'items': items, 'next_cursor': next_cursor, 'total': first['comments']},
+        'viewer_liked': first['viewer_liked'],
+        'viewer_follows': first['viewer_follows'],
+    }
+
+
+def _tag_condition(params: Dict[str, Any], column: str) -> Optional[Tuple[str, List[str]]]:
+    tags = [tag.strip() for tag in (params.get('tags') or '').split(',') if tag.strip()]
+    if not tags:
+        return None
+    if len(tags) > MAX_FILTER_TAGS:
+        raise ValueError('at most %d tags can be filtered on' % MAX_FILTER_TAGS)
+    tag_mode = params.get('tagMode', 'any')
+    if tag_mode not in ('any', 'all'):
+        raise ValueError('tagMode must be any or all')
+    operator = '&&' if tag_mode == 'any' else '@>'
+    return '%s %s %%s::text[]' % (column, operator), tags
+
+
+def _endpoint(event: Dict[str, Any]) -> str:
+    if event.get('httpMethod') != 'GET':
+        return 'write'
+    params = event.get('queryStringParameters') or {}
+    if params.get('id') or params.get('ids') or params.get('facets'):
+        return 'item'
+    return 'search' if params.get('q') else 'list'
+
+
+def warm_up() -> Dict[str, Any]:
+    profile = prewarm(WARM_UP)
+    profile.update(deny_list.warm_up())
+    return profile
+
+
+@instrumented('artworks', params=('id', 'ids', 'userId', 'viewerId', 'q', 'tags', 'tagMode', 'sort', 'window',
+                                   'feed', 'facets', 'detail', 'cursor', 'limit'))
+@compressed
+@authenticated(('userId',))
+@admitted(admission, _endpoint)
+@consistency_token
+def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
+    method: str = event.get('httpMethod', 'GET')
+    
+    if method == 'GET':
+        pool, conn = get_read_connection(header(event, CONSISTENCY_HEADER))
+    else:
+        pool = get_pool()
+        conn = pool.getconn()
+    
+    try:
+        if method == 'GET':
+            params = event.get('queryStringParameters', {}) or {}
+            artwork_id = params.get('id')
+            user_id = params.get('userId')
+            key = cache_key('artworks', params)
+            if_none_match = header(event, 'If-None-Match')
+            
+            response_cache.sync(conn)
+            # Counted before the cache lookup so hits and 304s are views too
+            if artwork_id and str(artwork_id).isdigit():
+                artwork_views.record(int(artwork_id), header(event, 'X-User-Id'))
+                artwork_views.maybe_flush(get_pool())
+            # A client reading its own write skips cached bodies that predate it
+            cached = None if header(event, CONSISTENCY_HEADER) else response_cache.get(key)
+            if cached is not None:
+                if etag_matches(if_none_match, cached.etag):
+                    return not_modified(cached.etag)
+                return encode_body(event, {
+                    'statusCode': 200,
+                    'headers': {
+                        'Content-Type': 'application/json',
+                        'Access-Control-Allow-Origin': '*',
+                        'ETag': cached.etag,
+                        'X-Cache': 'HIT'
+                    },
+                    'body': cached.body
+                }, cached.gzipped)
+            
+            if artwork_id and params.get('detail'):
+                mode = 'detail'
+            elif artwork_id:
+                mode = 'single'
+            elif params.get('ids'):
+                mode = 'bulk'
+            elif params.get('q'):
+                mode = 'search'
+            elif params.get('facets') == 'tags':
+                mode = 'facets'
+            elif params.get('feed') == 'following':
+                mode = 'following'
+            elif wants_page(params) or params.get('sort'):
+                mode = 'page'
+            else:
+                mode = 'legacy'
+            
+            page_key = 'created_at'
+            try:
+                if mode == 'single':
+                    # Tags use the canonical id: id=007 must be invalidated by artwork:7
+                    query = "WHERE a.id = %s"
+                    args = [int(artwork_id)]
+                    cache_tags = ['artwork:%s' % int(artwork_id)]
+                
+                elif mode == 'detail':
+                    viewer_id = int(params['viewerId']) if params.get('viewerId') else None
+                    limit = page_size(params)
+                    args = {'id': int(artwork_id), 'viewer': viewer_id, 'limit': limit + 1}
+                    # Likes and comments invalidate artwork:<id>; a follow invalidates the follower's feed tag
+                    cache_tags = ['artwork:%s' % int(artwork_id)] + (['feed:%s' % viewer_id] if viewer_id else [])
+                
+                elif mode == 'bulk':
+                    ids = [int(part) for part in params['ids'].split(',') if part]
+                    if not ids or len(ids) > MAX_BULK_IDS:
+                        raise ValueError('ids must list 1 to %d artwork ids' % MAX_BULK_IDS)
+                    query = "WHERE a.id = ANY(%s) ORDER BY a.id"
+                    args = [ids]
+                    cache_tags = ['artwork:%s' % i for i in ids]
+                
+                elif mode == 'search':
+                    limit = page_size(params)
+                    after = decode_cursor(params.get('cursor'), parse=float) or (float('inf'), 0)
+                    page_key = 'rank'
+                    args = [params['q'], SEARCH_CANDIDATES, after[0], after[1], limit + 1]
+                    cache_tags = ['artworks']
+                
+                elif mode == 'facets':
+                    args = ['artworks', page_size(params, default=DEFAULT_FACETS)]
+                    cache_tags = ['tag_counts:artworks']
+                
+                elif mode == 'following':
+                    if not params.get('viewerId'):
+                        raise ValueError('viewerId is required for the following feed')
+                    viewer_id = int(params['viewerId'])
+                    limit = page_size(params)
+                    after = decode_cursor(params.get('cursor')) or ('infinity', 0)
+                    args = {
+                        'viewer': viewer_id,
+                        'fanout_limit': FEED_FANOUT_LIMIT,
+                        'after_ts': after[0],
+                        'after_id': after[1],
+                        'limit': limit + 1,
+                    }
+                    cache_tags = ['artworks', 'feed:%s' % viewer_id]
+                
+                else:
+                    conditions = []
+                    args = []
+                    if user_id:
+                        user_id = int(user_id)
+                        conditions.append("a.user_id = %s")
+                        args.append(user_id)
+                    tag_condition = _tag_condition(params, 'a.tags')
+                    if tag_condition:
+                        conditions.append(tag_condition[0])
+                        args.append(tag_condition[1])
+                    if mode == 'page':
+                        limit = page_size(params)
+                        sort = SORTS.get(params.get('sort') or 'new')
+                        if sort is None:
+                            raise ValueError('sort must be one of: ' + ', '.join(SORTS))
+                        page_key = sort['key']
+                        if params.get('sort') == 'top':
+                            window = params.get('window') or 'week'
+                            if window not in TOP_WINDOWS:
+                                raise ValueError('window must be one of: ' + ', '.join(TOP_WINDOWS))
+                            days = TOP_WINDOWS[window]
+                            if days:
+                                conditions.append("a.created_at > now() - %s * interval '1 day'")
+                                args.append(days)
+                        after = decode_cursor(params.get('cursor'), parse=sort['parse'])
+                        if after:
+                            conditions.append("(%s, a.id) < (%%s::%s, %%s)" % (sort['column'], sort['cast']))
+                            args.extend(after)
+                    
+                    query = "WHERE " + " AND ".join(conditions) if conditions else ""
+                    if mode == 'page':
+                        query += " ORDER BY %s DESC, a.id DESC LIMIT %%s" % sort['column']
+                        args.append(limit + 1)
+                    elif user_id:
+                        query += " ORDER BY a.created_at DESC"
+                    else:
+                        query += " ORDER BY a.created_at DESC LIMIT 50"
+                    cache_tags = ['gallery:%s' % user_id] if user_id else ['artworks']
+            
+            except ValueError as e:
+                return {
+                    'statusCode': 400,
+                    'headers': {
+                        'Content-Type': 'application/json',
+                        'Access-Control-Allow-Origin': '*'
+                    },
+                    'body': dumps({'error': str(e)})
+                }
+            
+            with conn.cursor(cursor_factory=RecordCursor) as cur:
+                if mode == 'search':
+                    cur.execute(ARTWORK_SEARCH, args)
+                elif mode == 'facets':
+                    cur.execute(TAG_FACETS, args)
+                elif mode == 'following':
+                    cur.execute(FOLLOWING_FEED, args)
+                elif mode == 'detail':
+                    cur.execute(ARTWORK_DETAIL, args)
+                else:
+                    if if_none_match:
+                        cur.execute(ARTWORK_VERSION_SELECT + query, args)
+                        etag = fingerprint(cur.fetchall(), VERSION_FIELDS)
+                        if etag_matches(if_none_match, etag):
+                            return not_modified(etag)
+                    cur.execute(ARTWORK_SELECT + query, args)
+                rows = cur.fetchall()
+            
+            if mode in ('single', 'detail'):
+                if not rows:
+                    return {
+                        'statusCode': 404,
+                        'headers': {
+                            'Content-Type': 'application/json',
+                            'Access-Control-Allow-Origin': '*'
+                        },
+                        'body': dumps({'error': 'Artwork not found'})
+                    }
+                payload = _artwork_detail(rows, limit) if mode == 'detail' else rows[0]
+            elif mode == 'bulk':
+                by_id = {row['id']: row for row in rows}
+                payload = [by_id[i] for i in dict.fromkeys(ids) if i in by_id]
+            elif mode == 'facets':
+                payload = rows
+            elif mode in ('search', 'page', 'following'):
+                items, next_cursor = split_page(rows, limit, key=page_key)
+                payload = {'items': items, 'next_cursor': next_cursor}
+            else:
+                payload = rows
+            
+            if mode == 'detail':
+                etag = fingerprint(rows, DETAIL_FIELDS)
+            else:
+                etag = fingerprint(rows, FACET_FIELDS if mode == 'facets' else VERSION_FIELDS)
+            body = encode_json(payload)
+            gzipped = gzip_body(body)
+            response_cache.set(key, body, cache_tags, etag=etag, gzipped=gzipped)
+            if etag_matches(if_none_match, etag):
+                return not_modified(etag)
+            
+            return encode_body(event, {
+                'statusCode': 200,
+                'headers': {
+                    'Content-Type': 'application/json',
+                    'Access-Control-Allow-Origin': '*',
+                    'ETag': etag,
+                    'X-Cache': 'MISS'
+                },
+                'body': body
+            }, gzipped)
+        
+        elif method == 'POST':
+            body_data = json.loads(event.get('body', '{}'))
+            user_id = body_data.get('userId')
+            title = body_data.get('title')
+            description = body_data.get('description', '')
+            image_url = body_data.get('imageUrl')
+            tags = body_data.get('tags', [])
+            
+            with conn.cursor(cursor_factory=RealDictCursor) as cur:
+                cur.execute("""
+                    INSERT INTO artworks (user_id, title, description, image_url, tags)
+                    VALUES (%s, %s, %s, %s, %s)
+                    RETURNING id, user_id, title, description, image_url, tags, created_at
+                """, (user_id, title, description, image_url, tags))
+                
+                artwork = dict(cur.fetchone())
+                cur.execute("""
+                    INSERT INTO artwork_feed (user_id, artwork_id, author_id, created_at)
+                    SELECT f.follower_id, %s, %s, %s
+                    FROM user_follows f
+                    WHERE f.following_id = %s
+                      AND (SELECT followers_count FROM users WHERE id = %s) < %s
+                    ON CONFLICT DO NOTHING
+                """, (artwork['id'], user_id, artwork['created_at'], user_id, user_id, FEED_FANOUT_LIMIT))
+                stale_tags = ['artworks', 'gallery:%s' % artwork['user_id'], 'tag_counts:artworks']
+                publish_invalidation(cur, stale_tags)
+                conn.commit()
+            
+            response_cache.invalidate(stale_tags)
+            
+            return {
+                'statusCode': 201,
+                'headers': {
+                    'Content-Type': 'application/json',
+                    'Access-Control-Allow-Origin': '*'
+                },
+                'body': dumps(artwork, default=str)
+            }
+        
+        return {
+            'statusCode': 405,
+            'headers': {
+                'Content-Type': 'application/json',
+                'Access-Control-Allow-Origin': '*'
+            },
+            'body': dumps({'error': 'Method not allowed'})
+        }
+    
+    finally:
+        pool.putconn(conn)
@@ -0,0 +1,106 @@
+'''
+Business: Shared HTTP response helpers - request headers, ETags, 304 responses, gzip
+Args: gateway event headers, row fingerprints, GZIP_MIN_BYTES and GZIP_LEVEL env vars
+Returns: header values, version tags and ready-made response dicts
+
+Bodies of at least GZIP_MIN_BYTES are gzipped for clients that send
+Accept-Encoding: gzip. The gateway only carries text, so a compressed body
+travels base64-encoded with isBase64Encoded set and is decoded before it
+reaches the client. Vendored into every function that builds conditional
+responses. Keep the copies identical.
+'''
+
+import base64
+import gzip
+import hashlib
+import os
+import time
+from functools import wraps
+from typing import Dict, Any, Callable, Iterable, Optional, Sequence
+from metrics import record_compress
+
+GZIP_MIN_BYTES = int(os.environ.get('GZIP_MIN_BYTES', '1024'))
+GZIP_LEVEL = int(os.environ.get('GZIP_LEVEL', '6'))
+
+
+def header(event: Dict[str, Any], name: str) -> Optional[str]:
+    headers = event.get('headers') or {}
+    lowered = name.lower()
+    for key, value in headers.items():
+        if key.lower() == lowered:
+            return value
+    return None
+
+
+def fingerprint(rows: Iterable[Dict[str, Any]], fields: Sequence[str]) -> str:
+    digest = hashlib.md5(repr([tuple(row[f] for f in fields) for row in rows]).encode())
+    return 'W/"%s"' % digest.hexdigest()
+
+
+def etag_matches(if_none_match: Optional[str], etag: Optional[str]) -> bool:
+    if not if_none_match or not etag:
+        return False
+    candidates = [tag.strip() for tag in if_none_match.split(',')]
+    bare = etag[2:] if etag.startswith('W/') else etag
+    return '*' in candidates or any(
+        (tag[2:] if tag.startswith('W/') else tag) == bare for tag in candidates
+    )
+
+
+def not_modified(etag: str) -> Dict[str, Any]:
+    return {
+        'statusCode': 304,
+        'headers': {
+            'ETag': etag,
+            'Access-Control-Allow-Origin': '*'
+        },
+        'body': ''
+    }
+
+
+def accepts_gzip(event: Dict[str, Any]) -> bool:
+    accept_encoding = header(event, 'Accept-Encoding')
+    if not accept_encoding:
+        return False
+    for coding in accept_encoding.lower().split(','):
+        name, _, params = coding.strip().partition(';')
+        if name.strip() in ('gzip', '*'):
+            quality = params.strip()
+            if quality.startswith('q='):
+                try:
+                    return float(quality[2:]) > 0
+                except ValueError:
+                    return False
+            return True
+    return False
+
+
+def gzip_body(body: str) -> Optional[str]:
+    if len(body) < GZIP_MIN_BYTES:
+        return None
+    started = time.perf_counter()
+    # mtime=0 keeps the output stable for identical bodies
+    compressed = base64.b64encode(gzip.compress(body.encode(), GZIP_LEVEL, mtime=0)).decode('ascii')
+    record_compress((time.perf_counter() - started) * 1000)
+    return compressed
+
+
+def encode_body(event: Dict[str, Any], response: Dict[str, Any], gzipped: Optional[str] = None) -> Dict[str, Any]:
+    body = response.get('body')
+    if response.get('isBase64Encoded') or not isinstance(body, str) or len(body) < GZIP_MIN_BYTES:
+        return response
+    headers = response.setdefault('headers', {})
+    headers['Vary'] = 'Accept-Encoding'
+    if not accepts_gzip(event):
+        return response
+    response['body'] = gzipped or gzip_body(body)
+    response['isBase64Encoded'] = True
+    headers['Content-Encoding'] = 'gzip'
+    return response
+
+
+def compressed(handler: Callable[..., Dict[str, Any]]) -> Callable[..., Dict[str, Any]]:
+    @wraps(handler)
+    def wrapper(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
+        return encode_body(event, handler(event, context))
+    return wrapper
@@ -0,0 +1,188 @@
+'''
+Business: Write-behind view counting for single-item GETs
+Args: VIEW_FLUSH_INTERVAL, VIEW_FLUSH_THRESHOLD, VIEW_MAX_PENDING, VIEW_DEDUP_SECONDS env vars
+Returns: views increments applied with one batched UPDATE per flush
+
+Views are buffered per warm instance and written at most once per
+VIEW_FLUSH_INTERVAL (or as soon as VIEW_FLUSH_THRESHOLD increments are
+pending) by a background thread with its own pooled connection, so readers
+never take a row lock or wait for a second connection. Whatever is pending when an
+instance dies is lost: snapshot()['pending'] is that exposure right now, and
+each flush logs the peak it reached. Vendored into every function that counts
+views. Keep the copies identical.
+'''
+
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Any, Optional, Tuple
+import psycopg2
+from psycopg2.extras import execute_values
+from db import PoolTimeout
+
+LOG_ENABLED = os.environ.get('METRICS_LOG', '1') != '0'
+
+
+class ViewCounter:
+    def __init__(self, table: str, flush_interval: float, flush_threshold: int,
+                 max_pending: int, dedup_seconds: float, dedup_max_entries: int = 100000):
+        self.table = table
+        self.flush_interval = flush_interval
+        self.flush_threshold = flush_threshold
+        self.max_pending = max_pending
+        self.dedup_seconds = dedup_seconds
+        self.dedup_max_entries = dedup_max_entries
+        self._pending: Dict[int, int] = {}
+        self._pending_total = 0
+        self._peak_pending = 0
+        self._seen: 'OrderedDict[Tuple[int, str], float]' = OrderedDict()
+        self._lock = threading.Lock()
+        self._flushing = False
+        self._flushed_at = time.monotonic()
+        self.stats: Dict[str, int] = {
+            'recorded': 0,
+            'deduplicated': 0,
+            'flushed': 0,
+            'flushes': 0,
+            'failed_flushes': 0,
+            'dropped': 0,
+        }
+
+    def record(self, item_id: int, viewer: Optional[str] = None) -> bool:
+        now = time.monotonic()
+        with self._lock:
+            if viewer and self.dedup_seconds > 0:
+                seen_key = (item_id, viewer)
+                seen_at = self._seen.get(seen_key)
+                if seen_at is not None and now - seen_at < self.dedup_seconds:
+                    self.stats['deduplicated'] += 1
+                    return False
+                self._seen[seen_key] = now
+                self._seen.move_to_end(seen_key)
+                while len(self._seen) > self.dedup_max_entries:
+                    self._seen.popitem(last=False)
+
+            if self._pending_total >= self.max_pending:
+                self.stats['dropped'] += 1
+                return False
+            self._pending[item_id] = self._pending.get(item_id, 0) + 1
+            self._pending_total += 1
+            self._peak_pending = max(self._peak_pending, self._pending_total)
+            self.stats['recorded'] += 1
+            return True
+
+    def _due(self) -> bool:
+        return bool(self._pending_total) and (
+            self._pending_total >= self.flush_threshold
+            or time.monotonic() - self._flushed_at >= self.flush_interval
+        )
+
+    def due(self) -> bool:
+        with self._lock:
+            return self._due()
+
+    def maybe_flush(self, pool: Any) -> bool:
+        # Runs on the request path while the handler holds a connection: claim the flush and write elsewhere
+        with self._lock:
+            if self._flushing or not self._due():
+                return False
+            self._flushing = True
+        threading.Thread(target=self._flush_from_pool, args=(pool,),
+                         name='views-flush-' + self.table, daemon=True).start()
+        return True
+
+    def _flush_from_pool(self, pool: Any) -> None:
+        try:
+            conn = pool.getconn()
+        except (PoolTimeout, psycopg2.Error):
+            with self._lock:
+                self.stats['failed_flushes'] += 1
+                self._flushing = False
+            # Retry after another interval rather than on every request
+            self._flushed_at = time.monotonic()
+            return
+        try:
+            self._write(conn)
+        finally:
+            pool.putconn(conn)
+            with self._lock:
+                self._flushing = False
+
+    def flush(self, conn: Any) -> int:
+        with self._lock:
+            if self._flushing:
+                return 0
+            self._flushing = True
+        try:
+            return self._write(conn)
+        finally:
+            with self._lock:
+                self._flushing = False
+
+    def _write(self, conn: Any) -> int:
+        with self._lock:
+            if not self._pending:
+                return 0
+            batch, self._pending = self._pending, {}
+            total, self._pending_total = self._pending_total, 0
+            peak, self._peak_pending = self._peak_pending, 0
+
+        started = time.perf_counter()
+        try:
+            with conn.cursor() as cur:
+                # Sorted ids keep concurrent instances locking rows in the same order
+                execute_values(cur, """
+                    UPDATE """ + self.table + """ t SET views = t.views + v.n
+                    FROM (VALUES %s) AS v(id, n)
+                    WHERE t.id = v.id
+                """, sorted(batch.items()))
+            conn.commit()
+        except psycopg2.Error:
+            conn.rollback()
+            with self._lock:
+                self.stats['failed_flushes'] += 1
+                for item_id, n in batch.items():
+                    self._pending[item_id] = self._pending.get(item_id, 0) + n
+                self._pending_total += total
+                self._peak_pending = max(self._peak_pending, peak, self._pending_total)
+            self._flushed_at = time.monotonic()
+            return 0
+
+        with self._lock:
+            self.stats['flushed'] += total
+            self.stats['flushes'] += 1
+        self._flushed_at = time.monotonic()
+
+        if LOG_ENABLED:
+            print(json.dumps({
+                'metric': 'views_flush',
+                'table': self.table,
+                'items': len(batch),
+                'increments': total,
+                'peak_pending': peak,
+                'dropped': self.stats['dropped'],
+                'flush_ms': round((time.perf_counter() - started) * 1000, 3),
+            }), flush=True)
+        return total
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return dict(
+                self.stats,
+                pending=self._pending_total,
+                pending_items=len(self._pending),
+                peak_pending=self._peak_pending,
+                dedup_entries=len(self._seen),
+            )
+
+
+def view_counter(table: str) -> ViewCounter:
+    return ViewCounter(
+        table,
+        flush_interval=float(os.environ.get('VIEW_FLUSH_INTERVAL', '10')),
+        flush_threshold=int(os.environ.get('VIEW_FLUSH_THRESHOLD', '500')),
+        max_pending=int(os.environ.get('VIEW_MAX_PENDING', '100000')),
+        dedup_seconds=float(os.environ.get('VIEW_DEDUP_SECONDS', '1800')),
+    )
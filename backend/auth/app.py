@@ -0,0 +1,207 @@
+'''
+Business: Authentication and user management
+Args: event with httpMethod, body, queryStringParameters; context with request_id
+Returns: HTTP response with user data or auth tokens
+'''
+
+import json
+import hashlib
+from typing import Dict, Any
+from psycopg2.extras import RealDictCursor
+from db import get_pool, get_read_connection, consistency_token, prewarm, CONSISTENCY_HEADER
+from metrics import instrumented, dumps
+from admission import admission_controller, admitted, Endpoint, CRITICAL, READ, WRITE
+from responses import header, fingerprint, etag_matches, not_modified, compressed
+from tokens import issue_token, request_token, verify_token, revoke, TOKEN_TTL
+
+# Login stays responsive while registrations and profile reads back off
+admission = admission_controller('auth', {
+    'login': Endpoint(CRITICAL, limit=4, max_wait=2.0),
+    'profile': Endpoint(READ, limit=4, max_wait=1.0),
+    'write': Endpoint(WRITE, limit=2, max_wait=2.0),
+})
+
+LOGIN_SELECT = "SELECT id, email, username, avatar_url, bio, role, created_at FROM users WHERE email = %s AND password_hash = %s"
+
+PROFILE_SELECT = "SELECT id, email, username, avatar_url, bio, role, created_at, updated_at FROM users WHERE id = %s"
+
+# Planned on each pooled connection during init so the first login is not the one paying for it
+WARM_UP = (
+    (LOGIN_SELECT, ('', '')),
+    (PROFILE_SELECT, (0,)),
+)
+
+
+def hash_password(password: str) -> str:
+    return hashlib.sha256(password.encode()).hexdigest()
+
+def _endpoint(event: Dict[str, Any]) -> str:
+    if event.get('httpMethod') == 'GET':
+        return 'profile'
+    try:
+        action = json.loads(event.get('body') or '{}').get('action')
+    except (ValueError, AttributeError):
+        action = None
+    return 'login' if action == 'login' else 'write'
+
+def warm_up() -> Dict[str, Any]:
+    return prewarm(WARM_UP)
+
+@instrumented('auth', actions=('register', 'login', 'logout'), params=('userId',))
+@compressed
+@admitted(admission, _endpoint)
+@consistency_token
+def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
+    method: str = event.get('httpMethod', 'GET')
+    
+    if method == 'GET':
+        pool, conn = get_read_connection(header(event, CONSISTENCY_HEADER))
+    else:
+        pool = get_pool()
+        conn = pool.getconn()
+    
+    try:
+        if method == 'POST':
+            body_data = json.loads(event.get('body', '{}'))
+            action = body_data.get('action')
+            
+            if action == 'register':
+                email = body_data.get('email')
+                password = body_data.get('password')
+                username = body_data.get('username')
+                
+                password_hash = hash_password(password)
+                
+                with conn.cursor(cursor_factory=RealDictCursor) as cur:
+                    cur.execute(
+                        "INSERT INTO users (email, password_hash, username) VALUES (%s, %s, %s) RETURNING id, email, username, role, created_at",
+                        (email, password_hash, username)
+                    )
+                    user = dict(cur.fetchone())
+                    # Before the commit: without a signing secret the registration rolls back instead of sticking
+                    token = issue_token(user['id'], user['role'])
+                    conn.commit()
+                
+                return {
+                    'statusCode': 201,
+                    'headers': {
+                        'Content-Type': 'application/json',
+                        'Access-Control-Allow-Origin': '*'
+                    },
+                    'body': dumps({
+                        'user': user,
+                        'token': token,
+                        'expires_in': TOKEN_TTL
+                    }, default=str)
+                }
+            
+            elif action == 'login':
+                email = body_data.get('email')
+                password = body_data.get('password')
+                
+                password_hash = hash_password(password)
+                
+                with conn.cursor(cursor_factory=RealDictCursor) as cur:
+                    cur.execute(LOGIN_SELECT, (email, password_hash))
+                    user = cur.fetchone()
+                    
+                    if not user:
+                        return {
+                            'statusCode': 401,
+                            'headers': {
+                                'Content-Type': 'application/json',
+                                'Access-Control-Allow-Origin': '*'
+                            },
+                            'body': dumps({'error': 'Invalid credentials'})
+                        }
+                    
+                    user = dict(user)
+                
+                token = issue_token(user['id'], user['role'])
+                
+                return {
+                    'statusCode': 200,
+                    'headers': {
+                        'Content-Type': 'application/json',
+                        'Access-Control-Allow-Origin': '*'
+                    },
+                    'body': dumps({
+                        'user': user,
+                        'token': token,
+                        'expires_in': TOKEN_TTL
+                    }, default=str)
+                }
+        
+            elif action == 'logout':
+                token = request_token(event)
+                claims = verify_token(token) if token else None
+                
+                if not claims:
+                    return {
+                        'statusCode': 401,
+                        'headers': {
+                            'Content-Type': 'application/json',
+                            'Access-Control-Allow-Origin': '*'
+                        },
+                        'body': dumps({'error': 'Invalid or expired token'})
+                    }
+                
+                with conn.cursor() as cur:
+                    # everywhere=true also revokes every other token issued to the user so far
+                    revoke(cur, claims, everywhere=bool(body_data.get('everywhere')))
+                    conn.commit()
+                
+                return {
+                    'statusCode': 200,
+                    'headers': {
+                        'Content-Type': 'application/json',
+                        'Access-Control-Allow-Origin': '*'
+                    },
+                    'body': dumps({'revoked': True})
+                }
+        
+        elif method == 'GET':
+            user_id = (event.get('queryStringParameters') or {}).get('userId')
+            
+            if user_id:
+                with conn.cursor(cursor_factory=RealDictCursor) as cur:
+                    cur.execute(PROFILE_SELECT, (user_id,))
+                    user = cur.fetchone()
+                    
+                    if not user:
+                        return {
+                            'statusCode': 404,
+                            'headers': {
+                                'Content-Type': 'application/json',
+                                'Access-Control-Allow-Origin': '*'
+                            },
+                            'body': dumps({'error': 'User not found'})
+                        }
+                    
+                    user = dict(user)
+                    etag = fingerprint([user], ('id', 'updated_at'))
+                    if etag_matches(header(event, 'If-None-Match'), etag):
+                        return not_modified(etag)
+                    del user['updated_at']
+                    
+                    return {
+                        'statusCode': 200,
+                        'headers': {
+                            'Content-Type': 'application/json',
+                            'Access-Control-Allow-Origin': '*',
+                            'ETag': etag
+                        },
+                        'body': dumps(user, default=str)
+                    }
+        
+        return {
+            'statusCode': 400,
+            'headers': {
+                'Content-Type': 'application/json',
+                'Access-Control-Allow-Origin': '*'
+            },
+            'body': dumps({'error': 'Invalid request'})
+        }
+    
+    finally:
+        pool.putconn(conn)
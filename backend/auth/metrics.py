@@ -0,0 +1,279 @@
+'''
+Business: Per-invocation performance instrumentation for function handlers
+Args: METRICS_LOG env var ("0" silences the structured log line), METRICS_CAPTURE_SQL ("1" keeps bound statements)
+Returns: one JSON log line per request and in-process latency histograms
+
+Records connect time, every SQL statement's duration and row count,
+serialization time and response size, tagged with context.request_id and
+the action name (one of the handler's known actions or parameter names,
+"other" for anything else, so clients cannot mint histograms). Vendored into every function directory. Keep the copies identical.
+'''
+
+import json
+import math
+import os
+import threading
+import time
+from functools import wraps
+from typing import Dict, Any, Callable, FrozenSet, Iterable, List, Optional
+import psycopg2.extensions
+
+LOG_ENABLED = os.environ.get('METRICS_LOG', '1') != '0'
+SQL_PREVIEW_CHARS = 120
+CAPTURE_STATEMENTS = os.environ.get('METRICS_CAPTURE_SQL', '0') == '1'
+
+
+class Histogram:
+    GROWTH = 1.1
+    FLOOR = 0.001
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self._buckets: Dict[int, int] = {}
+        self._lock = threading.Lock()
+
+    def record(self, value: float) -> None:
+        bucket = int(math.ceil(math.log(value / self.FLOOR, self.GROWTH))) if value > self.FLOOR else 0
+        with self._lock:
+            self.count += 1
+            self.total += value
+            self.max = max(self.max, value)
+            self._buckets[bucket] = self._buckets.get(bucket, 0) + 1
+
+    def percentile(self, p: float) -> float:
+        with self._lock:
+            if not self.count:
+                return 0.0
+            rank = p / 100.0 * self.count
+            seen = 0
+            for bucket in sorted(self._buckets):
+                seen += self._buckets[bucket]
+                if seen >= rank:
+                    return min(self.FLOOR * self.GROWTH ** bucket, self.max)
+            return self.max
+
+    def summary(self) -> Dict[str, float]:
+        return {
+            'count': self.count,
+            'mean': round(self.total / self.count, 3) if self.count else 0.0,
+            'p50': round(self.percentile(50), 3),
+            'p95': round(self.percentile(95), 3),
+            'p99': round(self.percentile(99), 3),
+            'max': round(self.max, 3),
+        }
+
+
+class RequestMetrics:
+    def __init__(self, function: str, action: str, request_id: Optional[str]):
+        self.function = function
+        self.action = action
+        self.request_id = request_id
+        self.connect_ms = 0.0
+        self.pool_wait_ms = 0.0
+        self.serialize_ms = 0.0
+        self.compress_ms = 0.0
+        self.admission: Optional[str] = None
+        self.admission_wait_ms = 0.0
+        self.queries: List[Dict[str, Any]] = []
+
+
+_local = threading.local()
+_histograms: Dict[str, Histogram] = {}
+_histograms_lock = threading.Lock()
+_listeners: List[Callable[[RequestMetrics], None]] = []
+
+
+def current() -> Optional[RequestMetrics]:
+    return getattr(_local, 'metrics', None)
+
+
+def histogram(name: str) -> Histogram:
+    hist = _histograms.get(name)
+    if hist is None:
+        with _histograms_lock:
+            hist = _histograms.setdefault(name, Histogram())
+    return hist
+
+
+def snapshot() -> Dict[str, Dict[str, float]]:
+    return {name: hist.summary() for name, hist in sorted(_histograms.items())}
+
+
+def reset() -> None:
+    with _histograms_lock:
+        _histograms.clear()
+
+
+def add_listener(callback: Callable[[RequestMetrics], None]) -> None:
+    _listeners.append(callback)
+
+
+def record_connect(elapsed_ms: float) -> None:
+    metrics = current()
+    if metrics is not None:
+        metrics.connect_ms += elapsed_ms
+
+
+def record_pool_wait(elapsed_ms: float) -> None:
+    metrics = current()
+    if metrics is not None:
+        metrics.pool_wait_ms += elapsed_ms
+
+
+def record_compress(elapsed_ms: float) -> None:
+    metrics = current()
+    if metrics is not None:
+        metrics.compress_ms += elapsed_ms
+
+
+def record_admission(endpoint: str, outcome: str, wait_ms: float) -> None:
+    metrics = current()
+    if metrics is not None:
+        metrics.admission = '%s:%s' % (endpoint, outcome)
+        metrics.admission_wait_ms += wait_ms
+
+
+def dumps(obj: Any, **kwargs: Any) -> str:
+    started = time.perf_counter()
+    body = json.dumps(obj, **kwargs)
+    metrics = current()
+    if metrics is not None:
+        metrics.serialize_ms += (time.perf_counter() - started) * 1000
+    return body
+
+
+class _TimedCursorMixin:
+    def execute(self, query: Any, vars: Any = None) -> Any:
+        started = time.perf_counter()
+        try:
+            return super().execute(query, vars)
+        finally:
+            _record_query(query, started, self.rowcount, self.query if CAPTURE_STATEMENTS else None)
+
+    def executemany(self, query: Any, vars_list: Any) -> Any:
+        started = time.perf_counter()
+        try:
+            return super().executemany(query, vars_list)
+        finally:
+            _record_query(query, started, self.rowcount, self.query if CAPTURE_STATEMENTS else None)
+
+
+def _record_query(query: Any, started: float, rowcount: int, statement: Optional[bytes] = None) -> None:
+    metrics = current()
+    if metrics is None:
+        return
+    if isinstance(query, bytes):
+        query = query.decode('utf-8', 'replace')
+    entry = {
+        'sql': ' '.join(str(query).split())[:SQL_PREVIEW_CHARS],
+        'ms': round((time.perf_counter() - started) * 1000, 3),
+        'rows': rowcount,
+    }
+    if statement is not None:
+        entry['statement'] = statement.decode('utf-8', 'replace')
+    metrics.queries.append(entry)
+
+
+_timed_factories: Dict[type, type] = {}
+
+
+def _timed(factory: type) -> type:
+    timed = _timed_factories.get(factory)
+    if timed is None:
+        timed = type('Timed' + factory.__name__, (_TimedCursorMixin, factory), {})
+        _timed_factories[factory] = timed
+    return timed
+
+
+class InstrumentedConnection(psycopg2.extensions.connection):
+    def cursor(self, *args: Any, **kwargs: Any) -> Any:
+        factory = kwargs.get('cursor_factory') or self.cursor_factory or psycopg2.extensions.cursor
+        kwargs['cursor_factory'] = _timed(factory)
+        return super().cursor(*args, **kwargs)
+
+
+METHODS = ('GET', 'POST', 'PUT', 'DELETE', 'OPTIONS')
+
+
+def _action_name(event: Dict[str, Any], actions: FrozenSet[str], params: FrozenSet[str]) -> str:
+    # Histograms are kept per name, so names come from the handler's known actions and parameters only
+    method = event.get('httpMethod', 'GET')
+    if method not in METHODS:
+        return 'other'
+    if method == 'GET':
+        query = event.get('queryStringParameters') or {}
+        known = sorted(name for name in query if name in params) if isinstance(query, dict) else []
+        return 'GET' + ('?' + ','.join(known) if known else '')
+    try:
+        body = json.loads(event.get('body') or '{}')
+    except ValueError:
+        return method
+    if isinstance(body, dict):
+        if 'actions' in body:
+            return method + ':batch'
+        action = body.get('action')
+        if action:
+            return '%s:%s' % (method, action if isinstance(action, str) and action in actions else 'other')
+    return method
+
+
+def instrumented(function: str, actions: Iterable[str] = (),
+                 params: Iterable[str] = ()) -> Callable[[Callable[..., Dict[str, Any]]], Callable[..., Dict[str, Any]]]:
+    known_actions, known_params = frozenset(actions), frozenset(params)
+
+    def decorate(handler: Callable[..., Dict[str, Any]]) -> Callable[..., Dict[str, Any]]:
+        @wraps(handler)
+        def wrapper(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
+            metrics = RequestMetrics(function, _action_name(event, known_actions, known_params),
+                                     getattr(context, 'request_id', None))
+            _local.metrics = metrics
+            started = time.perf_counter()
+            status = 500
+            response: Dict[str, Any] = {}
+            try:
+                response = handler(event, context)
+                status = response.get('statusCode', 200)
+                return response
+            finally:
+                _local.metrics = None
+                _finish(metrics, (time.perf_counter() - started) * 1000, status, response)
+        return wrapper
+    return decorate
+
+
+def _finish(metrics: RequestMetrics, total_ms: float, status: int, response: Dict[str, Any]) -> None:
+    query_ms = sum(q['ms'] for q in metrics.queries)
+    response_bytes = len(response.get('body') or '')
+    prefix = '%s.%s.' % (metrics.function, metrics.action)
+    histogram(prefix + 'total_ms').record(total_ms)
+    histogram(prefix + 'connect_ms').record(metrics.connect_ms)
+    histogram(prefix + 'admission_wait_ms').record(metrics.admission_wait_ms)
+    histogram(prefix + 'query_ms').record(query_ms)
+    histogram(prefix + 'queries').record(len(metrics.queries))
+    histogram(prefix + 'serialize_ms').record(metrics.serialize_ms)
+    histogram(prefix + 'compress_ms').record(metrics.compress_ms)
+    histogram(prefix + 'response_bytes').record(response_bytes)
+    for callback in _listeners:
+        callback(metrics)
+
+    if LOG_ENABLED:
+        print(json.dumps({
+            'metric': 'request',
+            'function': metrics.function,
+            'action': metrics.action,
+            'request_id': metrics.request_id,
+            'status': status,
+            'total_ms': round(total_ms, 3),
+            'connect_ms': round(metrics.connect_ms, 3),
+            'pool_wait_ms': round(metrics.pool_wait_ms, 3),
+            'admission': metrics.admission,
+            'admission_wait_ms': round(metrics.admission_wait_ms, 3),
+            'query_count': len(metrics.queries),
+            'query_ms': round(query_ms, 3),
+            'serialize_ms': round(metrics.serialize_ms, 3),
+            'compress_ms': round(metrics.compress_ms, 3),
+            'response_bytes': response_bytes,
+            'queries': metrics.queries,
+        }, default=str), flush=True)
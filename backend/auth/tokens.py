@@ -0,0 +1,257 @@
+'''
+Business: Signed, expiring session tokens that every function verifies in-process
+Args: AUTH_TOKEN_SECRETS (comma-separated; the first signs, all verify), AUTH_TOKEN_TTL_SECONDS,
+      AUTH_REQUIRED, AUTH_DENY_REFRESH_SECONDS env vars
+Returns: tokens from issue_token(), Claims from verify_token(), the authenticated() handler decorator
+
+A token is v1.<user id>.<role>.<issued at>.<expires at>.<token id>.<HMAC-SHA256>,
+so checking one is a string split, one HMAC and a set lookup with no
+database round trip. Revocations (logout, logout everywhere) go to
+revoked_tokens until the tokens they cover would have expired anyway. Each
+warm instance keeps that table in memory: it loads it during init and reloads
+it on a background thread at most once per AUTH_DENY_REFRESH_SECONDS. A
+revoked token can therefore still pass on another instance for that long.
+
+authenticated() rejects requests whose token is bad or names another user
+than the body's acting-user fields. With AUTH_REQUIRED=1 it also rejects
+requests that name an acting user without a token. Vendored into every HTTP
+function. Keep the copies identical.
+'''
+
+import base64
+import hashlib
+import hmac
+import json
+import os
+import re
+import secrets
+import threading
+import time
+from functools import wraps
+from typing import Dict, Any, Callable, Iterable, List, NamedTuple, Optional, Set, Tuple
+import psycopg2
+from db import get_pool, PoolTimeout
+from responses import header
+
+TOKEN_VERSION = 'v1'
+TOKEN_SECRETS = [s.strip().encode() for s in os.environ.get('AUTH_TOKEN_SECRETS', '').split(',') if s.strip()]
+TOKEN_TTL = int(os.environ.get('AUTH_TOKEN_TTL_SECONDS', str(7 * 24 * 3600)))
+AUTH_REQUIRED = os.environ.get('AUTH_REQUIRED', '0') == '1'
+ROLE_PATTERN = re.compile(r'^[a-z_]{1,20}$')
+
+
+class Claims(NamedTuple):
+    user_id: int
+    role: str
+    issued_at: int
+    expires_at: int
+    token_id: str
+
+
+def _sign(secret: bytes, payload: str) -> str:
+    digest = hmac.new(secret, payload.encode(), hashlib.sha256).digest()
+    return base64.urlsafe_b64encode(digest).rstrip(b'=').decode()
+
+
+def issue_token(user_id: int, role: Optional[str] = None, ttl: int = TOKEN_TTL) -> str:
+    if not TOKEN_SECRETS:
+        raise RuntimeError('AUTH_TOKEN_SECRETS is not set')
+    role = role or 'user'
+    if not ROLE_PATTERN.match(role):
+        raise ValueError('Unsupported role %r' % role)
+    now = int(time.time())
+    payload = '%s.%d.%s.%d.%d.%s' % (TOKEN_VERSION, user_id, role, now, now + ttl, secrets.token_hex(8))
+    return payload + '.' + _sign(TOKEN_SECRETS[0], payload)
+
+
+def decode_token(token: str, now: Optional[float] = None) -> Optional[Claims]:
+    payload, _, signature = token.rpartition('.')
+    parts = payload.split('.')
+    if len(parts) != 6 or parts[0] != TOKEN_VERSION:
+        return None
+    signature_bytes = signature.encode()
+    if not any(hmac.compare_digest(_sign(secret, payload).encode(), signature_bytes) for secret in TOKEN_SECRETS):
+        return None
+    try:
+        claims = Claims(int(parts[1]), parts[2], int(parts[3]), int(parts[4]), parts[5])
+    except ValueError:
+        return None
+    if claims.expires_at <= (time.time() if now is None else now):
+        return None
+    return claims
+
+
+class DenyList:
+    def __init__(self, refresh_interval: float):
+        self.refresh_interval = refresh_interval
+        self._token_ids: Set[str] = set()
+        self._user_cutoffs: Dict[int, int] = {}
+        self._loaded_at: Optional[float] = None
+        self._refreshing = False
+        self._lock = threading.Lock()
+        self.stats: Dict[str, int] = {
+            'loads': 0,
+            'failed_loads': 0,
+            'denied': 0,
+        }
+
+    def denies(self, claims: Claims) -> bool:
+        # Cutoffs are floored to whole seconds like issued_at: a token from the logout's own second survives
+        if claims.token_id in self._token_ids or claims.issued_at < self._user_cutoffs.get(claims.user_id, -1):
+            self.stats['denied'] += 1
+            return True
+        return False
+
+    def add(self, token_id: Optional[str], user_id: int, revoked_at: int) -> None:
+        # Applies a revocation made by this instance without waiting for the next load
+        with self._lock:
+            if token_id is None:
+                self._user_cutoffs[user_id] = max(self._user_cutoffs.get(user_id, -1), revoked_at)
+            else:
+                self._token_ids = self._token_ids | {token_id}
+
+    def load(self, conn: Any) -> int:
+        with conn.cursor() as cur:
+            cur.execute("""
+                SELECT token_id, user_id, floor(EXTRACT(EPOCH FROM revoked_at))::bigint
+                FROM revoked_tokens
+                WHERE expires_at > now()
+            """)
+            rows = cur.fetchall()
+        conn.rollback()
+        self.replace(rows)
+        return len(rows)
+
+    def replace(self, rows: List[Tuple[Optional[str], int, int]]) -> None:
+        token_ids = {token_id for token_id, _, _ in rows if token_id is not None}
+        cutoffs: Dict[int, int] = {}
+        for token_id, user_id, revoked_at in rows:
+            if token_id is None:
+                cutoffs[user_id] = max(cutoffs.get(user_id, -1), revoked_at)
+        with self._lock:
+            # Whole sets are swapped, so denies() reads them without the lock
+            self._token_ids, self._user_cutoffs = token_ids, cutoffs
+            self._loaded_at = time.monotonic()
+            self.stats['loads'] += 1
+
+    def warm_up(self) -> Dict[str, Any]:
+        started = time.perf_counter()
+        profile: Dict[str, Any] = {}
+        try:
+            profile['revoked_tokens'] = self._load_from_pool()
+        except (PoolTimeout, psycopg2.Error) as e:
+            self.stats['failed_loads'] += 1
+            profile['deny_list_error'] = '%s: %s' % (type(e).__name__, str(e).strip().split('\n')[0])
+        profile['deny_list_ms'] = round((time.perf_counter() - started) * 1000, 3)
+        return profile
+
+    def ensure_loaded(self) -> None:
+        if self._loaded_at is None:
+            # Never loaded yet (warm-up failed or was skipped): a revoked token must not slip through
+            self._load_from_pool()
+        elif time.monotonic() - self._loaded_at >= self.refresh_interval:
+            with self._lock:
+                if self._refreshing:
+                    return
+                self._refreshing = True
+            threading.Thread(target=self._refresh, name='deny-list-refresh', daemon=True).start()
+
+    def _load_from_pool(self) -> int:
+        pool = get_pool()
+        conn = pool.getconn()
+        try:
+            return self.load(conn)
+        finally:
+            pool.putconn(conn)
+
+    def _refresh(self) -> None:
+        try:
+            self._load_from_pool()
+        except (PoolTimeout, psycopg2.Error):
+            with self._lock:
+                self.stats['failed_loads'] += 1
+                # Retry after another interval rather than on every request
+                self._loaded_at = time.monotonic()
+        finally:
+            self._refreshing = False
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return dict(
+                self.stats,
+                revoked_tokens=len(self._token_ids),
+                revoked_users=len(self._user_cutoffs),
+                age_s=round(time.monotonic() - self._loaded_at, 3) if self._loaded_at is not None else None,
+            )
+
+
+deny_list = DenyList(refresh_interval=float(os.environ.get('AUTH_DENY_REFRESH_SECONDS', '30')))
+
+
+def request_token(event: Dict[str, Any]) -> Optional[str]:
+    authorization = header(event, 'Authorization')
+    if authorization and authorization[:7].lower() == 'bearer ':
+        return authorization[7:].strip() or None
+    return header(event, 'X-Auth-Token') or None
+
+
+def verify_token(token: str) -> Optional[Claims]:
+    claims = decode_token(token)
+    if claims is None:
+        return None
+    deny_list.ensure_loaded()
+    return None if deny_list.denies(claims) else claims
+
+
+def revoke(cur: Any, claims: Claims, everywhere: bool = False) -> None:
+    cur.execute("""
+        INSERT INTO revoked_tokens (token_id, user_id, expires_at)
+        VALUES (%s, %s, to_timestamp(%s))
+        RETURNING floor(EXTRACT(EPOCH FROM revoked_at))::bigint
+    """, (None if everywhere else claims.token_id, claims.user_id,
+          time.time() + TOKEN_TTL if everywhere else claims.expires_at))
+    deny_list.add(None if everywhere else claims.token_id, claims.user_id, cur.fetchone()[0])
+
+
+def _acting_users(event: Dict[str, Any], fields: Tuple[str, ...]) -> List[Any]:
+    try:
+        body = json.loads(event.get('body') or '{}')
+    except ValueError:
+        return []
+    if not isinstance(body, dict):
+        return []
+    items: Iterable[Any] = [body]
+    if isinstance(body.get('actions'), list):
+        items = [body] + body['actions']
+    return [item[field] for item in items if isinstance(item, dict)
+            for field in fields if item.get(field) is not None]
+
+
+def _error(status: int, message: str) -> Dict[str, Any]:
+    return {
+        'statusCode': status,
+        'headers': {
+            'Content-Type': 'application/json',
+            'Access-Control-Allow-Origin': '*'
+        },
+        'body': json.dumps({'error': message})
+    }
+
+
+def authenticated(fields: Tuple[str, ...] = ('userId',)) -> Callable[[Callable[..., Dict[str, Any]]], Callable[..., Dict[str, Any]]]:
+    def decorate(handler: Callable[..., Dict[str, Any]]) -> Callable[..., Dict[str, Any]]:
+        @wraps(handler)
+        def wrapper(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
+            token = request_token(event)
+            if token is None:
+                if AUTH_REQUIRED and _acting_users(event, fields):
+                    return _error(401, 'Authentication required')
+                return handler(event, context)
+            claims = verify_token(token)
+            if claims is None:
+                return _error(401, 'Invalid or expired token')
+            if any(str(user_id) != str(claims.user_id) for user_id in _acting_users(event, fields)):
+                return _error(403, 'Token belongs to another user')
+            return handler(event, context)
+        return wrapper
+    return decorate
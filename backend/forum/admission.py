@@ -0,0 +1,185 @@
+'''
+Business: Admission control and load shedding in front of the database
+Args: ADMISSION_CAPACITY, ADMISSION_QUEUE_SIZE env vars and a per-function endpoint table
+Returns: handlers wrapped so overload fails fast with 503 + Retry-After
+
+Each warm instance admits at most ADMISSION_CAPACITY requests at once (by
+default its DB_POOL_SIZE), and at most Endpoint.limit per endpoint. The rest
+wait in a bounded queue ordered by priority class, each until its endpoint's
+max_wait deadline. When the queue is full, a newcomer displaces the
+lowest-priority waiter or is rejected itself. Vendored into every function
+behind admission control. Keep the copies identical.
+'''
+
+import math
+import os
+import threading
+import time
+from functools import wraps
+from typing import Dict, Any, Callable, List, NamedTuple
+from metrics import histogram, record_admission, dumps
+
+CRITICAL = 0
+READ = 1
+WRITE = 2
+HEAVY = 3
+
+
+class Endpoint(NamedTuple):
+    priority: int
+    limit: int
+    max_wait: float
+
+
+class Overloaded(Exception):
+    def __init__(self, reason: str, retry_after: int):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class _Waiter:
+    __slots__ = ('name', 'priority', 'seq', 'shed')
+
+    def __init__(self, name: str, priority: int, seq: int):
+        self.name = name
+        self.priority = priority
+        self.seq = seq
+        self.shed = False
+
+
+class AdmissionController:
+    def __init__(self, function: str, endpoints: Dict[str, Endpoint], capacity: int, queue_size: int):
+        self.function = function
+        self.endpoints = endpoints
+        self.capacity = capacity
+        self.queue_size = queue_size
+        self._in_flight: Dict[str, int] = {name: 0 for name in endpoints}
+        self._total = 0
+        self._queue: List[_Waiter] = []
+        self._seq = 0
+        self._cond = threading.Condition()
+        self.stats: Dict[str, Dict[str, int]] = {
+            name: {'admitted': 0, 'queued': 0, 'rejected': 0, 'timeouts': 0, 'shed': 0} for name in endpoints
+        }
+
+    def _can_run(self, name: str) -> bool:
+        return self._total < self.capacity and self._in_flight[name] < self.endpoints[name].limit
+
+    def _next_runnable(self) -> Any:
+        for waiter in sorted(self._queue, key=lambda w: (w.priority, w.seq)):
+            if self._can_run(waiter.name):
+                return waiter
+        return None
+
+    def _retry_after(self) -> int:
+        return max(1, int(math.ceil(len(self._queue) / float(self.capacity))))
+
+    def acquire(self, name: str) -> float:
+        endpoint = self.endpoints[name]
+        started = time.monotonic()
+        deadline = started + endpoint.max_wait
+        with self._cond:
+            if self._can_run(name) and self._next_runnable() is None:
+                self._in_flight[name] += 1
+                self._total += 1
+                self.stats[name]['admitted'] += 1
+                return 0.0
+
+            if len(self._queue) >= self.queue_size:
+                # An empty queue here means ADMISSION_QUEUE_SIZE=0: nobody waits, so nothing to displace
+                worst = max(self._queue, key=lambda w: (w.priority, w.seq), default=None)
+                if worst is None or worst.priority <= endpoint.priority:
+                    self.stats[name]['rejected'] += 1
+                    raise Overloaded('rejected', self._retry_after())
+                worst.shed = True
+                self._queue.remove(worst)
+                self._cond.notify_all()
+
+            self._seq += 1
+            waiter = _Waiter(name, endpoint.priority, self._seq)
+            self._queue.append(waiter)
+            queued = False
+            while True:
+                if waiter.shed:
+                    self.stats[name]['shed'] += 1
+                    raise Overloaded('shed', self._retry_after())
+                if self._next_runnable() is waiter:
+                    self._queue.remove(waiter)
+                    self._in_flight[name] += 1
+                    self._total += 1
+                    self.stats[name]['admitted'] += 1
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._queue.remove(waiter)
+                    self.stats[name]['timeouts'] += 1
+                    self._cond.notify_all()
+                    raise Overloaded('timeout', self._retry_after())
+                if not queued:
+                    self.stats[name]['queued'] += 1
+                    queued = True
+                self._cond.wait(remaining)
+
+        waited_ms = (time.monotonic() - started) * 1000
+        if queued:
+            histogram('%s.admission.%s.wait_ms' % (self.function, name)).record(waited_ms)
+        return waited_ms
+
+    def release(self, name: str) -> None:
+        with self._cond:
+            self._in_flight[name] -= 1
+            self._total -= 1
+            self._cond.notify_all()
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._cond:
+            return {
+                'capacity': self.capacity,
+                'in_flight': self._total,
+                'queued': len(self._queue),
+                'endpoints': {
+                    name: dict(stats, in_flight=self._in_flight[name]) for name, stats in self.stats.items()
+                },
+            }
+
+
+def admission_controller(function: str, endpoints: Dict[str, Endpoint]) -> AdmissionController:
+    capacity = os.environ.get('ADMISSION_CAPACITY') or os.environ.get('DB_POOL_SIZE', '4')
+    return AdmissionController(
+        function,
+        endpoints,
+        capacity=int(capacity),
+        queue_size=int(os.environ.get('ADMISSION_QUEUE_SIZE', '32')),
+    )
+
+
+def admitted(controller: AdmissionController,
+             classify: Callable[[Dict[str, Any]], str]) -> Callable[[Callable[..., Dict[str, Any]]], Callable[..., Dict[str, Any]]]:
+    def decorate(handler: Callable[..., Dict[str, Any]]) -> Callable[..., Dict[str, Any]]:
+        @wraps(handler)
+        def wrapper(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
+            if event.get('httpMethod') == 'OPTIONS':
+                return handler(event, context)
+            name = classify(event)
+            try:
+                waited_ms = controller.acquire(name)
+            except Overloaded as e:
+                record_admission(name, e.reason, 0.0)
+                return {
+                    'statusCode': 503,
+                    'headers': {
+                        'Content-Type': 'application/json',
+                        'Access-Control-Allow-Origin': '*',
+                        'Access-Control-Expose-Headers': 'Retry-After',
+                        'Retry-After': str(e.retry_after)
+                    },
+                    'body': dumps({'error': 'Service overloaded, retry later'})
+                }
+            record_admission(name, 'admitted', waited_ms)
+            try:
+                return handler(event, context)
+            finally:
+                controller.release(name)
+        return wrapper
+    return decorate
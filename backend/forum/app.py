@@ -0,0 +1,506 @@
+'''
+Business: Forum threads and comments management, paginated comment reads, thread search and tag filtering
+Args: event with httpMethod, body; context with request_id
+Returns: HTTP response with forum data
+'''
+
+import json
+from datetime import datetime
+from typing import Dict, Any, List, Optional, Tuple
+from psycopg2.extras import RealDictCursor
+from db import get_pool, get_read_connection, consistency_token, prewarm, CONSISTENCY_HEADER
+from metrics import instrumented, dumps
+from admission import admission_controller, admitted, Endpoint, READ, WRITE, HEAVY
+from pagination import wants_page, page_size, decode_cursor, split_page
+from cache import response_cache, cache_key, publish_invalidation
+from outbox import publish_events
+from responses import header, fingerprint, etag_matches, not_modified, gzip_body, encode_body, compressed
+from views import view_counter
+from encoding import RecordCursor, dumps as encode_json
+from tokens import authenticated, deny_list
+
+THREAD_COLUMNS = """
+    t.id, t.user_id, t.title, t.content, t.thread_type, t.tags, t.is_active, t.views,
+    t.created_at, t.updated_at, u.username, u.avatar_url,
+    t.replies_count as replies, t.votes_score as votes, t.hot_score
+"""
+
+THREAD_SELECT = "SELECT" + THREAD_COLUMNS + """
+    FROM forum_threads t
+    JOIN users u ON t.user_id = u.id
+"""
+
+# Ranks the newest SEARCH_CANDIDATES matches so common terms stay cheap and
+# every page comes from the same candidate set, then highlights only the rows
+# of the requested page
+THREAD_SEARCH = """
+    WITH q AS (SELECT websearch_to_tsquery('russian', %s) AS query),
+    candidates AS (
+        SELECT t.id, t.search_vector
+        FROM forum_threads t, q
+        WHERE t.search_vector @@ q.query
+        ORDER BY t.created_at DESC, t.id DESC
+        LIMIT %s
+    ),
+    ranked AS (
+        SELECT c.id, ts_rank_cd(c.search_vector, q.query) AS rank
+        FROM candidates c, q
+    ),
+    page AS (
+        SELECT id, rank FROM ranked
+        WHERE (rank, id) < (%s::real, %s)
+        ORDER BY rank DESC, id DESC
+        LIMIT %s
+    )
+    SELECT""" + THREAD_COLUMNS + """, page.rank,
+           ts_headline('russian', t.title, q.query, 'HighlightAll=true, StartSel=<mark>, StopSel=</mark>') as title_highlight,
+           ts_headline('russian', t.content, q.query,
+                       'MaxFragments=2, MaxWords=20, MinWords=5, StartSel=<mark>, StopSel=</mark>') as snippet
+    FROM page
+    JOIN forum_threads t ON t.id = page.id
+    JOIN users u ON t.user_id = u.id
+    CROSS JOIN q
+    ORDER BY page.rank DESC, page.id DESC
+"""
+
+# Same rows as THREAD_SELECT without the join, just enough to derive the ETag
+THREAD_VERSION_SELECT = """
+    SELECT t.id, t.updated_at, t.replies_count as replies, t.votes_score as votes
+    FROM forum_threads t
+"""
+
+# views is left out: every write-behind view flush would otherwise change the ETag
+VERSION_FIELDS = ('id', 'updated_at', 'replies', 'votes')
+
+TAG_FACETS = """
+    SELECT tag, count FROM tag_counts
+    WHERE scope = %s AND count > 0
+    ORDER BY count DESC, tag
+    LIMIT %s
+"""
+
+FACET_FIELDS = ('tag', 'count')
+
+# Comment pages walk (thread_id, created_at, id) forward or backward
+THREAD_COMMENTS = """
+    SELECT c.id, c.thread_id, c.user_id, c.comment_text, c.created_at, c.updated_at,
+           u.username, u.avatar_url
+    FROM thread_comments c
+    JOIN users u ON c.user_id = u.id
+    WHERE c.thread_id = %s AND (c.created_at, c.id) {op} (%s::timestamp, %s)
+    ORDER BY c.created_at {direction}, c.id {direction}
+    LIMIT %s
+"""
+
+COMMENT_ORDERS = {
+    'newest': {'op': '<', 'direction': 'DESC', 'start': 'infinity'},
+    'oldest': {'op': '>', 'direction': 'ASC', 'start': '-infinity'},
+}
+
+COMMENT_FIELDS = ('id', 'updated_at')
+
+MAX_FILTER_TAGS = 10
+SEARCH_CANDIDATES = 1000
+DEFAULT_FACETS = 20
+
+# sort=<name> for list pages: keyset column, its row key, cursor cast and parser
+SORTS = {
+    'new': {'column': 't.created_at', 'key': 'created_at', 'cast': 'timestamp', 'parse': datetime.fromisoformat},
+    'hot': {'column': 't.hot_score', 'key': 'hot_score', 'cast': 'double precision', 'parse': float},
+    'top': {'column': 't.votes_score', 'key': 'votes', 'cast': 'integer', 'parse': int},
+}
+
+# window=<name> for sort=top, in days
+TOP_WINDOWS = {'day': 1, 'week': 7, 'month': 30, 'year': 365, 'all': None}
+
+thread_views = view_counter('forum_threads')
+
+# Thread and comment pages are index lookups; list and search scans wait behind them
+admission = admission_controller('forum', {
+    'item': Endpoint(READ, limit=4, max_wait=1.0),
+    'list': Endpoint(HEAVY, limit=2, max_wait=0.5),
+    'search': Endpoint(HEAVY, limit=1, max_wait=0.5),
+    'write': Endpoint(WRITE, limit=3, max_wait=2.0),
+})
+
+# Planned on each pooled connection during init: the thread list, a thread and its first comment page
+WARM_UP = (
+    (THREAD_SELECT + "ORDER BY t.created_at DESC LIMIT 50", None),
+    (THREAD_SELECT + "WHERE t.id = %s", (0,)),
+    (THREAD_COMMENTS.format(op='<', direction='DESC'), (0, 'infinity', 0, 21)),
+)
+
+
+def _tag_condition(params: Dict[str, Any], column: str) -> Optional[Tuple[str, List[str]]]:
+    tags = [tag.strip() for tag in (params.get('tags') or '').split(',') if tag.strip()]
+    if not tags:
+        return None
+    if len(tags) > MAX_FILTER_TAGS:
+        raise ValueError('at most %d tags can be filtered on' % MAX_FILTER_TAGS)
+    tag_mode = params.get('tagMode', 'any')
+    if tag_mode not in ('any', 'all'):
+        raise ValueError('tagMode must be any or all')
+    operator = '&&' if tag_mode == 'any' else '@>'
+    return '%s %s %%s::text[]' % (column, operator), tags
+
+
+def _endpoint(event: Dict[str, Any]) -> str:
+    if event.get('httpMethod') != 'GET':
+        return 'write'
+    params = event.get('queryStringParameters') or {}
+    if params.get('id') or params.get('threadId') or params.get('facets'):
+        return 'item'
+    return 'search' if params.get('q') else 'list'
+
+
+def warm_up() -> Dict[str, Any]:
+    profile = prewarm(WARM_UP)
+    profile.update(deny_list.warm_up())
+    return profile
+
+
+@instrumented('forum', actions=('create_thread', 'add_comment', 'vote'),
+              params=('id', 'threadId', 'q', 'tags', 'tagMode', 'sort', 'window', 'facets', 'order', 'cursor', 'limit'))
+@compressed
+@authenticated(('userId',))
+@admitted(admission, _endpoint)
+@consistency_token
+def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
+    method: str = event.get('httpMethod', 'GET')
+    
+    if method == 'GET':
+        pool, conn = get_read_connection(header(event, CONSISTENCY_HEADER))
+    else:
+        pool = get_pool()
+        conn = pool.getconn()
+    
+    try:
+        if method == 'GET':
+            params = event.get('queryStringParameters', {}) or {}
+            thread_id = params.get('id')
+            key = cache_key('forum', params)
+            if_none_match = header(event, 'If-None-Match')
+            
+            response_cache.sync(conn)
+            # Counted before the cache lookup so hits and 304s are views too
+            if thread_id and str(thread_id).isdigit():
+                thread_views.record(int(thread_id), header(event, 'X-User-Id'))
+                thread_views.maybe_flush(get_pool())
+            # A client reading its own write skips cached bodies that predate it
+            cached = None if header(event, CONSISTENCY_HEADER) else response_cache.get(key)
+            if cached is not None:
+                if etag_matches(if_none_match, cached.etag):
+                    return not_modified(cached.etag)
+                return encode_body(event, {
+                    'statusCode': 200,
+                    'headers': {
+                        'Content-Type': 'application/json',
+                        'Access-Control-Allow-Origin': '*',
+                        'ETag': cached.etag,
+                        'X-Cache': 'HIT'
+                    },
+                    'body': cached.body
+                }, cached.gzipped)
+            
+            if params.get('threadId'):
+                mode = 'comments'
+            elif thread_id:
+                mode = 'single'
+            elif params.get('q'):
+                mode = 'search'
+            elif params.get('facets') == 'tags':
+                mode = 'facets'
+            elif wants_page(params) or params.get('sort'):
+                mode = 'page'
+            else:
+                mode = 'legacy'
+            
+            page_key = 'created_at'
+            try:
+                if mode == 'single':
+                    query = "WHERE t.id = %s"
+                    args = [int(thread_id)]
+                    cache_tags = ['thread:%s' % int(thread_id)]
+                
+                elif mode == 'comments':
+                    comments_thread_id = int(params['threadId'])
+                    order = COMMENT_ORDERS.get(params.get('order') or 'newest')
+                    if order is None:
+                        raise ValueError('order must be newest or oldest')
+                    limit = page_size(params)
+                    after = decode_cursor(params.get('cursor')) or (order['start'], 0)
+                    query = THREAD_COMMENTS.format(op=order['op'], direction=order['direction'])
+                    args = [comments_thread_id, after[0], after[1], limit + 1]
+                    cache_tags = ['thread:%s' % comments_thread_id]
+                
+                elif mode == 'search':
+                    limit = page_size(params)
+                    after = decode_cursor(params.get('cursor'), parse=float) or (float('inf'), 0)
+                    page_key = 'rank'
+                    args = [params['q'], SEARCH_CANDIDATES, after[0], after[1], limit + 1]
+                    cache_tags = ['forum']
+                
+                elif mode == 'facets':
+                    args = ['forum', page_size(params, default=DEFAULT_FACETS)]
+                    cache_tags = ['tag_counts:forum']
+                
+                else:
+                    conditions = []
+                    args = []
+                    tag_condition = _tag_condition(params, 't.tags')
+                    if tag_condition:
+                        conditions.append(tag_condition[0])
+                        args.append(tag_condition[1])
+                    if mode == 'page':
+                        limit = page_size(params)
+                        sort = SORTS.get(params.get('sort') or 'new')
+                        if sort is None:
+                            raise ValueError('sort must be one of: ' + ', '.join(SORTS))
+                        page_key = sort['key']
+                        if params.get('sort') == 'top':
+                            window = params.get('window') or 'week'
+                            if window not in TOP_WINDOWS:
+                                raise ValueError('window must be one of: ' + ', '.join(TOP_WINDOWS))
+                            days = TOP_WINDOWS[window]
+                            if days:
+                                conditions.append("t.created_at > now() - %s * interval '1 day'")
+                                args.append(days)
+                        after = decode_cursor(params.get('cursor'), parse=sort['parse'])
+                        if after:
+                            conditions.append("(%s, t.id) < (%%s::%s, %%s)" % (sort['column'], sort['cast']))
+                            args.extend(after)
+                    
+                    query = "WHERE " + " AND ".join(conditions) if conditions else ""
+                    if mode == 'page':
+                        query += " ORDER BY %s DESC, t.id DESC LIMIT %%s" % sort['column']
+                        args.append(limit + 1)
+                    else:
+                        query += " ORDER BY t.created_at DESC LIMIT 50"
+                    cache_tags = ['forum']
+            
+            except ValueError as e:
+                return {
+                    'statusCode': 400,
+                    'headers': {
+                        'Content-Type': 'application/json',
+                        'Access-Control-Allow-Origin': '*'
+                    },
+                    'body': dumps({'error': str(e)})
+                }
+            
+            with conn.cursor(cursor_factory=RecordCursor) as cur:
+                if mode == 'search':
+                    cur.execute(THREAD_SEARCH, args)
+                elif mode == 'facets':
+                    cur.execute(TAG_FACETS, args)
+                elif mode == 'comments':
+                    cur.execute("SELECT replies_count FROM forum_threads WHERE id = %s", (comments_thread_id,))
+                    thread = cur.fetchone()
+                    cur.execute(query, args)
+                else:
+                    if if_none_match:
+                        cur.execute(THREAD_VERSION_SELECT + query, args)
+                        etag = fingerprint(cur.fetchall(), VERSION_FIELDS)
+                        if etag_matches(if_none_match, etag):
+                            return not_modified(etag)
+                    cur.execute(THREAD_SELECT + query, args)
+                rows = cur.fetchall()
+            
+            if mode == 'comments' and thread is None:
+                return {
+                    'statusCode': 404,
+                    'headers': {
+                        'Content-Type': 'application/json',
+                        'Access-Control-Allow-Origin': '*'
+                    },
+                    'body': dumps({'error': 'Thread not found'})
+                }
+            
+            if mode == 'single':
+                if not rows:
+                    return {
+                        'statusCode': 404,
+                        'headers': {
+                            'Content-Type': 'application/json',
+                            'Access-Control-Allow-Origin': '*'
+                        },
+                        'body': dumps({'error': 'Thread not found'})
+                    }
+                payload = rows[0]
+            elif mode == 'facets':
+                payload = rows
+            elif mode in ('search', 'page', 'comments'):
+                items, next_cursor = split_page(rows, limit, key=page_key)
+                payload = {'items': items, 'next_cursor': next_cursor}
+            else:
+                payload = rows
+            
+            if mode == 'comments':
+                payload['total'] = thread['replies_count']
+                # The counter joins the fingerprint so a reply landing on another page still changes it
+                etag = fingerprint(rows + [{'id': 'total', 'updated_at': payload['total']}], COMMENT_FIELDS)
+            else:
+                etag = fingerprint(rows, FACET_FIELDS if mode == 'facets' else VERSION_FIELDS)
+            body = encode_json(payload)
+            gzipped = gzip_body(body)
+            response_cache.set(key, body, cache_tags, etag=etag, gzipped=gzipped)
+            if etag_matches(if_none_match, etag):
+                return not_modified(etag)
+            
+            return encode_body(event, {
+                'statusCode': 200,
+                'headers': {
+                    'Content-Type': 'application/json',
+                    'Access-Control-Allow-Origin': '*',
+                    'ETag': etag,
+                    'X-Cache': 'MISS'
+                },
+                'body': body
+            }, gzipped)
+        
+        elif method == 'POST':
+            body_data = json.loads(event.get('body', '{}'))
+            action = body_data.get('action')
+            
+            if action in ('add_comment', 'vote'):
+                try:
+                    thread_id = int(body_data.get('threadId'))
+                except (TypeError, ValueError):
+                    return {
+                        'statusCode': 400,
+                        'headers': {
+                            'Content-Type': 'application/json',
+                            'Access-Control-Allow-Origin': '*'
+                        },
+                        'body': dumps({'error': 'Invalid threadId'})
+                    }
+            
+            if action == 'create_thread':
+                user_id = body_data.get('userId')
+                title = body_data.get('title')
+                content = body_data.get('content')
+                thread_type = body_data.get('threadType', 'discussion')
+                tags = body_data.get('tags', [])
+                
+                with conn.cursor(cursor_factory=RealDictCursor) as cur:
+                    cur.execute("""
+                        INSERT INTO forum_threads (user_id, title, content, thread_type, tags)
+                        VALUES (%s, %s, %s, %s, %s)
+                        RETURNING id, user_id, title, content, thread_type, tags, created_at
+                    """, (user_id, title, content, thread_type, tags))
+                    
+                    thread = dict(cur.fetchone())
+                    stale_tags = ['forum', 'tag_counts:forum']
+                    publish_invalidation(cur, stale_tags)
+                    conn.commit()
+                
+                response_cache.invalidate(stale_tags)
+                
+                return {
+                    'statusCode': 201,
+                    'headers': {
+                        'Content-Type': 'application/json',
+                        'Access-Control-Allow-Origin': '*'
+                    },
+                    'body': dumps(thread, default=str)
+                }
+            
+            elif action == 'add_comment':
+                user_id = body_data.get('userId')
+                comment_text = body_data.get('commentText')
+                
+                with conn.cursor(cursor_factory=RealDictCursor) as cur:
+                    cur.execute("""
+                        INSERT INTO thread_comments (thread_id, user_id, comment_text)
+                        VALUES (%s, %s, %s)
+                        RETURNING id, thread_id, user_id, comment_text, created_at
+                    """, (thread_id, user_id, comment_text))
+                    
+                    comment = dict(cur.fetchone())
+                    cur.execute("""
+                        UPDATE forum_threads
+                        SET replies_count = replies_count + 1,
+                            hot_score = hot_score + thread_hot_score(0, 1, created_at)
+                        WHERE id = %s
+                    """, (thread_id,))
+                    stale_tags = ['forum', 'thread:%s' % thread_id]
+                    publish_invalidation(cur, stale_tags)
+                    publish_events(cur, [('reply', user_id, thread_id)])
+                    conn.commit()
+                
+                response_cache.invalidate(stale_tags)
+                
+                return {
+                    'statusCode': 201,
+                    'headers': {
+                        'Content-Type': 'application/json',
+                        'Access-Control-Allow-Origin': '*'
+                    },
+                    'body': dumps(comment, default=str)
+                }
+            
+            elif action == 'vote':
+                user_id = body_data.get('userId')
+                vote_value = body_data.get('voteValue')
+                
+                with conn.cursor(cursor_factory=RealDictCursor) as cur:
+                    # Lock the thread first so the previous vote read below is
+                    # not raced by a concurrent vote from the same user
+                    cur.execute("SELECT id FROM forum_threads WHERE id = %s FOR UPDATE", (thread_id,))
+                    if cur.fetchone() is None:
+                        return {
+                            'statusCode': 404,
+                            'headers': {
+                                'Content-Type': 'application/json',
+                                'Access-Control-Allow-Origin': '*'
+                            },
+                            'body': dumps({'error': 'Thread not found'})
+                        }
+                    cur.execute("""
+                        WITH prev AS (
+                            SELECT vote_value FROM thread_votes
+                            WHERE thread_id = %s AND user_id = %s
+                        ), upsert AS (
+                            INSERT INTO thread_votes (thread_id, user_id, vote_value)
+                            VALUES (%s, %s, %s)
+                            ON CONFLICT (thread_id, user_id) 
+                            DO UPDATE SET vote_value = EXCLUDED.vote_value
+                            RETURNING vote_value
+                        ), delta AS (
+                            SELECT (SELECT vote_value FROM upsert) - COALESCE((SELECT vote_value FROM prev), 0) AS n
+                        )
+                        UPDATE forum_threads
+                        SET votes_score = votes_score + delta.n,
+                            hot_score = hot_score + thread_hot_score(delta.n, 0, created_at)
+                        FROM delta
+                        WHERE id = %s
+                        RETURNING votes_score as total_votes
+                    """, (thread_id, user_id, thread_id, user_id, vote_value, thread_id))
+                    
+                    result = cur.fetchone()
+                    stale_tags = ['forum', 'thread:%s' % thread_id]
+                    publish_invalidation(cur, stale_tags)
+                    conn.commit()
+                
+                response_cache.invalidate(stale_tags)
+                
+                return {
+                    'statusCode': 200,
+                    'headers': {
+                        'Content-Type': 'application/json',
+                        'Access-Control-Allow-Origin': '*'
+                    },
+                    'body': dumps({'votes': result['total_votes']})
+                }
+        
+        return {
+            'statusCode': 400,
+            'headers': {
+                'Content-Type': 'application/json',
+                'Access-Control-Allow-Origin': '*'
+            },
+            'body': dumps({'error': 'Invalid request'})
+        }
+    
+    finally:
+        pool.putconn(conn)
@@ -0,0 +1,145 @@
+'''
+Business: In-process TTL + LRU cache of serialized GET response bodies
+Args: CACHE_MAX_BYTES, CACHE_TTL_SECONDS, CACHE_SYNC_INTERVAL env vars
+Returns: cached bodies, plus their gzipped form when large enough, keyed by normalized query parameters, invalidated by tag
+
+Writers append the tags they touch to cache_invalidations in their own
+transaction; every warm instance replays that log at most once per
+CACHE_SYNC_INTERVAL, so a like written by the interactions function also
+evicts the artworks function's cached feed.
+
+Vendored into every function that reads or invalidates cached responses.
+Keep the copies identical.
+'''
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from urllib.parse import urlencode
+from typing import Dict, Any, Iterable, List, NamedTuple, Optional, Set, Tuple
+
+SYNC_OVERLAP_SECONDS = 5
+
+
+class CachedResponse(NamedTuple):
+    body: str
+    etag: Optional[str]
+    gzipped: Optional[str] = None
+
+
+class ResponseCache:
+    def __init__(self, max_bytes: int, ttl: float, sync_interval: float):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.sync_interval = sync_interval
+        self._entries: 'OrderedDict[str, Tuple[CachedResponse, float, Set[str]]]' = OrderedDict()
+        self._by_tag: Dict[str, Set[str]] = {}
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._synced_at = 0.0
+        self._log_position: Any = None
+        self.stats: Dict[str, int] = {
+            'hits': 0,
+            'misses': 0,
+            'evictions': 0,
+            'expirations': 0,
+            'invalidations': 0,
+        }
+
+    def get(self, key: str) -> Optional[CachedResponse]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.stats['misses'] += 1
+                return None
+            if entry[1] < time.monotonic():
+                self._remove(key)
+                self.stats['expirations'] += 1
+                self.stats['misses'] += 1
+                return None
+            self._entries.move_to_end(key)
+            self.stats['hits'] += 1
+            return entry[0]
+
+    def set(self, key: str, body: str, tags: Iterable[str], etag: Optional[str] = None,
+            ttl: Optional[float] = None, gzipped: Optional[str] = None) -> None:
+        size = len(body) + len(gzipped or '')
+        if size > self.max_bytes:
+            return
+        tag_set = set(tags)
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            expires = time.monotonic() + (self.ttl if ttl is None else ttl)
+            self._entries[key] = (CachedResponse(body, etag, gzipped), expires, tag_set)
+            self._bytes += size
+            for tag in tag_set:
+                self._by_tag.setdefault(tag, set()).add(key)
+            while self._bytes > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.stats['evictions'] += 1
+
+    def invalidate(self, tags: Iterable[str]) -> None:
+        with self._lock:
+            for tag in tags:
+                for key in self._by_tag.pop(tag, ()):
+                    if key in self._entries:
+                        self._remove(key)
+                        self.stats['invalidations'] += 1
+
+    def _remove(self, key: str) -> None:
+        response, _, tags = self._entries.pop(key)
+        self._bytes -= len(response.body) + len(response.gzipped or '')
+        for tag in tags:
+            keys = self._by_tag.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._by_tag[tag]
+
+    def sync(self, conn: Any) -> None:
+        now = time.monotonic()
+        if now - self._synced_at < self.sync_interval:
+            return
+        with conn.cursor() as cur:
+            cur.execute("SELECT clock_timestamp()")
+            position = cur.fetchone()[0]
+            if self._log_position is not None:
+                cur.execute(
+                    "SELECT DISTINCT tag FROM cache_invalidations WHERE created_at > %s - %s * interval '1 second'",
+                    (self._log_position, SYNC_OVERLAP_SECONDS)
+                )
+                self.invalidate(row[0] for row in cur.fetchall())
+        conn.commit()
+        self._log_position = position
+        self._synced_at = now
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.stats['hits'] + self.stats['misses']
+            return dict(
+                self.stats,
+                entries=len(self._entries),
+                bytes=self._bytes,
+                max_bytes=self.max_bytes,
+                hit_ratio=round(self.stats['hits'] / lookups, 4) if lookups else 0.0,
+            )
+
+
+def cache_key(scope: str, params: Dict[str, Any]) -> str:
+    items = sorted((str(k), str(v)) for k, v in params.items() if v not in (None, ''))
+    # Escaped, so a value holding '&' or '=' cannot collide with another query
+    return scope + '?' + urlencode(items)
+
+
+def publish_invalidation(cur: Any, tags: List[str]) -> None:
+    cur.execute("INSERT INTO cache_invalidations (tag) SELECT unnest(%s::text[])", (tags,))
+
+
+response_cache = ResponseCache(
+    max_bytes=int(os.environ.get('CACHE_MAX_BYTES', str(16 * 1024 * 1024))),
+    ttl=float(os.environ.get('CACHE_TTL_SECONDS', '30')),
+    sync_interval=float(os.environ.get('CACHE_SYNC_INTERVAL', '1')),
+)
@@ -0,0 +1,104 @@
+'''
+Business: Lean row fetching and JSON encoding for list responses
+Args: a cursor created with cursor_factory=RecordCursor; payloads of records, dicts and lists
+Returns: response bodies byte-identical to json.dumps(payload, default=str)
+
+Rows come back as Record tuples that share one column index per result
+shape, built in C, instead of a RealDictRow filled one __setitem__ call per
+column and then copied by dict(row). dumps() turns records into dicts with
+dict(zip()) only while walking the payload's containers and hands the result
+to one prebuilt C-accelerated encoder, which writes into a single buffer.
+Vendored into every function that serves row lists. Keep the copies identical.
+'''
+
+import json
+import time
+from typing import Dict, Any, Iterator, List, Optional, Set, Tuple
+import psycopg2.extensions
+from metrics import current
+
+# Same settings json.dumps(obj, default=str) builds on every call, built once
+_ENCODER = json.JSONEncoder(default=str)
+
+
+class Record(tuple):
+    __slots__ = ()
+    _fields: Tuple[str, ...] = ()
+    _index: Dict[str, int] = {}
+
+    def __getitem__(self, key: Any) -> Any:
+        if key.__class__ is str:
+            return tuple.__getitem__(self, self._index[key])
+        return tuple.__getitem__(self, key)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        index = self._index.get(key)
+        return default if index is None else tuple.__getitem__(self, index)
+
+    def keys(self) -> Tuple[str, ...]:
+        return self._fields
+
+    def items(self) -> Iterator[Tuple[str, Any]]:
+        return zip(self._fields, self)
+
+
+_record_types: Dict[Tuple[str, ...], type] = {}
+_record_classes: Set[type] = set()
+
+
+def record_type(fields: Tuple[str, ...]) -> type:
+    cls = _record_types.get(fields)
+    if cls is None:
+        cls = type('Record', (Record,), {
+            '__slots__': (),
+            '_fields': fields,
+            '_index': {name: i for i, name in enumerate(fields)},
+        })
+        _record_types[fields] = cls
+        _record_classes.add(cls)
+    return cls
+
+
+class RecordCursor(psycopg2.extensions.cursor):
+    def _record_type(self) -> type:
+        return record_type(tuple(column.name for column in self.description))
+
+    def fetchone(self) -> Optional[Record]:
+        row = super().fetchone()
+        return None if row is None else self._record_type()(row)
+
+    def fetchmany(self, size: Optional[int] = None) -> List[Record]:
+        rows = super().fetchmany(self.arraysize if size is None else size)
+        if not rows:
+            return []
+        cls = self._record_type()
+        return [cls(row) for row in rows]
+
+    def fetchall(self) -> List[Record]:
+        rows = super().fetchall()
+        if not rows:
+            return []
+        cls = self._record_type()
+        return [cls(row) for row in rows]
+
+
+def _plain(value: Any) -> Any:
+    # Only containers are walked: a Record becomes a dict in one C-level call
+    # and its values are left to the encoder
+    cls = value.__class__
+    if cls in _record_classes:
+        return dict(zip(value._fields, value))
+    if cls is list:
+        return [_plain(item) for item in value]
+    if cls is dict:
+        return {key: _plain(item) for key, item in value.items()}
+    return value
+
+
+def dumps(payload: Any) -> str:
+    started = time.perf_counter()
+    body = _ENCODER.encode(_plain(payload))
+    metrics = current()
+    if metrics is not None:
+        metrics.serialize_ms += (time.perf_counter() - started) * 1000
+    return body
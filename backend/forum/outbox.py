@@ -0,0 +1,20 @@
+'''
+Business: Transactional outbox for notification events
+Args: an open cursor inside the writer's transaction and (event_type, actor_id, subject_id) tuples
+Returns: nothing; the jobs function drains outbox_events into coalesced notifications
+
+subject_id is the artwork for like/comment, the followed user for follow and
+the thread for reply. Recipients are resolved by the drainer, so writers pay
+for a single insert. Vendored into every function that emits events. Keep the
+copies identical.
+'''
+
+from typing import Any, List, Tuple
+from psycopg2.extras import execute_values
+
+EVENT_TYPES = ('like', 'comment', 'follow', 'reply')
+
+
+def publish_events(cur: Any, events: List[Tuple[str, int, int]]) -> None:
+    if events:
+        execute_values(cur, "INSERT INTO outbox_events (event_type, actor_id, subject_id) VALUES %s", events)
@@ -0,0 +1,76 @@
+'''
+Business: Cold-start handling for HTTP functions - preflights without the app, app import and DB warm-up off the request
+Args: name of the module holding the real handler; its optional warm_up() returning profile fields
+Returns: a LazyApp whose get() hands out the loaded module, and ready-made CORS preflight responses
+
+A cold instance usually receives the browser's OPTIONS preflight first.
+index.py answers it from here with the standard library alone, while a thread
+started at init imports the app (psycopg2 included) and runs its warm_up().
+The first real request waits only for whatever of that is still unfinished.
+Each instance prints one cold_start line with the import, connect and warm-up
+times. Vendored into every HTTP function. Keep the copies identical.
+'''
+
+import importlib
+import json
+import os
+import threading
+import time
+from typing import Dict, Any
+
+LOG_ENABLED = os.environ.get('METRICS_LOG', '1') != '0'
+
+
+def _ms(started: float) -> float:
+    return round((time.perf_counter() - started) * 1000, 3)
+
+
+class LazyApp:
+    def __init__(self, name: str):
+        self.name = name
+        self.module: Any = None
+        self.profile: Dict[str, Any] = {}
+        self._started = time.perf_counter()
+        self._ready = threading.Event()
+        threading.Thread(target=self._load, name='startup-' + name, daemon=True).start()
+
+    def _load(self) -> None:
+        try:
+            started = time.perf_counter()
+            module = importlib.import_module(self.name)
+            self.profile['import_ms'] = _ms(started)
+            warm_up = getattr(module, 'warm_up', None)
+            if warm_up is not None:
+                self.profile.update(warm_up())
+            self.module = module
+        except Exception as e:
+            self.profile['error'] = '%s: %s' % (type(e).__name__, e)
+        finally:
+            self.profile['ready_ms'] = _ms(self._started)
+            self._ready.set()
+            if LOG_ENABLED:
+                print(json.dumps(dict(self.profile, metric='cold_start', module=self.name)), flush=True)
+
+    def get(self) -> Any:
+        if self.module is not None:
+            return self.module
+        started = time.perf_counter()
+        self._ready.wait()
+        self.profile.setdefault('first_wait_ms', _ms(started))
+        if self.module is None:
+            # The background load failed: import here so the request raises the real error
+            self.module = importlib.import_module(self.name)
+        return self.module
+
+
+def preflight(methods: str, headers: str) -> Dict[str, Any]:
+    return {
+        'statusCode': 200,
+        'headers': {
+            'Access-Control-Allow-Origin': '*',
+            'Access-Control-Allow-Methods': methods,
+            'Access-Control-Allow-Headers': headers,
+            'Access-Control-Max-Age': '86400'
+        },
+        'body': ''
+    }
@@ -0,0 +1,696 @@
+'''
+Business: Handle likes, comments, and follows - singly or as a batch of actions in one transaction
+Args: event with httpMethod, body; context with request_id
+Returns: HTTP response with interaction data
+'''
+
+import json
+import os
+from collections import Counter
+from typing import Dict, Any, List, Optional, Set, Tuple
+from psycopg2.extras import RealDictCursor, execute_values
+from db import get_pool, get_read_connection, consistency_token, prewarm, CONSISTENCY_HEADER
+from metrics import instrumented, dumps
+from admission import admission_controller, admitted, Endpoint, READ, WRITE, HEAVY
+from cache import publish_invalidation
+from outbox import publish_events
+from pagination import wants_page, page_size, decode_cursor, split_page
+from responses import header, compressed
+from tokens import authenticated, deny_list
+
+MAX_BATCH_ACTIONS = 100
+
+# Actions that only read, served by a replica when one is configured
+READ_ACTIONS = ('get_comments', 'get_notifications')
+
+# Comment pages walk (artwork_id, created_at, id) forward or backward
+ARTWORK_COMMENTS = """
+    SELECT c.id, c.artwork_id, c.user_id, c.comment_text, c.created_at, c.updated_at,
+           u.username, u.avatar_url
+    FROM artwork_comments c
+    JOIN users u ON c.user_id = u.id
+    WHERE c.artwork_id = %s AND (c.created_at, c.id) {op} (%s::timestamp, %s)
+    ORDER BY c.created_at {direction}, c.id {direction}
+    LIMIT %s
+"""
+
+COMMENTS_TOTAL = "SELECT comments_count FROM artworks WHERE id = %s"
+
+# Inserts nothing when the artwork or user does not exist, instead of failing on a foreign key
+LIKE_INSERT = """
+    INSERT INTO artwork_likes (artwork_id, user_id)
+    SELECT a.id, u.id FROM artworks a, users u
+    WHERE a.id = %s AND u.id = %s
+    ON CONFLICT (artwork_id, user_id) DO NOTHING
+    RETURNING id
+"""
+
+COMMENT_ORDERS = {
+    'newest': {'op': '<', 'direction': 'DESC', 'start': 'infinity'},
+    'oldest': {'op': '>', 'direction': 'ASC', 'start': '-infinity'},
+}
+
+# Must match the artworks function: artists below it push into artwork_feed
+FEED_FANOUT_LIMIT = int(os.environ.get('FEED_FANOUT_LIMIT', '1000'))
+FEED_BACKFILL = 50
+
+# Batches hold a connection longest, so they are queued behind and shed before single actions
+admission = admission_controller('interactions', {
+    'read': Endpoint(READ, limit=4, max_wait=1.0),
+    'write': Endpoint(WRITE, limit=3, max_wait=2.0),
+    'batch': Endpoint(HEAVY, limit=1, max_wait=0.5),
+})
+
+# Planned on each pooled connection during init: a like and the first comment page
+WARM_UP = (
+    (LIKE_INSERT, (0, 0)),
+    (ARTWORK_COMMENTS.format(op='<', direction='DESC'), (0, 'infinity', 0, 21)),
+    (COMMENTS_TOTAL, (0,)),
+)
+
+
+def _int_fields(item: Dict[str, Any], *keys: str) -> Optional[Tuple[int, ...]]:
+    try:
+        return tuple(int(item[key]) for key in keys)
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+def _int_list(value: Any) -> Optional[List[int]]:
+    if not isinstance(value, list):
+        return None
+    try:
+        return [int(item) for item in value]
+    except (TypeError, ValueError):
+        return None
+
+
+def _artwork_tags(rows: List[Dict[str, Any]]) -> Set[str]:
+    tags = {'artworks'}
+    for row in rows:
+        tags.add('artwork:%s' % row['id'])
+        tags.add('gallery:%s' % row['user_id'])
+    return tags
+
+
+def _batch_likes(cur: Any, work: List[Tuple[int, Tuple[int, ...]]], results: List[Any], stale_tags: Set[str]) -> None:
+    pairs = [pair for _, pair in work]
+    # The joins skip a row whose artwork or user went away after _drop_missing, instead of failing the batch
+    inserted = execute_values(cur, """
+        INSERT INTO artwork_likes (artwork_id, user_id)
+        SELECT v.artwork_id, v.user_id FROM (VALUES %s) AS v(artwork_id, user_id)
+        JOIN artworks a ON a.id = v.artwork_id
+        JOIN users u ON u.id = v.user_id
+        ON CONFLICT (artwork_id, user_id) DO NOTHING
+        RETURNING artwork_id, user_id
+    """, pairs, fetch=True)
+    new_pairs = {(row['artwork_id'], row['user_id']) for row in inserted}
+    publish_events(cur, [('like', user_id, artwork_id) for artwork_id, user_id in sorted(new_pairs)])
+    
+    added = Counter(artwork_id for artwork_id, _ in new_pairs)
+    if added:
+        updated = execute_values(cur, """
+            UPDATE artworks a SET likes_count = a.likes_count + v.n,
+                hot_score = a.hot_score + artwork_hot_score(v.n, 0, a.created_at)
+            FROM (VALUES %s) AS v(id, n)
+            WHERE a.id = v.id
+            RETURNING a.id, a.user_id
+        """, list(added.items()), fetch=True)
+        stale_tags.update(_artwork_tags(updated))
+    
+    cur.execute("SELECT id, likes_count FROM artworks WHERE id = ANY(%s)", (list({a for a, _ in pairs}),))
+    likes = {row['id']: row['likes_count'] for row in cur.fetchall()}
+    
+    for index, pair in work:
+        liked = pair in new_pairs
+        new_pairs.discard(pair)
+        results[index] = {'status': 200, 'body': {'likes': likes.get(pair[0], 0), 'liked': liked}}
+
+
+def _batch_comments(cur: Any, work: List[Tuple[int, Tuple[int, ...]]], texts: Dict[int, str],
+                    results: List[Any], stale_tags: Set[str]) -> None:
+    # RETURNING order is not guaranteed, so each comment gets its id up front and results match on it
+    cur.execute("SELECT nextval(pg_get_serial_sequence('artwork_comments', 'id')) AS id FROM generate_series(1, %s)",
+                (len(work),))
+    comment_ids = [row['id'] for row in cur.fetchall()]
+    comments = execute_values(cur, """
+        INSERT INTO artwork_comments (id, artwork_id, user_id, comment_text)
+        SELECT v.id, v.artwork_id, v.user_id, v.comment_text
+        FROM (VALUES %s) AS v(id, artwork_id, user_id, comment_text)
+        JOIN artworks a ON a.id = v.artwork_id
+        JOIN users u ON u.id = v.user_id
+        RETURNING id, artwork_id, user_id, comment_text, created_at
+    """, [(comment_id, artwork_id, user_id, texts[index])
+          for comment_id, (index, (artwork_id, user_id)) in zip(comment_ids, work)], fetch=True)
+    if not comments:
+        for index, _ in work:
+            results[index] = {'status': 404, 'body': {'error': 'Artwork not found'}}
+        return
+    
+    publish_events(cur, [('comment', row['user_id'], row['artwork_id']) for row in comments])
+    
+    added = Counter(row['artwork_id'] for row in comments)
+    updated = execute_values(cur, """
+        UPDATE artworks a SET comments_count = a.comments_count + v.n,
+            hot_score = a.hot_score + artwork_hot_score(0, v.n, a.created_at)
+        FROM (VALUES %s) AS v(id, n)
+        WHERE a.id = v.id
+        RETURNING a.id, a.user_id
+    """, list(added.items()), fetch=True)
+    stale_tags.update(_artwork_tags(updated))
+    
+    by_id = {row['id']: dict(row) for row in comments}
+    for comment_id, (index, _) in zip(comment_ids, work):
+        comment = by_id.get(comment_id)
+        if comment is None:
+            results[index] = {'status': 404, 'body': {'error': 'Artwork not found'}}
+        else:
+            results[index] = {'status': 201, 'body': comment}
+
+
+def wants_comment_page(params: Dict[str, Any]) -> bool:
+    return wants_page(params) or 'order' in params
+
+
+def comment_page(cur: Any, artwork_id: int, params: Dict[str, Any]) -> Dict[str, Any]:
+    order = COMMENT_ORDERS.get(params.get('order') or 'newest')
+    if order is None:
+        raise ValueError('order must be newest or oldest')
+    limit = page_size(params)
+    after = decode_cursor(params.get('cursor')) or (order['start'], 0)
+    
+    cur.execute(
+        ARTWORK_COMMENTS.format(op=order['op'], direction=order['direction']),
+        (artwork_id, after[0], after[1], limit + 1)
+    )
+    items, next_cursor = split_page(cur.fetchall(), limit)
+    cur.execute(COMMENTS_TOTAL, (artwork_id,))
+    artwork = cur.fetchone()
+    return {'items': items, 'next_cursor': next_cursor, 'total': artwork['comments_count'] if artwork else 0}
+
+
+def _batch_get_comments(cur: Any, work: List[Tuple[int, Tuple[int, ...]]], results: List[Any]) -> None:
+    cur.execute("""
+        SELECT c.*, u.username, u.avatar_url
+        FROM artwork_comments c
+        JOIN users u ON c.user_id = u.id
+        WHERE c.artwork_id = ANY(%s)
+        ORDER BY c.created_at DESC
+    """, (list({artwork_id for _, (artwork_id,) in work}),))
+    
+    by_artwork: Dict[int, List[Dict[str, Any]]] = {}
+    for row in cur.fetchall():
+        by_artwork.setdefault(row['artwork_id'], []).append(dict(row))
+    
+    for index, (artwork_id,) in work:
+        results[index] = {'status': 200, 'body': by_artwork.get(artwork_id, [])}
+
+
+def _record_follows(cur: Any, pairs: List[Tuple[int, int]]) -> Set[str]:
+    followers = [follower_id for follower_id, _ in pairs]
+    followings = [following_id for _, following_id in pairs]
+    
+    cur.execute("""
+        UPDATE users u SET followers_count = u.followers_count + v.n
+        FROM (SELECT following_id, COUNT(*) AS n FROM unnest(%s::int[]) AS following_id GROUP BY following_id) v
+        WHERE u.id = v.following_id
+    """, (followings,))
+    
+    # Artists that still fan out on write: seed the new follower's timeline
+    cur.execute("""
+        INSERT INTO artwork_feed (user_id, artwork_id, author_id, created_at)
+        SELECT v.follower_id, recent.id, recent.user_id, recent.created_at
+        FROM unnest(%s::int[], %s::int[]) AS v(follower_id, following_id)
+        JOIN users p ON p.id = v.following_id AND p.followers_count < %s
+        CROSS JOIN LATERAL (
+            SELECT id, user_id, created_at FROM artworks
+            WHERE user_id = v.following_id
+            ORDER BY created_at DESC, id DESC
+            LIMIT %s
+        ) recent
+        ON CONFLICT DO NOTHING
+    """, (followers, followings, FEED_FANOUT_LIMIT, FEED_BACKFILL))
+    
+    return {'feed:%s' % follower_id for follower_id in followers}
+
+
+def _batch_follows(cur: Any, work: List[Tuple[int, Tuple[int, ...]]], results: List[Any], stale_tags: Set[str]) -> None:
+    inserted = execute_values(cur, """
+        INSERT INTO user_follows (follower_id, following_id)
+        SELECT v.follower_id, v.following_id FROM (VALUES %s) AS v(follower_id, following_id)
+        JOIN users f ON f.id = v.follower_id
+        JOIN users g ON g.id = v.following_id
+        ON CONFLICT (follower_id, following_id) DO NOTHING
+        RETURNING follower_id, following_id
+    """, [pair for _, pair in work], fetch=True)
+    new_pairs = {(row['follower_id'], row['following_id']) for row in inserted}
+    if new_pairs:
+        stale_tags.update(_record_follows(cur, sorted(new_pairs)))
+        publish_events(cur, [('follow', follower_id, following_id) for follower_id, following_id in sorted(new_pairs)])
+    
+    for index, pair in work:
+        followed = pair in new_pairs
+        new_pairs.discard(pair)
+        results[index] = {'status': 200, 'body': {'followed': followed}}
+
+
+def _existing_ids(cur: Any, table: str, ids: Set[int]) -> Set[int]:
+    if not ids:
+        return set()
+    cur.execute("SELECT id FROM " + table + " WHERE id = ANY(%s)", (sorted(ids),))
+    return {row['id'] for row in cur.fetchall()}
+
+
+def _drop_missing(cur: Any, work: Dict[str, List[Tuple[int, Tuple[int, ...]]]], results: List[Any]) -> None:
+    # Writes naming an artwork or user that does not exist get a 404 instead of failing the batch on a foreign key
+    artwork_ids = {ids[0] for action in ('like', 'comment') for _, ids in work[action]}
+    user_ids = {ids[1] for action in ('like', 'comment') for _, ids in work[action]}
+    user_ids.update(user_id for _, ids in work['follow'] for user_id in ids)
+    artworks = _existing_ids(cur, 'artworks', artwork_ids)
+    users = _existing_ids(cur, 'users', user_ids)
+    
+    for action in ('like', 'comment', 'follow'):
+        kept = []
+        for index, ids in work[action]:
+            if action != 'follow' and ids[0] not in artworks:
+                results[index] = {'status': 404, 'body': {'error': 'Artwork not found'}}
+            elif not users.issuperset(ids[1:] if action != 'follow' else ids):
+                results[index] = {'status': 404, 'body': {'error': 'User not found'}}
+            else:
+                kept.append((index, ids))
+        work[action] = kept
+
+
+BATCH_FIELDS = {
+    'like': ('artworkId', 'userId'),
+    'comment': ('artworkId', 'userId'),
+    'get_comments': ('artworkId',),
+    'follow': ('followerId', 'followingId'),
+}
+
+
+def run_batch(cur: Any, items: List[Any]) -> List[Dict[str, Any]]:
+    results: List[Any] = [None] * len(items)
+    work: Dict[str, List[Tuple[int, Tuple[int, ...]]]] = {action: [] for action in BATCH_FIELDS}
+    texts: Dict[int, str] = {}
+    pages: List[Tuple[int, int, Dict[str, Any]]] = []
+    
+    for index, item in enumerate(items):
+        action = item.get('action') if isinstance(item, dict) else None
+        if action not in BATCH_FIELDS:
+            results[index] = {'status': 400, 'body': {'error': 'Invalid action'}}
+            continue
+        ids = _int_fields(item, *BATCH_FIELDS[action])
+        if ids is None or (action == 'comment' and not item.get('commentText')):
+            results[index] = {'status': 400, 'body': {'error': 'Invalid parameters'}}
+            continue
+        if action == 'comment':
+            texts[index] = item['commentText']
+        if action == 'get_comments' and wants_comment_page(item):
+            pages.append((index, ids[0], item))
+            continue
+        work[action].append((index, ids))
+    
+    _drop_missing(cur, work, results)
+    
+    stale_tags: Set[str] = set()
+    if work['like']:
+        _batch_likes(cur, work['like'], results, stale_tags)
+    if work['comment']:
+        _batch_comments(cur, work['comment'], texts, results, stale_tags)
+    if work['get_comments']:
+        _batch_get_comments(cur, work['get_comments'], results)
+    for index, artwork_id, item in pages:
+        try:
+            results[index] = {'status': 200, 'body': comment_page(cur, artwork_id, item)}
+        except (TypeError, ValueError) as e:
+            results[index] = {'status': 400, 'body': {'error': str(e)}}
+    if work['follow']:
+        _batch_follows(cur, work['follow'], results, stale_tags)
+    
+    if stale_tags:
+        publish_invalidation(cur, sorted(stale_tags))
+    
+    return results
+
+
+def _endpoint(event: Dict[str, Any]) -> str:
+    try:
+        body = json.loads(event.get('body') or '{}')
+    except ValueError:
+        return 'write'
+    if not isinstance(body, dict):
+        return 'write'
+    if 'actions' in body:
+        return 'batch'
+    return 'read' if body.get('action') in READ_ACTIONS else 'write'
+
+
+def warm_up() -> Dict[str, Any]:
+    profile = prewarm(WARM_UP)
+    profile.update(deny_list.warm_up())
+    return profile
+
+
+@instrumented('interactions', actions=('like', 'comment', 'get_comments', 'follow', 'get_notifications',
+                                       'mark_notifications_read'))
+@compressed
+@authenticated(('userId', 'followerId'))
+@admitted(admission, _endpoint)
+@consistency_token
+def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
+    body_data = json.loads(event.get('body', '{}'))
+    action = body_data.get('action')
+    
+    if action in READ_ACTIONS:
+        pool, conn = get_read_connection(header(event, CONSISTENCY_HEADER))
+    else:
+        pool = get_pool()
+        conn = pool.getconn()
+    
+    try:
+        if 'actions' in body_data:
+            items = body_data.get('actions')
+            
+            if not isinstance(items, list) or len(items) > MAX_BATCH_ACTIONS:
+                return {
+                    'statusCode': 400,
+                    'headers': {
+                        'Content-Type': 'application/json',
+                        'Access-Control-Allow-Origin': '*'
+                    },
+                    'body': dumps({'error': 'actions must be a list of at most %d items' % MAX_BATCH_ACTIONS})
+                }
+            
+            with conn.cursor(cursor_factory=RealDictCursor) as cur:
+                results = run_batch(cur, items)
+                conn.commit()
+            
+            return {
+                'statusCode': 200,
+                'headers': {
+                    'Content-Type': 'application/json',
+                    'Access-Control-Allow-Origin': '*'
+                },
+                'body': dumps({'results': results}, default=str)
+            }
+        
+        if action in ('like', 'comment', 'follow'):
+            ids = _int_fields(body_data, *BATCH_FIELDS[action])
+            if ids is None or (action == 'comment' and not body_data.get('commentText')):
+                return {
+                    'statusCode': 400,
+                    'headers': {
+                        'Content-Type': 'application/json',
+                        'Access-Control-Allow-Origin': '*'
+                    },
+                    'body': dumps({'error': 'Invalid parameters'})
+                }
+        
+        if action == 'like':
+            artwork_id, user_id = ids
+            
+            with conn.cursor(cursor_factory=RealDictCursor) as cur:
+                cur.execute(LIKE_INSERT, (artwork_id, user_id))
+                
+                result = cur.fetchone()
+                
+                if result:
+                    cur.execute("""
+                        UPDATE artworks
+                        SET likes_count = likes_count + 1,
+                            hot_score = hot_score + artwork_hot_score(1, 0, created_at)
+                        WHERE id = %s
+                        RETURNING likes_count, user_id
+                    """, (artwork_id,))
+                    row = cur.fetchone()
+                    publish_invalidation(cur, ['artworks', 'artwork:%s' % artwork_id, 'gallery:%s' % row['user_id']])
+                    publish_events(cur, [('like', user_id, artwork_id)])
+                else:
+                    cur.execute("SELECT likes_count FROM artworks WHERE id = %s", (artwork_id,))
+                    row = cur.fetchone()
+                    if row is not None:
+                        cur.execute("SELECT id FROM users WHERE id = %s", (user_id,))
+                        missing = None if cur.fetchone() else 'User not found'
+                    else:
+                        missing = 'Artwork not found'
+                    if missing:
+                        return {
+                            'statusCode': 404,
+                            'headers': {
+                                'Content-Type': 'application/json',
+                                'Access-Control-Allow-Origin': '*'
+                            },
+                            'body': dumps({'error': missing})
+                        }
+                
+                likes = row['likes_count']
+                conn.commit()
+            
+            return {
+                'statusCode': 200,
+                'headers': {
+                    'Content-Type': 'application/json',
+                    'Access-Control-Allow-Origin': '*'
+                },
+                'body': dumps({'likes': likes, 'liked': result is not None})
+            }
+        
+        elif action == 'comment':
+            artwork_id, user_id = ids
+            comment_text = body_data.get('commentText')
+            
+            with conn.cursor(cursor_factory=RealDictCursor) as cur:
+                cur.execute("""
+                    INSERT INTO artwork_comments (artwork_id, user_id, comment_text)
+                    SELECT a.id, u.id, %s FROM artworks a, users u
+                    WHERE a.id = %s AND u.id = %s
+                    RETURNING id, artwork_id, user_id, comment_text, created_at
+                """, (comment_text, artwork_id, user_id))
+                
+                inserted = cur.fetchone()
+                if inserted is None:
+                    return {
+                        'statusCode': 404,
+                        'headers': {
+                            'Content-Type': 'application/json',
+                            'Access-Control-Allow-Origin': '*'
+                        },
+                        'body': dumps({'error': 'Artwork or user not found'})
+                    }
+                comment = dict(inserted)
+                cur.execute("""
+                    UPDATE artworks
+                    SET comments_count = comments_count + 1,
+                        hot_score = hot_score + artwork_hot_score(0, 1, created_at)
+                    WHERE id = %s
+                    RETURNING user_id
+                """, (artwork_id,))
+                artist = cur.fetchone()
+                publish_invalidation(cur, ['artworks', 'artwork:%s' % artwork_id, 'gallery:%s' % artist['user_id']])
+                publish_events(cur, [('comment', user_id, artwork_id)])
+                conn.commit()
+            
+            return {
+                'statusCode': 201,
+                'headers': {
+                    'Content-Type': 'application/json',
+                    'Access-Control-Allow-Origin': '*'
+                },
+                'body': dumps(comment, default=str)
+            }
+        
+        elif action == 'get_comments' and wants_comment_page(body_data):
+            try:
+                with conn.cursor(cursor_factory=RealDictCursor) as cur:
+                    page = comment_page(cur, int(body_data.get('artworkId')), body_data)
+            except (TypeError, ValueError) as e:
+                return {
+                    'statusCode': 400,
+                    'headers': {
+                        'Content-Type': 'application/json',
+                        'Access-Control-Allow-Origin': '*'
+                    },
+                    'body': dumps({'error': str(e)})
+                }
+            
+            return {
+                'statusCode': 200,
+                'headers': {
+                    'Content-Type': 'application/json',
+                    'Access-Control-Allow-Origin': '*'
+                },
+                'body': dumps(page, default=str)
+            }
+        
+        elif action == 'get_comments':
+            artwork_id = body_data.get('artworkId')
+            
+            with conn.cursor(cursor_factory=RealDictCursor) as cur:
+                cur.execute("""
+                    SELECT c.*, u.username, u.avatar_url
+                    FROM artwork_comments c
+                    JOIN users u ON c.user_id = u.id
+                    WHERE c.artwork_id = %s
+                    ORDER BY c.created_at DESC
+                """, (artwork_id,))
+                
+                comments = [dict(row) for row in cur.fetchall()]
+            
+            return {
+                'statusCode': 200,
+                'headers': {
+                    'Content-Type': 'application/json',
+                    'Access-Control-Allow-Origin': '*'
+                },
+                'body': dumps(comments, default=str)
+            }
+        
+        elif action == 'follow':
+            follower_id, following_id = ids
+            
+            with conn.cursor(cursor_factory=RealDictCursor) as cur:
+                cur.execute("""
+                    INSERT INTO user_follows (follower_id, following_id)
+                    SELECT f.id, g.id FROM users f, users g
+                    WHERE f.id = %s AND g.id = %s
+                    ON CONFLICT (follower_id, following_id) DO NOTHING
+                    RETURNING id
+                """, (follower_id, following_id))
+                
+                result = cur.fetchone()
+                if result is None:
+                    cur.execute("SELECT id FROM users WHERE id = ANY(%s)", ([follower_id, following_id],))
+                    if len(cur.fetchall()) < len({follower_id, following_id}):
+                        return {
+                            'statusCode': 404,
+                            'headers': {
+                                'Content-Type': 'application/json',
+                                'Access-Control-Allow-Origin': '*'
+                            },
+                            'body': dumps({'error': 'User not found'})
+                        }
+                if result:
+                    publish_invalidation(cur, sorted(_record_follows(cur, [(follower_id, following_id)])))
+                    publish_events(cur, [('follow', follower_id, following_id)])
+                conn.commit()
+            
+            return {
+                'statusCode': 200,
+                'headers': {
+                    'Content-Type': 'application/json',
+                    'Access-Control-Allow-Origin': '*'
+                },
+                'body': dumps({'followed': result is not None})
+            }
+        
+        elif action == 'get_notifications':
+            ids = _int_fields(body_data, 'userId')
+            if ids is None:
+                return {
+                    'statusCode': 400,
+                    'headers': {
+                        'Content-Type': 'application/json',
+                        'Access-Control-Allow-Origin': '*'
+                    },
+                    'body': dumps({'error': 'Invalid parameters'})
+                }
+            user_id = ids[0]
+            
+            try:
+                limit = page_size(body_data)
+                after = decode_cursor(body_data.get('cursor')) or ('infinity', 0)
+            except (TypeError, ValueError) as e:
+                return {
+                    'statusCode': 400,
+                    'headers': {
+                        'Content-Type': 'application/json',
+                        'Access-Control-Allow-Origin': '*'
+                    },
+                    'body': dumps({'error': str(e)})
+                }
+            
+            with conn.cursor(cursor_factory=RealDictCursor) as cur:
+                cur.execute("SELECT unread_notifications_count FROM users WHERE id = %s", (user_id,))
+                user = cur.fetchone()
+                cur.execute("""
+                    SELECT n.id, n.from_user_id, n.notification_type, n.related_id, n.message,
+                           n.actor_count, n.created_at, u.username, u.avatar_url
+                    FROM notifications n
+                    LEFT JOIN users u ON n.from_user_id = u.id
+                    WHERE n.user_id = %s AND n.is_read = false
+                      AND (n.created_at, n.id) < (%s::timestamp, %s)
+                    ORDER BY n.created_at DESC, n.id DESC
+                    LIMIT %s
+                """, (user_id, after[0], after[1], limit + 1))
+                
+                items, next_cursor = split_page(cur.fetchall(), limit)
+            
+            return {
+                'statusCode': 200,
+                'headers': {
+                    'Content-Type': 'application/json',
+                    'Access-Control-Allow-Origin': '*'
+                },
+                'body': dumps({
+                    'items': items,
+                    'next_cursor': next_cursor,
+                    'unread_count': user['unread_notifications_count'] if user else 0
+                }, default=str)
+            }
+        
+        elif action == 'mark_notifications_read':
+            ids = _int_fields(body_data, 'userId')
+            requested = body_data.get('notificationIds')
+            notification_ids = None if requested is None else _int_list(requested)
+            if ids is None or (requested is not None and notification_ids is None):
+                return {
+                    'statusCode': 400,
+                    'headers': {
+                        'Content-Type': 'application/json',
+                        'Access-Control-Allow-Origin': '*'
+                    },
+                    'body': dumps({'error': 'Invalid parameters'})
+                }
+            user_id = ids[0]
+            
+            with conn.cursor(cursor_factory=RealDictCursor) as cur:
+                if notification_ids is None:
+                    cur.execute(
+                        "UPDATE notifications SET is_read = true WHERE user_id = %s AND is_read = false",
+                        (user_id,)
+                    )
+                else:
+                    cur.execute("""
+                        UPDATE notifications SET is_read = true
+                        WHERE user_id = %s AND is_read = false AND id = ANY(%s::int[])
+                    """, (user_id, notification_ids))
+                
+                cur.execute("""
+                    UPDATE users SET unread_notifications_count = GREATEST(unread_notifications_count - %s, 0)
+                    WHERE id = %s
+                    RETURNING unread_notifications_count
+                """, (cur.rowcount, user_id))
+                user = cur.fetchone()
+                conn.commit()
+            
+            return {
+                'statusCode': 200,
+                'headers': {
+                    'Content-Type': 'application/json',
+                    'Access-Control-Allow-Origin': '*'
+                },
+                'body': dumps({'unread_count': user['unread_notifications_count'] if user else 0})
+            }
+        
+        return {
+            'statusCode': 400,
+            'headers': {
+                'Content-Type': 'application/json',
+                'Access-Control-Allow-Origin': '*'
+            },
+            'body': dumps({'error': 'Invalid action'})
+        }
+    
+    finally:
+        pool.putconn(conn)
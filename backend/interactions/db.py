@@ -0,0 +1,374 @@
+'''
+Business: Module-scope Postgres connection pools shared by warm invocations
+Args: DATABASE_URL, DB_POOL_SIZE, DB_POOL_TIMEOUT, DB_POOL_MAX_IDLE env vars;
+      optional DATABASE_REPLICA_URLS, REPLICA_MAX_LAG_SECONDS, REPLICA_CHECK_INTERVAL
+Returns: pooled psycopg2 connections via get_pool().getconn() / putconn(),
+         replica-routed reads via get_read_connection(), init-time warm-up via prewarm()
+
+Writes answer with an X-Consistency-Token header (the primary's WAL LSN) when
+replicas are configured. A read that sends it back is served only by a
+replica that has replayed that far, otherwise by the primary. Replicas lagging
+more than REPLICA_MAX_LAG_SECONDS leave the rotation until a later check finds
+them caught up; keep that below the cache log's SYNC_OVERLAP_SECONDS.
+
+prewarm() opens DB_PREWARM connections per pool (primary and replicas) during
+function init and plans the given statements on each of them, so the first
+request neither pays the TCP/TLS/auth handshake nor the backend's cold catalog
+and planner caches.
+
+Each function deploys from its own directory, so this file is vendored into
+every backend/<function>/ folder. Keep the copies identical.
+'''
+
+import itertools
+import os
+import threading
+import time
+from functools import wraps
+from typing import Dict, Any, Callable, List, Optional, Sequence, Tuple
+import psycopg2
+import psycopg2.extensions
+from metrics import InstrumentedConnection, record_connect, record_pool_wait
+
+CONSISTENCY_HEADER = 'X-Consistency-Token'
+
+# Zero lag when everything received has been replayed, so an idle primary does
+# not make a healthy replica look stale
+REPLICA_STATUS = """
+    SELECT pg_last_wal_replay_lsn()::text,
+           CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+                ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+           END
+"""
+
+
+class PoolTimeout(Exception):
+    pass
+
+
+class ConnectionPool:
+    def __init__(self, dsn: str, max_size: int = 4, timeout: float = 5.0, max_idle: float = 60.0):
+        self.dsn = dsn
+        self.max_size = max_size
+        self.timeout = timeout
+        self.max_idle = max_idle
+        self._idle: List[Any] = []
+        self._last_used: Dict[int, float] = {}
+        self._size = 0
+        self._cond = threading.Condition()
+        self.stats: Dict[str, int] = {
+            'hits': 0,
+            'misses': 0,
+            'waits': 0,
+            'timeouts': 0,
+            'reconnects': 0,
+            'discarded': 0,
+        }
+
+    def _connect(self) -> Any:
+        started = time.perf_counter()
+        try:
+            return psycopg2.connect(self.dsn, connection_factory=InstrumentedConnection)
+        finally:
+            record_connect((time.perf_counter() - started) * 1000)
+
+    def _is_healthy(self, conn: Any) -> bool:
+        if conn.closed:
+            return False
+        idle_for = time.monotonic() - self._last_used.get(id(conn), 0.0)
+        if idle_for < self.max_idle:
+            return True
+        try:
+            with conn.cursor() as cur:
+                cur.execute('SELECT 1')
+            conn.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+    def _close(self, conn: Any) -> None:
+        self._last_used.pop(id(conn), None)
+        try:
+            conn.close()
+        except psycopg2.Error:
+            pass
+
+    def getconn(self) -> Any:
+        started = time.monotonic()
+        deadline = started + self.timeout
+        waited = False
+        with self._cond:
+            while True:
+                if self._idle:
+                    conn = self._idle.pop()
+                    break
+                if self._size < self.max_size:
+                    self._size += 1
+                    conn = None
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self.stats['timeouts'] += 1
+                    raise PoolTimeout('No database connection available within %.1fs' % self.timeout)
+                if not waited:
+                    self.stats['waits'] += 1
+                    waited = True
+                self._cond.wait(remaining)
+
+        if waited:
+            record_pool_wait((time.monotonic() - started) * 1000)
+
+        if conn is not None:
+            if self._is_healthy(conn):
+                self.stats['hits'] += 1
+                return conn
+            self._close(conn)
+            self.stats['reconnects'] += 1
+        else:
+            self.stats['misses'] += 1
+
+        try:
+            return self._connect()
+        except Exception:
+            with self._cond:
+                self._size -= 1
+                self._cond.notify()
+            raise
+
+    def putconn(self, conn: Any) -> None:
+        keep = not conn.closed
+        if keep and conn.get_transaction_status() != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+            try:
+                conn.rollback()
+            except psycopg2.Error:
+                keep = False
+
+        with self._cond:
+            if keep:
+                self._last_used[id(conn)] = time.monotonic()
+                self._idle.append(conn)
+            else:
+                self.stats['discarded'] += 1
+                self._size -= 1
+            self._cond.notify()
+
+        if not keep:
+            self._close(conn)
+
+    def closeall(self) -> None:
+        with self._cond:
+            idle, self._idle = self._idle, []
+            self._size -= len(idle)
+        for conn in idle:
+            self._close(conn)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._cond:
+            return dict(self.stats, size=self._size, idle=len(self._idle), max_size=self.max_size)
+
+
+_pool: Optional[ConnectionPool] = None
+_pool_lock = threading.Lock()
+
+
+def get_pool() -> ConnectionPool:
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool(
+                    os.environ.get('DATABASE_URL'),
+                    max_size=int(os.environ.get('DB_POOL_SIZE', '4')),
+                    timeout=float(os.environ.get('DB_POOL_TIMEOUT', '5')),
+                    max_idle=float(os.environ.get('DB_POOL_MAX_IDLE', '60')),
+                )
+    return _pool
+
+
+def lsn_value(lsn: str) -> int:
+    high, low = lsn.split('/')
+    return (int(high, 16) << 32) + int(low, 16)
+
+
+class ReplicaSet:
+    def __init__(self, dsns: List[str], max_size: int, timeout: float, max_idle: float,
+                 max_lag: float, check_interval: float):
+        self.pools = [ConnectionPool(dsn, max_size, timeout, max_idle) for dsn in dsns]
+        self.max_lag = max_lag
+        self.check_interval = check_interval
+        self._state: List[Dict[str, Any]] = [
+            {'lsn': 0, 'lag': None, 'healthy': True, 'checked_at': 0.0} for _ in dsns
+        ]
+        self._next = itertools.count()
+        self._lock = threading.Lock()
+        self.stats: Dict[str, int] = {
+            'routed': 0,
+            'fallbacks': 0,
+            'evictions': 0,
+            'token_misses': 0,
+        }
+
+    def _check(self, index: int, conn: Any, force: bool = False) -> Dict[str, Any]:
+        state = self._state[index]
+        now = time.monotonic()
+        if not force and now - state['checked_at'] < self.check_interval:
+            return state
+        with conn.cursor() as cur:
+            cur.execute(REPLICA_STATUS)
+            lsn, lag = cur.fetchone()
+        conn.rollback()
+        healthy = lsn is not None and float(lag) <= self.max_lag
+        with self._lock:
+            if state['healthy'] and not healthy:
+                self.stats['evictions'] += 1
+            state.update(lsn=lsn_value(lsn) if lsn else 0, lag=float(lag), healthy=healthy, checked_at=now)
+        return state
+
+    def _mark_down(self, index: int) -> None:
+        with self._lock:
+            state = self._state[index]
+            if state['healthy']:
+                self.stats['evictions'] += 1
+            state.update(healthy=False, checked_at=time.monotonic())
+
+    def getconn(self, min_lsn: Optional[int] = None) -> Optional[Tuple[ConnectionPool, Any]]:
+        start = next(self._next)
+        for offset in range(len(self.pools)):
+            index = (start + offset) % len(self.pools)
+            state = self._state[index]
+            if not state['healthy'] and time.monotonic() - state['checked_at'] < self.check_interval:
+                continue
+            pool = self.pools[index]
+            try:
+                conn = pool.getconn()
+            except (PoolTimeout, psycopg2.Error):
+                self._mark_down(index)
+                continue
+            try:
+                state = self._check(index, conn, force=not state['healthy'])
+                if state['healthy'] and min_lsn is not None and state['lsn'] < min_lsn:
+                    state = self._check(index, conn, force=True)
+                    if state['lsn'] < min_lsn:
+                        with self._lock:
+                            self.stats['token_misses'] += 1
+                        pool.putconn(conn)
+                        continue
+            except psycopg2.Error:
+                self._mark_down(index)
+                pool.putconn(conn)
+                continue
+            if not state['healthy']:
+                pool.putconn(conn)
+                continue
+            with self._lock:
+                self.stats['routed'] += 1
+            return pool, conn
+        with self._lock:
+            self.stats['fallbacks'] += 1
+        return None
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return dict(
+                self.stats,
+                replicas=[dict(state, pool=pool.snapshot()) for state, pool in zip(self._state, self.pools)],
+            )
+
+
+_replicas: Optional[ReplicaSet] = None
+_replicas_loaded = False
+_local = threading.local()
+
+
+def get_replicas() -> Optional[ReplicaSet]:
+    global _replicas, _replicas_loaded
+    if not _replicas_loaded:
+        with _pool_lock:
+            if not _replicas_loaded:
+                dsns = [dsn.strip() for dsn in os.environ.get('DATABASE_REPLICA_URLS', '').split(',') if dsn.strip()]
+                if dsns:
+                    _replicas = ReplicaSet(
+                        dsns,
+                        max_size=int(os.environ.get('DB_POOL_SIZE', '4')),
+                        timeout=float(os.environ.get('DB_POOL_TIMEOUT', '5')),
+                        max_idle=float(os.environ.get('DB_POOL_MAX_IDLE', '60')),
+                        max_lag=float(os.environ.get('REPLICA_MAX_LAG_SECONDS', '2')),
+                        check_interval=float(os.environ.get('REPLICA_CHECK_INTERVAL', '5')),
+                    )
+                _replicas_loaded = True
+    return _replicas
+
+
+def get_read_connection(token: Optional[str] = None) -> Tuple[ConnectionPool, Any]:
+    _local.read_only = True
+    replicas = get_replicas()
+    if replicas is not None:
+        try:
+            min_lsn = lsn_value(token) if token else None
+        except ValueError:
+            min_lsn = None
+            replicas = None
+        if replicas is not None:
+            routed = replicas.getconn(min_lsn)
+            if routed is not None:
+                return routed
+    pool = get_pool()
+    return pool, pool.getconn()
+
+
+def consistency_token(handler: Callable[..., Dict[str, Any]]) -> Callable[..., Dict[str, Any]]:
+    @wraps(handler)
+    def wrapper(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
+        _local.read_only = False
+        response = handler(event, context)
+        if (get_replicas() is None or _local.read_only or event.get('httpMethod') == 'OPTIONS'
+                or response.get('statusCode', 200) >= 400):
+            return response
+        # The WAL position is global, so any pooled session reports one at or past this commit
+        pool = get_pool()
+        conn = pool.getconn()
+        try:
+            with conn.cursor() as cur:
+                cur.execute('SELECT pg_current_wal_lsn()::text')
+                lsn = cur.fetchone()[0]
+            conn.rollback()
+        finally:
+            pool.putconn(conn)
+        headers = response.setdefault('headers', {})
+        headers[CONSISTENCY_HEADER] = lsn
+        headers['Access-Control-Expose-Headers'] = CONSISTENCY_HEADER
+        return response
+    return wrapper
+
+
+def prewarm(statements: Sequence[Tuple[str, Any]] = ()) -> Dict[str, Any]:
+    count = int(os.environ.get('DB_PREWARM', '1'))
+    profile: Dict[str, Any] = {'connect_ms': 0.0, 'warm_ms': 0.0, 'connections': 0}
+    if count <= 0 or not os.environ.get('DATABASE_URL'):
+        return profile
+    replicas = get_replicas()
+    pools = [get_pool()] + (replicas.pools if replicas is not None else [])
+    for pool in pools:
+        held = []
+        try:
+            for _ in range(min(count, pool.max_size)):
+                started = time.perf_counter()
+                conn = pool.getconn()
+                profile['connect_ms'] += (time.perf_counter() - started) * 1000
+                held.append(conn)
+                started = time.perf_counter()
+                with conn.cursor() as cur:
+                    for sql, args in statements:
+                        # EXPLAIN plans without executing, writes included
+                        cur.execute('EXPLAIN ' + sql, args)
+                conn.rollback()
+                profile['warm_ms'] += (time.perf_counter() - started) * 1000
+                profile['connections'] += 1
+        except (PoolTimeout, psycopg2.Error) as e:
+            profile['error'] = '%s: %s' % (type(e).__name__, str(e).strip().split('\n')[0])
+        finally:
+            for conn in held:
+                pool.putconn(conn)
+    profile['connect_ms'] = round(profile['connect_ms'], 3)
+    profile['warm_ms'] = round(profile['warm_ms'], 3)
+    return profile
@@ -0,0 +1,55 @@
+'''
+Business: Opaque keyset cursors over (sort key, id) for list endpoints
+Args: queryStringParameters with optional cursor and limit
+Returns: page size, decoded cursor position and next_cursor for a fetched page
+
+Vendored into every function that serves paginated lists. Keep the copies identical.
+'''
+
+import base64
+from datetime import datetime
+from typing import Dict, Any, Callable, List, Optional, Tuple
+
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+
+def wants_page(params: Dict[str, Any]) -> bool:
+    return 'cursor' in params or 'limit' in params
+
+
+def page_size(params: Dict[str, Any], default: int = DEFAULT_PAGE_SIZE) -> int:
+    raw = params.get('limit')
+    if raw in (None, ''):
+        return default
+    limit = int(raw)
+    if limit < 1:
+        raise ValueError('limit must be positive')
+    return min(limit, MAX_PAGE_SIZE)
+
+
+def encode_cursor(sort_key: Any, row_id: int) -> str:
+    if isinstance(sort_key, datetime):
+        sort_key = sort_key.isoformat()
+    raw = '%s|%d' % (sort_key, row_id)
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor: Optional[str], parse: Callable[[str], Any] = datetime.fromisoformat) -> Optional[Tuple[str, int]]:
+    if not cursor:
+        return None
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        sort_key, row_id = base64.urlsafe_b64decode(padded.encode()).decode().rsplit('|', 1)
+        parse(sort_key)
+        return sort_key, int(row_id)
+    except (ValueError, UnicodeDecodeError):
+        raise ValueError('Invalid cursor')
+
+
+def split_page(rows: List[Dict[str, Any]], limit: int, key: str = 'created_at') -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    if len(rows) <= limit:
+        return rows, None
+    items = rows[:limit]
+    last = items[-1]
+    return items, encode_cursor(last[key], last['id'])
@@ -0,0 +1,301 @@
+'''
+Business: Periodic maintenance jobs - counter reconciliation, cache log and token deny-list pruning, outbox draining, hot score decay
+Args: event with X-Jobs-Secret header matching JOBS_SECRET and optional body {"action": job name, "batchSize": rows per batch};
+      context with request_id
+Returns: HTTP response with per-job results; 401 without the secret, 400 for an unknown job or a batchSize below 1
+'''
+
+import hmac
+import json
+import os
+from collections import Counter
+from typing import Dict, Any, Callable, Tuple
+from psycopg2.extras import execute_values
+from db import get_pool
+from metrics import instrumented, dumps
+
+DEFAULT_BATCH_SIZE = 1000
+# Jobs scan whole tables, so only the scheduler holding this secret may start them
+JOBS_SECRET = os.environ.get('JOBS_SECRET', '')
+CACHE_LOG_RETENTION_SECONDS = 3600
+# Past this age hot scores are only zeroed, never recomputed
+HOT_SCORE_WINDOW_DAYS = 30
+
+# Claims a batch of events and resolves each one's recipient in one statement;
+# SKIP LOCKED lets overlapping drainer runs split the backlog
+OUTBOX_DRAIN = """
+    WITH batch AS (
+        DELETE FROM outbox_events
+        WHERE id IN (SELECT id FROM outbox_events ORDER BY id LIMIT %s FOR UPDATE SKIP LOCKED)
+        RETURNING id, event_type, actor_id, subject_id, created_at
+    )
+    SELECT b.event_type, b.subject_id, b.actor_id, actor.username, b.created_at,
+           CASE b.event_type
+               WHEN 'follow' THEN b.subject_id
+               WHEN 'reply' THEN t.user_id
+               ELSE a.user_id
+           END as recipient_id
+    FROM batch b
+    LEFT JOIN users actor ON actor.id = b.actor_id
+    LEFT JOIN artworks a ON b.event_type IN ('like', 'comment') AND a.id = b.subject_id
+    LEFT JOIN forum_threads t ON b.event_type = 'reply' AND t.id = b.subject_id
+    ORDER BY b.id
+"""
+
+# (single actor, several actors) message per event type
+NOTIFICATION_MESSAGES = {
+    'like': ('%s оценил(а) вашу работу', '%s и ещё %d чел. оценили вашу работу'),
+    'comment': ('%s прокомментировал(а) вашу работу', '%s и ещё %d чел. прокомментировали вашу работу'),
+    'follow': ('%s подписался(-ась) на вас', '%s и ещё %d чел. подписались на вас'),
+    'reply': ('%s ответил(а) в вашей теме', '%s и ещё %d чел. ответили в вашей теме'),
+}
+
+
+def _id_batches(cur: Any, table: str, batch_size: int):
+    last_id = 0
+    while True:
+        cur.execute(
+            "SELECT MAX(id) FROM (SELECT id FROM " + table + " WHERE id > %s ORDER BY id LIMIT %s) s",
+            (last_id, batch_size)
+        )
+        upper = cur.fetchone()[0]
+        if upper is None:
+            return
+        yield last_id, upper
+        last_id = upper
+
+
+def _lock_batch(cur: Any, table: str, lower: int, upper: int) -> None:
+    # Writers bump a counter under this row lock after inserting the counted row. Once the batch
+    # is locked, the next statement's snapshot sees every committed insert, and any later one
+    # still adds its own increment, so the recount cannot overwrite a concurrent write.
+    cur.execute("SELECT id FROM " + table + " WHERE id > %s AND id <= %s ORDER BY id FOR UPDATE", (lower, upper))
+
+
+def reconcile_counters(conn: Any, batch_size: int) -> Dict[str, int]:
+    repaired = {'artworks': 0, 'forum_threads': 0, 'users': 0}
+    
+    with conn.cursor() as cur:
+        for lower, upper in _id_batches(cur, 'artworks', batch_size):
+            _lock_batch(cur, 'artworks', lower, upper)
+            cur.execute("""
+                UPDATE artworks a
+                SET likes_count = s.likes, comments_count = s.comments
+                FROM (
+                    SELECT a2.id,
+                           (SELECT COUNT(*) FROM artwork_likes WHERE artwork_id = a2.id) as likes,
+                           (SELECT COUNT(*) FROM artwork_comments WHERE artwork_id = a2.id) as comments
+                    FROM artworks a2
+                    WHERE a2.id > %s AND a2.id <= %s
+                ) s
+                WHERE a.id = s.id
+                  AND (a.likes_count <> s.likes OR a.comments_count <> s.comments)
+            """, (lower, upper))
+            repaired['artworks'] += cur.rowcount
+            conn.commit()
+        
+        for lower, upper in _id_batches(cur, 'forum_threads', batch_size):
+            _lock_batch(cur, 'forum_threads', lower, upper)
+            cur.execute("""
+                UPDATE forum_threads t
+                SET replies_count = s.replies, votes_score = s.votes
+                FROM (
+                    SELECT t2.id,
+                           (SELECT COUNT(*) FROM thread_comments WHERE thread_id = t2.id) as replies,
+                           (SELECT COALESCE(SUM(vote_value), 0) FROM thread_votes WHERE thread_id = t2.id) as votes
+                    FROM forum_threads t2
+                    WHERE t2.id > %s AND t2.id <= %s
+                ) s
+                WHERE t.id = s.id
+                  AND (t.replies_count <> s.replies OR t.votes_score <> s.votes)
+            """, (lower, upper))
+            repaired['forum_threads'] += cur.rowcount
+            conn.commit()
+        
+        for lower, upper in _id_batches(cur, 'users', batch_size):
+            _lock_batch(cur, 'users', lower, upper)
+            cur.execute("""
+                UPDATE users u
+                SET followers_count = s.followers, unread_notifications_count = s.unread
+                FROM (
+                    SELECT u2.id,
+                           (SELECT COUNT(*) FROM user_follows WHERE following_id = u2.id) as followers,
+                           (SELECT COUNT(*) FROM notifications WHERE user_id = u2.id AND is_read = false) as unread
+                    FROM users u2
+                    WHERE u2.id > %s AND u2.id <= %s
+                ) s
+                WHERE u.id = s.id
+                  AND (u.followers_count <> s.followers OR u.unread_notifications_count <> s.unread)
+            """, (lower, upper))
+            repaired['users'] += cur.rowcount
+            conn.commit()
+    
+    return repaired
+
+
+def redecay_hot_scores(conn: Any, batch_size: int) -> Dict[str, int]:
+    rescored = {'artworks': 0, 'forum_threads': 0}
+    scores = {
+        'artworks': 'artwork_hot_score(likes_count, comments_count, created_at)',
+        'forum_threads': 'thread_hot_score(votes_score, replies_count, created_at)',
+    }
+    
+    with conn.cursor() as cur:
+        for table, score in scores.items():
+            for lower, upper in _id_batches(cur, table, batch_size):
+                cur.execute("""
+                    UPDATE """ + table + """ SET hot_score = CASE
+                        WHEN created_at > now() - %s * interval '1 day' THEN """ + score + """
+                        ELSE 0
+                    END
+                    WHERE id > %s AND id <= %s
+                      AND (created_at > now() - %s * interval '1 day' OR hot_score <> 0)
+                """, (HOT_SCORE_WINDOW_DAYS, lower, upper, HOT_SCORE_WINDOW_DAYS))
+                rescored[table] += cur.rowcount
+                conn.commit()
+    
+    return rescored
+
+
+def prune_cache_invalidations(conn: Any, batch_size: int) -> Dict[str, int]:
+    with conn.cursor() as cur:
+        cur.execute(
+            "DELETE FROM cache_invalidations WHERE created_at < now() - %s * interval '1 second'",
+            (CACHE_LOG_RETENTION_SECONDS,)
+        )
+        deleted = cur.rowcount
+    conn.commit()
+    return {'deleted': deleted}
+
+
+def prune_revoked_tokens(conn: Any, batch_size: int) -> Dict[str, int]:
+    # Expired tokens fail verification on their own, so their deny-list rows are dead weight
+    with conn.cursor() as cur:
+        cur.execute("DELETE FROM revoked_tokens WHERE expires_at < now()")
+        deleted = cur.rowcount
+    conn.commit()
+    return {'deleted': deleted}
+
+
+def _coalesce(events: list) -> list:
+    groups: Dict[Tuple[int, str, int], Dict[str, Any]] = {}
+    for event_type, subject_id, actor_id, username, created_at, recipient_id in events:
+        if recipient_id is None or recipient_id == actor_id or event_type not in NOTIFICATION_MESSAGES:
+            continue
+        group = groups.setdefault((recipient_id, event_type, subject_id), {'actors': set()})
+        group['actors'].add(actor_id)
+        group.update(actor_id=actor_id, username=username, created_at=created_at)
+    
+    rows = []
+    for (recipient_id, event_type, subject_id), group in groups.items():
+        others = len(group['actors']) - 1
+        single, several = NOTIFICATION_MESSAGES[event_type]
+        message = several % (group['username'], others) if others else single % group['username']
+        rows.append((recipient_id, group['actor_id'], event_type, subject_id, message,
+                     len(group['actors']), group['created_at']))
+    return rows
+
+
+def drain_outbox(conn: Any, batch_size: int) -> Dict[str, int]:
+    drained = {'events': 0, 'notifications': 0}
+    
+    with conn.cursor() as cur:
+        while True:
+            cur.execute(OUTBOX_DRAIN, (batch_size,))
+            events = cur.fetchall()
+            rows = _coalesce(events)
+            
+            if rows:
+                execute_values(cur, """
+                    INSERT INTO notifications
+                        (user_id, from_user_id, notification_type, related_id, message, actor_count, created_at)
+                    VALUES %s
+                """, rows)
+                unread = Counter(row[0] for row in rows)
+                execute_values(cur, """
+                    UPDATE users u SET unread_notifications_count = u.unread_notifications_count + v.n
+                    FROM (VALUES %s) AS v(id, n)
+                    WHERE u.id = v.id
+                """, list(unread.items()))
+            conn.commit()
+            
+            drained['events'] += len(events)
+            drained['notifications'] += len(rows)
+            if len(events) < batch_size:
+                return drained
+
+
+JOBS: Dict[str, Callable[[Any, int], Dict[str, int]]] = {
+    'reconcile_counters': reconcile_counters,
+    'prune_cache_invalidations': prune_cache_invalidations,
+    'prune_revoked_tokens': prune_revoked_tokens,
+    'drain_outbox': drain_outbox,
+    'redecay_hot_scores': redecay_hot_scores,
+}
+
+
+def _authorized(event: Dict[str, Any]) -> bool:
+    headers = event.get('headers') or {}
+    supplied = next((value for key, value in headers.items() if key.lower() == 'x-jobs-secret'), None) or ''
+    # An unset secret disables the endpoint rather than opening it
+    return bool(JOBS_SECRET) and hmac.compare_digest(supplied.encode(), JOBS_SECRET.encode())
+
+
+def _batch_size(value: Any) -> int:
+    if isinstance(value, (bool, float)):
+        return 0
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return 0
+
+
+def _error(status: int, message: str) -> Dict[str, Any]:
+    return {
+        'statusCode': status,
+        'headers': {
+            'Content-Type': 'application/json',
+            'Access-Control-Allow-Origin': '*'
+        },
+        'body': dumps({'error': message})
+    }
+
+
+@instrumented('jobs', actions=tuple(JOBS))
+def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
+    if not _authorized(event):
+        return _error(401, 'Job secret required')
+    
+    try:
+        body_data = json.loads(event.get('body') or '{}')
+    except ValueError:
+        return _error(400, 'Invalid JSON body')
+    if not isinstance(body_data, dict):
+        return _error(400, 'Invalid JSON body')
+    action = body_data.get('action')
+    batch_size = _batch_size(body_data.get('batchSize', DEFAULT_BATCH_SIZE))
+    
+    if action and action not in JOBS:
+        return _error(400, 'Unknown job')
+    if batch_size < 1:
+        return _error(400, 'batchSize must be an integer of at least 1')
+    
+    names = [action] if action else list(JOBS)
+    
+    pool = get_pool()
+    conn = pool.getconn()
+    
+    try:
+        results = {name: JOBS[name](conn, batch_size) for name in names}
+        
+        return {
+            'statusCode': 200,
+            'headers': {
+                'Content-Type': 'application/json',
+                'Access-Control-Allow-Origin': '*'
+            },
+            'body': dumps(results)
+        }
+    
+    finally:
+        pool.putconn(conn)
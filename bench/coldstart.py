@@ -0,0 +1,190 @@
+'''
+Business: Measure cold starts of every backend/<function>/index.py apart from its warm latency
+Args: --dsn of a seeded database, --functions, --runs fresh processes per function, --requests warm requests, --no-prewarm, --save/--compare baseline paths
+Returns: median startup profile and warm p50/p95 per function; exit code 1 on regression
+
+Each run starts a new interpreter in the function's directory, the way a
+fresh instance boots, and records:
+
+- index_ms: importing index.py (the part of init the platform waits for),
+- options_ms: answering a CORS preflight on the cold instance,
+- app_import_ms, connect_ms, warm_up_ms, ready_ms: the background load from
+  startup.LazyApp (app.py imports, pooled connections, statement planning),
+- first_ms, first_connect_ms, first_query_ms: the first real request, the
+  connect it still paid for and its first statement,
+- warm_p50_ms, warm_p95_ms: --requests more of the same request.
+
+Point DATABASE_URL at a database prepared with bench/seed.py.
+'''
+
+import argparse
+import importlib
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+import uuid
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Any, Dict, List
+
+BENCH = Path(__file__).resolve().parent
+BACKEND = BENCH.parent / 'backend'
+FUNCTIONS = ('artworks', 'auth', 'forum', 'interactions', 'jobs')
+REGRESSION_THRESHOLD = 0.25
+COMPARED = ('index_ms', 'options_ms', 'first_ms', 'warm_p95_ms')
+
+# The request a freshly booted instance of each function most often serves first
+FIRST_REQUESTS: Dict[str, Dict[str, Any]] = {
+    'artworks': {'httpMethod': 'GET'},
+    'auth': {'httpMethod': 'GET', 'queryStringParameters': {'userId': '1'}},
+    'forum': {'httpMethod': 'GET'},
+    'interactions': {'httpMethod': 'POST', 'body': json.dumps({'action': 'get_comments', 'artworkId': 1})},
+    'jobs': {'httpMethod': 'POST', 'headers': {'X-Jobs-Secret': os.environ.setdefault('JOBS_SECRET', 'bench')},
+             'body': json.dumps({'action': 'prune_cache_invalidations'})},
+}
+
+
+def _ms(started: float) -> float:
+    return round((time.perf_counter() - started) * 1000, 3)
+
+
+def _call(index: Any, event: Dict[str, Any]) -> int:
+    try:
+        return index.handler(dict(event), SimpleNamespace(request_id=uuid.uuid4().hex)).get('statusCode', 200)
+    except Exception:
+        return 599
+
+
+def child(name: str, requests: int) -> Dict[str, Any]:
+    # bench/ stays on sys.path behind the function directory
+    sys.path.insert(0, str(BACKEND / name))
+
+    started = time.perf_counter()
+    index = importlib.import_module('index')
+    result: Dict[str, Any] = {'index_ms': _ms(started)}
+
+    app = getattr(index, 'app', None)
+    if app is not None:
+        started = time.perf_counter()
+        _call(index, {'httpMethod': 'OPTIONS'})
+        result['options_ms'] = _ms(started)
+
+    event = dict(FIRST_REQUESTS[name])
+    event['headers'] = dict(event.get('headers', {}), **{'Accept-Encoding': 'gzip, deflate, br'})
+    seen: List[Any] = []
+    started = time.perf_counter()
+    # Waits on the background import of metrics when it is still running, as the request itself would
+    importlib.import_module('metrics').add_listener(seen.append)
+    status = _call(index, event)
+    result['first_ms'] = _ms(started)
+    result['first_status'] = status
+    if seen:
+        result['first_connect_ms'] = round(seen[0].connect_ms, 3)
+        result['first_query_ms'] = round(seen[0].queries[0]['ms'], 3) if seen[0].queries else 0.0
+
+    if app is not None:
+        profile = dict(app.profile)
+        result['app_import_ms'] = profile.get('import_ms', 0.0)
+        for key in ('connect_ms', 'warm_ms', 'ready_ms', 'connections', 'error'):
+            if key in profile:
+                result['warm_up_ms' if key == 'warm_ms' else key] = profile[key]
+
+    from run import percentile
+    latency = []
+    for _ in range(requests):
+        started = time.perf_counter()
+        _call(index, event)
+        latency.append((time.perf_counter() - started) * 1000)
+    result['warm_p50_ms'] = round(percentile(latency, 50), 3)
+    result['warm_p95_ms'] = round(percentile(latency, 95), 3)
+    return result
+
+
+def cold_start(name: str, requests: int, dsn: str, prewarm: bool) -> Dict[str, Any]:
+    env = dict(os.environ, DATABASE_URL=dsn, METRICS_LOG='0', CACHE_MAX_BYTES='0',
+               DB_PREWARM=os.environ.get('DB_PREWARM', '1') if prewarm else '0')
+    output = subprocess.run(
+        [sys.executable, str(Path(__file__).resolve()), '--child', name, '--requests', str(requests)],
+        cwd=str(BACKEND / name), env=env, check=True, stdout=subprocess.PIPE, universal_newlines=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def run(functions: List[str], runs: int, requests: int, dsn: str, prewarm: bool) -> Dict[str, Any]:
+    results = {}
+    for name in functions:
+        samples = [cold_start(name, requests, dsn, prewarm) for _ in range(runs)]
+        row: Dict[str, Any] = {'runs': runs}
+        for key, value in samples[0].items():
+            if isinstance(value, (int, float)) and key not in ('first_status', 'connections'):
+                row[key] = round(statistics.median(sample.get(key, 0.0) for sample in samples), 3)
+        row['errors'] = sorted({sample['error'] for sample in samples if 'error' in sample}
+                               | {'first request returned %d' % sample['first_status']
+                                  for sample in samples if sample['first_status'] >= 500})
+        results[name] = row
+    return {'prewarm': prewarm, 'requests': requests, 'results': results}
+
+
+def print_report(report: Dict[str, Any]) -> None:
+    columns = ('index_ms', 'options_ms', 'app_import_ms', 'connect_ms', 'warm_up_ms', 'ready_ms',
+               'first_ms', 'first_connect_ms', 'first_query_ms', 'warm_p50_ms', 'warm_p95_ms')
+    print('prewarm=%s warm requests=%d (medians, ms)' % (report['prewarm'], report['requests']))
+    print('%-13s' % 'function' + ''.join('%14s' % column[:-3] for column in columns))
+    for name, row in report['results'].items():
+        print('%-13s' % name + ''.join('%14s' % ('%.2f' % row[column] if column in row else '-') for column in columns))
+        for error in row['errors']:
+            print('  ERROR ' + error)
+
+
+def compare(report: Dict[str, Any], baseline: Dict[str, Any], threshold: float) -> List[str]:
+    regressions = []
+    for name, row in report['results'].items():
+        base = baseline['results'].get(name)
+        if not base:
+            continue
+        for metric in COMPARED:
+            if base.get(metric) and metric in row and row[metric] > base[metric] * (1 + threshold):
+                regressions.append('%s %s %.2f -> %.2f' % (name, metric, base[metric], row[metric]))
+    return regressions
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--dsn', default=os.environ.get('DATABASE_URL'))
+    parser.add_argument('--functions', default=','.join(FUNCTIONS))
+    parser.add_argument('--runs', type=int, default=5, help='fresh processes per function')
+    parser.add_argument('--requests', type=int, default=50, help='warm requests after the first one')
+    parser.add_argument('--no-prewarm', action='store_true', help='boot with DB_PREWARM=0 to see what warm-up saves')
+    parser.add_argument('--save', help='write the report to this baseline file')
+    parser.add_argument('--compare', help='baseline file to check for regressions')
+    parser.add_argument('--threshold', type=float, default=REGRESSION_THRESHOLD)
+    parser.add_argument('--child', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(child(args.child, args.requests)))
+        return 0
+
+    if not args.dsn:
+        parser.error('--dsn or DATABASE_URL is required')
+
+    report = run(args.functions.split(','), args.runs, args.requests, args.dsn, not args.no_prewarm)
+    print_report(report)
+
+    if args.save:
+        Path(args.save).parent.mkdir(parents=True, exist_ok=True)
+        Path(args.save).write_text(json.dumps(report, indent=2) + '\n')
+
+    if args.compare:
+        regressions = compare(report, json.loads(Path(args.compare).read_text()), args.threshold)
+        for line in regressions:
+            print('REGRESSION ' + line)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,49 @@
+'''
+Business: Load the backend/<function>/index.py handlers side by side in one process
+Args: function names under backend/
+Returns: handler callables and their private metrics modules
+
+Every function vendors modules with the same names (db, metrics, cache, ...),
+so each one is imported with its own directory on sys.path and its modules
+are then detached from sys.modules. Each handler keeps its own pool and
+histograms, as it would in its own deployment. index.py loads app.py on a
+background thread, so loading waits for it before the directory leaves
+sys.path.
+'''
+
+import importlib
+import sys
+from pathlib import Path
+from typing import Any, Callable, Dict, NamedTuple
+
+BACKEND = Path(__file__).resolve().parent.parent / 'backend'
+FUNCTIONS = ('artworks', 'auth', 'forum', 'interactions')
+
+
+class LoadedFunction(NamedTuple):
+    name: str
+    handler: Callable[[Dict[str, Any], Any], Dict[str, Any]]
+    modules: Dict[str, Any]
+
+
+def load_function(name: str) -> LoadedFunction:
+    directory = str(BACKEND / name)
+    before = set(sys.modules)
+    sys.path.insert(0, directory)
+    try:
+        index = importlib.import_module('index')
+        if hasattr(index, 'app'):
+            index.app.get()
+    finally:
+        sys.path.remove(directory)
+
+    modules = {}
+    for module_name in set(sys.modules) - before:
+        module = sys.modules[module_name]
+        if getattr(module, '__file__', None) and str(Path(module.__file__).parent) == directory:
+            modules[module_name] = sys.modules.pop(module_name)
+    return LoadedFunction(name, index.handler, modules)
+
+
+def load_all() -> Dict[str, LoadedFunction]:
+    return {name: load_function(name) for name in FUNCTIONS}
@@ -0,0 +1,209 @@
+'''
+Business: Check the query plan of every SQL statement the handlers issue against index, row-estimate and buffer budgets
+Args: --dsn of a local database (--seed loads the --scale large dataset into it first), --mix of requests to drive, --budgets file
+Returns: one verdict line per distinct statement; exit code 1 when a budget is broken or a statement has no budget
+
+Every request of the mix (bench/mixes.json "plans" by default, which reaches
+each read and write mode of the four handlers) is run once with
+METRICS_CAPTURE_SQL=1, so each statement is captured exactly as it was sent.
+Each distinct statement is then replayed under EXPLAIN (ANALYZE, BUFFERS) in
+a transaction that is rolled back, and checked against the first budget in
+bench/plans.json whose "match" regex finds it:
+
+- every index listed in "indexes" appears in the plan ("a|b" accepts either),
+- no Seq Scan touches one of "large_tables" unless listed in "seq_scan_ok",
+- shared buffers hit + read stay within "max_buffers",
+- no scan or join node misestimates its rows by more than "max_misestimate"
+  once estimate or actual reaches "misestimate_min_rows".
+
+A statement matching no budget fails too, so a new query cannot ship without
+a plan expectation.
+'''
+
+import argparse
+import json
+import os
+import random
+import re
+import sys
+import uuid
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+BENCH = Path(__file__).resolve().parent
+MIN_ARTWORKS = 500000
+
+
+def normalized(sql: str) -> str:
+    return ' '.join(sql.split())
+
+
+def capture(mix: str, dsn: str) -> List[Tuple[str, str, str]]:
+    os.environ['DATABASE_URL'] = dsn
+    os.environ['METRICS_LOG'] = '0'
+    os.environ['METRICS_CAPTURE_SQL'] = '1'
+    os.environ.setdefault('AUTH_TOKEN_SECRETS', 'bench')
+    # Every request must reach the database, not a body cached by an earlier one
+    os.environ['CACHE_MAX_BYTES'] = '0'
+
+    sys.path.insert(0, str(BENCH))
+    from handlers import load_all
+    from run import Placeholders, build_event, load_entries, seeded_ranges
+
+    functions = load_all()
+    captured: List[Any] = []
+    for loaded in functions.values():
+        loaded.modules['metrics'].add_listener(lambda m: captured.append(m))
+
+    placeholders = Placeholders(seeded_ranges(dsn))
+    statements: Dict[str, Tuple[str, str, str]] = {}
+    for entry in load_entries(mix):
+        del captured[:]
+        event = build_event(entry, placeholders)
+        response = functions[entry['function']].handler(event, SimpleNamespace(request_id=uuid.uuid4().hex))
+        status = response.get('statusCode', 200)
+        if status >= 500:
+            print('WARN  %s returned %d' % (entry['name'], status))
+        for metrics in captured:
+            for query in metrics.queries:
+                statement = query.get('statement')
+                if statement is not None:
+                    statements.setdefault(normalized(statement), (entry['function'], entry['name'], statement))
+    return list(statements.values())
+
+
+def budget_for(statement: str, budgets: List[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    text = normalized(statement)
+    for budget in budgets:
+        if re.search(budget['match'], text):
+            return budget
+    return None
+
+
+def plan_nodes(node: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+    yield node
+    for child in node.get('Plans', ()):
+        yield from plan_nodes(child)
+
+
+def explain(conn: Any, statement: str) -> Dict[str, Any]:
+    with conn.cursor() as cur:
+        try:
+            cur.execute('EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) ' + statement)
+            return cur.fetchone()[0][0]
+        finally:
+            # ANALYZE really runs writes; none of them may stick
+            conn.rollback()
+
+
+def check(plan: Dict[str, Any], budget: Dict[str, Any], defaults: Dict[str, Any], large_tables: List[str]) -> List[str]:
+    limits = dict(defaults, **budget)
+    nodes = list(plan_nodes(plan['Plan']))
+    problems = []
+
+    used = {node['Index Name'] for node in nodes if 'Index Name' in node}
+    for expected in limits.get('indexes', ()):
+        if not used.intersection(expected.split('|')):
+            problems.append('index %s not used (used: %s)' % (expected, ', '.join(sorted(used)) or 'none'))
+
+    allowed = set(limits.get('seq_scan_ok', ()))
+    for node in nodes:
+        table = node.get('Relation Name')
+        if node['Node Type'] == 'Seq Scan' and table in large_tables and table not in allowed:
+            problems.append('seq scan on %s' % table)
+
+    root = plan['Plan']
+    buffers = root.get('Shared Hit Blocks', 0) + root.get('Shared Read Blocks', 0)
+    if buffers > limits['max_buffers']:
+        problems.append('%d buffers > %d' % (buffers, limits['max_buffers']))
+
+    for node in nodes:
+        if node.get('Actual Loops', 1) == 0:
+            continue
+        estimated, actual = node['Plan Rows'], node['Actual Rows']
+        if max(estimated, actual) < limits['misestimate_min_rows']:
+            continue
+        ratio = max(estimated, actual) / float(max(min(estimated, actual), 1))
+        if ratio > limits['max_misestimate']:
+            problems.append('%s%s estimated %d rows, got %d' % (
+                node['Node Type'], ' on ' + node['Relation Name'] if 'Relation Name' in node else '', estimated, actual))
+    return problems
+
+
+def dataset_size(conn: Any) -> int:
+    with conn.cursor() as cur:
+        cur.execute("SELECT reltuples::bigint FROM pg_class WHERE relname = 'artworks'")
+        row = cur.fetchone()
+    conn.rollback()
+    return row[0] if row else 0
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--dsn', default=os.environ.get('DATABASE_URL'))
+    parser.add_argument('--seed', action='store_true', help='reset the database and load the dataset first')
+    parser.add_argument('--scale', default='large', help='bench/seed.py scale used with --seed')
+    parser.add_argument('--mix', default='plans')
+    parser.add_argument('--budgets', default=str(BENCH / 'plans.json'))
+    parser.add_argument('--min-artworks', type=int, default=MIN_ARTWORKS,
+                        help='refuse to judge plans on a smaller dataset, where seq scans are legitimately cheaper')
+    parser.add_argument('--random-seed', type=int, default=42)
+    parser.add_argument('--verbose', action='store_true', help='print the full plan of every failing statement')
+    args = parser.parse_args()
+
+    if not args.dsn:
+        parser.error('--dsn or DATABASE_URL is required')
+
+    import psycopg2
+
+    if args.seed:
+        sys.path.insert(0, str(BENCH))
+        from seed import SCALES, seed
+        seed(args.dsn, dict(SCALES[args.scale]), reset=True)
+
+    conn = psycopg2.connect(args.dsn)
+    try:
+        artworks = dataset_size(conn)
+        if artworks < args.min_artworks:
+            print('dataset has ~%d artworks, need %d: run with --seed or bench/seed.py --scale large' % (
+                artworks, args.min_artworks))
+            return 2
+
+        random.seed(args.random_seed)
+        config = json.loads(Path(args.budgets).read_text())
+        statements = capture(args.mix, args.dsn)
+
+        failures = 0
+        for function, request, statement in statements:
+            budget = budget_for(statement, config['budgets'])
+            preview = normalized(statement)[:90]
+            if budget is None:
+                failures += 1
+                print('FAIL  %-12s %-28s no budget matches: %s' % (function, request, preview))
+                continue
+            if budget.get('explain') is False:
+                continue
+            try:
+                plan = explain(conn, statement)
+            except psycopg2.IntegrityError as e:
+                # Replaying an INSERT the capture run already committed
+                print('SKIP  %-12s %-28s %s: %s' % (function, request, budget['name'], str(e).splitlines()[0]))
+                continue
+            problems = check(plan, budget, config['defaults'], config['large_tables'])
+            if problems:
+                failures += 1
+                print('FAIL  %-12s %-28s %s: %s' % (function, request, budget['name'], '; '.join(problems)))
+                if args.verbose:
+                    print(json.dumps(plan, indent=2))
+            else:
+                print('ok    %-12s %-28s %s (%.2f ms)' % (function, request, budget['name'], plan['Execution Time']))
+
+        print('%d statements, %d failing' % (len(statements), failures))
+        return 1 if failures else 0
+    finally:
+        conn.close()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,260 @@
+'''
+Business: Replay weighted request mixes against the handlers in-process and report latency
+Args: --mix name from bench/mixes.json, --concurrency, --duration, --warmup, --save/--compare baseline paths
+Returns: p50/p95/p99 latency, throughput and queries per request per mix entry; exit code 1 on regression
+
+Mix entries either reference a case from backend/<function>/tests.json by
+name ("test", with an optional "body" override) or describe the request
+inline, optionally with extra request "headers". String values may contain
+{{user}}, {{artwork}}, {{thread}} (a random seeded id) or {{seq}} (unique
+per run). Point DATABASE_URL at a database
+prepared with bench/seed.py.
+'''
+
+import argparse
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Any, Dict, List
+
+BENCH = Path(__file__).resolve().parent
+PLACEHOLDER = re.compile(r'\{\{(\w+)\}\}')
+REGRESSION_THRESHOLD = 0.15
+
+
+def percentile(samples: List[float], p: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, int(round(p / 100.0 * len(ordered))) - 1))
+    return ordered[index]
+
+
+class Placeholders:
+    def __init__(self, ranges: Dict[str, tuple]):
+        self.ranges = ranges
+        self.run_id = uuid.uuid4().hex[:8]
+        self._seq = 0
+        self._lock = threading.Lock()
+
+    def value(self, name: str) -> Any:
+        if name == 'seq':
+            with self._lock:
+                self._seq += 1
+                return '%s%d' % (self.run_id, self._seq)
+        low, high = self.ranges[name]
+        return random.randint(low, high)
+
+    def fill(self, template: Any, as_int: bool) -> Any:
+        if isinstance(template, dict):
+            return {k: self.fill(v, as_int) for k, v in template.items()}
+        if isinstance(template, list):
+            return [self.fill(v, as_int) for v in template]
+        if not isinstance(template, str):
+            return template
+        whole = PLACEHOLDER.fullmatch(template)
+        if whole and as_int and whole.group(1) != 'seq':
+            return self.value(whole.group(1))
+        return PLACEHOLDER.sub(lambda m: str(self.value(m.group(1))), template)
+
+
+def seeded_ranges(dsn: str) -> Dict[str, tuple]:
+    import psycopg2
+
+    conn = psycopg2.connect(dsn)
+    try:
+        with conn.cursor() as cur:
+            ranges = {}
+            for name, table in (('user', 'users'), ('artwork', 'artworks'), ('thread', 'forum_threads')):
+                cur.execute('SELECT MIN(id), MAX(id) FROM ' + table)
+                low, high = cur.fetchone()
+                ranges[name] = (low or 1, high or 1)
+            return ranges
+    finally:
+        conn.close()
+
+
+def load_entries(mix: str) -> List[Dict[str, Any]]:
+    entries = json.loads((BENCH / 'mixes.json').read_text())[mix]
+    tests: Dict[str, Dict[str, Any]] = {}
+    resolved = []
+    for entry in entries:
+        entry = dict(entry)
+        if 'test' in entry:
+            function = entry['function']
+            if function not in tests:
+                path = BENCH.parent / 'backend' / function / 'tests.json'
+                tests[function] = {t['name']: t for t in json.loads(path.read_text())['tests']}
+            case = tests[function][entry['test']]
+            entry.setdefault('name', case['name'])
+            entry.setdefault('method', case['method'])
+            entry['body'] = dict(case.get('body') or {}, **entry.get('body', {})) if 'body' in case else entry.get('body')
+        resolved.append(entry)
+    return resolved
+
+
+def build_event(entry: Dict[str, Any], placeholders: Placeholders) -> Dict[str, Any]:
+    # Browsers always offer gzip, so large bodies pay for compression here too
+    event: Dict[str, Any] = {'httpMethod': entry['method'], 'headers': {'Accept-Encoding': 'gzip, deflate, br'}}
+    if entry.get('headers'):
+        event['headers'].update(placeholders.fill(entry['headers'], as_int=False))
+    if entry.get('query'):
+        event['queryStringParameters'] = placeholders.fill(entry['query'], as_int=False)
+    if entry.get('body') is not None:
+        event['body'] = json.dumps(placeholders.fill(entry['body'], as_int=True))
+    return event
+
+
+def run(mix: str, concurrency: int, duration: float, warmup: float, dsn: str) -> Dict[str, Any]:
+    os.environ.setdefault('DATABASE_URL', dsn)
+    os.environ.setdefault('METRICS_LOG', '0')
+    # Login and register sign the tokens they hand out
+    os.environ.setdefault('AUTH_TOKEN_SECRETS', 'bench')
+    os.environ['DB_POOL_SIZE'] = str(max(concurrency, int(os.environ.get('DB_POOL_SIZE', '4'))))
+
+    sys.path.insert(0, str(BENCH))
+    from handlers import load_all
+
+    functions = load_all()
+    last_request = threading.local()
+    for loaded in functions.values():
+        loaded.modules['metrics'].add_listener(lambda m: setattr(last_request, 'metrics', m))
+
+    entries = load_entries(mix)
+    weights = [entry['weight'] for entry in entries]
+    placeholders = Placeholders(seeded_ranges(dsn))
+
+    samples: Dict[str, Dict[str, List[float]]] = {
+        entry['name']: {'latency': [], 'queries': [], 'errors': []} for entry in entries
+    }
+    lock = threading.Lock()
+    measuring = threading.Event()
+    stop = threading.Event()
+
+    def worker() -> None:
+        while not stop.is_set():
+            entry = random.choices(entries, weights)[0]
+            event = build_event(entry, placeholders)
+            context = SimpleNamespace(request_id=uuid.uuid4().hex)
+            last_request.metrics = None
+            started = time.perf_counter()
+            try:
+                status = functions[entry['function']].handler(event, context).get('statusCode', 200)
+            except Exception:
+                status = 599
+            elapsed = (time.perf_counter() - started) * 1000
+            if not measuring.is_set():
+                continue
+            metrics = last_request.metrics
+            with lock:
+                bucket = samples[entry['name']]
+                bucket['latency'].append(elapsed)
+                bucket['queries'].append(len(metrics.queries) if metrics else 0)
+                bucket['errors'].append(1 if status >= 500 else 0)
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        for _ in range(concurrency):
+            executor.submit(worker)
+        time.sleep(warmup)
+        measuring.set()
+        measured_from = time.perf_counter()
+        time.sleep(duration)
+        stop.set()
+    elapsed_s = time.perf_counter() - measured_from
+
+    results = {}
+    for name, bucket in samples.items():
+        latency = bucket['latency']
+        results[name] = {
+            'requests': len(latency),
+            'errors': sum(bucket['errors']),
+            'rps': round(len(latency) / elapsed_s, 2),
+            'p50_ms': round(percentile(latency, 50), 3),
+            'p95_ms': round(percentile(latency, 95), 3),
+            'p99_ms': round(percentile(latency, 99), 3),
+            'queries_per_request': round(sum(bucket['queries']) / len(latency), 2) if latency else 0.0,
+        }
+
+    everything = [value for bucket in samples.values() for value in bucket['latency']]
+    results['TOTAL'] = {
+        'requests': len(everything),
+        'errors': sum(sum(bucket['errors']) for bucket in samples.values()),
+        'rps': round(len(everything) / elapsed_s, 2),
+        'p50_ms': round(percentile(everything, 50), 3),
+        'p95_ms': round(percentile(everything, 95), 3),
+        'p99_ms': round(percentile(everything, 99), 3),
+        'queries_per_request': round(
+            sum(sum(bucket['queries']) for bucket in samples.values()) / len(everything), 2
+        ) if everything else 0.0,
+    }
+
+    return {'mix': mix, 'concurrency': concurrency, 'duration_s': duration, 'results': results}
+
+
+def print_report(report: Dict[str, Any]) -> None:
+    print('mix=%s concurrency=%d duration=%ss' % (report['mix'], report['concurrency'], report['duration_s']))
+    print('%-28s %8s %6s %9s %9s %9s %9s %8s' % ('entry', 'requests', 'errors', 'rps', 'p50 ms', 'p95 ms', 'p99 ms', 'q/req'))
+    for name, row in report['results'].items():
+        print('%-28s %8d %6d %9.1f %9.2f %9.2f %9.2f %8.2f' % (
+            name, row['requests'], row['errors'], row['rps'],
+            row['p50_ms'], row['p95_ms'], row['p99_ms'], row['queries_per_request'],
+        ))
+
+
+def compare(report: Dict[str, Any], baseline: Dict[str, Any], threshold: float) -> List[str]:
+    regressions = []
+    for name, row in report['results'].items():
+        base = baseline['results'].get(name)
+        if not base or not row['requests']:
+            continue
+        for metric in ('p95_ms', 'p99_ms'):
+            if base[metric] and row[metric] > base[metric] * (1 + threshold):
+                regressions.append('%s %s %.2f -> %.2f' % (name, metric, base[metric], row[metric]))
+        if row['rps'] < base['rps'] * (1 - threshold):
+            regressions.append('%s rps %.1f -> %.1f' % (name, base['rps'], row['rps']))
+        if row['queries_per_request'] > base['queries_per_request']:
+            regressions.append('%s queries_per_request %.2f -> %.2f' % (
+                name, base['queries_per_request'], row['queries_per_request']))
+    return regressions
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--dsn', default=os.environ.get('DATABASE_URL'))
+    parser.add_argument('--mix', default='mixed')
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--duration', type=float, default=30.0)
+    parser.add_argument('--warmup', type=float, default=5.0)
+    parser.add_argument('--save', help='write the report to this baseline file')
+    parser.add_argument('--compare', help='baseline file to check for regressions')
+    parser.add_argument('--threshold', type=float, default=REGRESSION_THRESHOLD)
+    args = parser.parse_args()
+
+    if not args.dsn:
+        parser.error('--dsn or DATABASE_URL is required')
+
+    report = run(args.mix, args.concurrency, args.duration, args.warmup, args.dsn)
+    print_report(report)
+
+    if args.save:
+        Path(args.save).parent.mkdir(parents=True, exist_ok=True)
+        Path(args.save).write_text(json.dumps(report, indent=2) + '\n')
+
+    if args.compare:
+        regressions = compare(report, json.loads(Path(args.compare).read_text()), args.threshold)
+        for line in regressions:
+            print('REGRESSION ' + line)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
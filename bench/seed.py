@@ -0,0 +1,192 @@
+'''
+Business: Seed a local Postgres with synthetic ArtHub data for benchmarks
+Args: --dsn (or DATABASE_URL), scale flags such as --users 100000 --artworks 1000000 --likes 10000000, --reset
+Returns: populated schema with counters backfilled and statistics analyzed
+
+Rows are generated server-side with generate_series, so seeding millions of
+rows never materializes them in Python. Artwork authorship is skewed toward
+low user ids to produce a few prolific artists.
+'''
+
+import argparse
+import os
+import sys
+import time
+from pathlib import Path
+import psycopg2
+
+ROOT = Path(__file__).resolve().parent.parent
+MIGRATIONS = ROOT / 'db_migrations'
+
+SCALES = {
+    'small': {'users': 1000, 'artworks': 10000, 'likes': 100000, 'comments': 20000,
+              'follows': 20000, 'threads': 2000, 'thread_comments': 10000, 'votes': 20000,
+              'notifications': 20000},
+    'large': {'users': 100000, 'artworks': 1000000, 'likes': 10000000, 'comments': 2000000,
+              'follows': 2000000, 'threads': 100000, 'thread_comments': 1000000, 'votes': 2000000,
+              'notifications': 2000000},
+}
+
+STEPS = [
+    ('users', """
+        INSERT INTO users (email, password_hash, username, bio, created_at)
+        SELECT 'user' || g || '@bench.local',
+               encode(sha256('password'::bytea), 'hex'),
+               'user' || g,
+               'Synthetic user ' || g,
+               now() - (random() * interval '730 days')
+        FROM generate_series(1, %(users)s) g
+    """),
+    ('artworks', """
+        INSERT INTO artworks (user_id, title, description, image_url, tags, created_at, updated_at)
+        SELECT 1 + floor(%(users)s * power(random(), 3))::int,
+               'Artwork ' || g,
+               'Synthetic artwork number ' || g || ' with a short description',
+               'https://example.com/art/' || g || '.jpg',
+               ARRAY['tag' || (g %% 50), 'style' || (g %% 7)],
+               ts, ts
+        FROM (SELECT g, now() - (random() * interval '365 days') AS ts
+              FROM generate_series(1, %(artworks)s) g) s
+    """),
+    ('artwork_likes', """
+        INSERT INTO artwork_likes (artwork_id, user_id)
+        SELECT (g %% %(artworks)s) + 1, ((g / %(artworks)s) %% %(users)s) + 1
+        FROM generate_series(0, LEAST(%(likes)s, %(artworks)s::bigint * %(users)s) - 1) g
+    """),
+    ('artwork_comments', """
+        INSERT INTO artwork_comments (artwork_id, user_id, comment_text, created_at)
+        SELECT 1 + floor(%(artworks)s * power(random(), 2))::int,
+               1 + floor(random() * %(users)s)::int,
+               'Synthetic comment ' || g,
+               now() - (random() * interval '365 days')
+        FROM generate_series(1, %(comments)s) g
+    """),
+    ('user_follows', """
+        INSERT INTO user_follows (follower_id, following_id)
+        SELECT ((g / %(users)s) %% %(users)s) + 1, 1 + floor(%(users)s * power(random(), 3))::int
+        FROM generate_series(0, %(follows)s - 1) g
+        ON CONFLICT DO NOTHING
+    """),
+    ('forum_threads', """
+        INSERT INTO forum_threads (user_id, title, content, thread_type, tags, created_at, updated_at)
+        SELECT 1 + floor(random() * %(users)s)::int,
+               'Thread ' || g,
+               'Synthetic discussion content for thread ' || g,
+               (ARRAY['discussion', 'question', 'showcase'])[1 + g %% 3],
+               ARRAY['topic' || (g %% 30)],
+               ts, ts
+        FROM (SELECT g, now() - (random() * interval '365 days') AS ts
+              FROM generate_series(1, %(threads)s) g) s
+    """),
+    ('thread_comments', """
+        INSERT INTO thread_comments (thread_id, user_id, comment_text, created_at)
+        SELECT 1 + floor(%(threads)s * power(random(), 2))::int,
+               1 + floor(random() * %(users)s)::int,
+               'Synthetic reply ' || g,
+               now() - (random() * interval '365 days')
+        FROM generate_series(1, %(thread_comments)s) g
+    """),
+    ('thread_votes', """
+        INSERT INTO thread_votes (thread_id, user_id, vote_value)
+        SELECT (g %% %(threads)s) + 1, ((g / %(threads)s) %% %(users)s) + 1,
+               CASE WHEN random() < 0.8 THEN 1 ELSE -1 END
+        FROM generate_series(0, LEAST(%(votes)s, %(threads)s::bigint * %(users)s) - 1) g
+    """),
+    ('notifications', """
+        INSERT INTO notifications (user_id, from_user_id, notification_type, related_id, message, is_read, created_at)
+        SELECT 1 + floor(%(users)s * power(random(), 3))::int,
+               1 + floor(random() * %(users)s)::int,
+               (ARRAY['like', 'comment', 'follow', 'reply'])[1 + g %% 4],
+               1 + floor(random() * %(artworks)s)::int,
+               'Synthetic notification ' || g,
+               random() < 0.8,
+               now() - (random() * interval '90 days')
+        FROM generate_series(1, %(notifications)s) g
+    """),
+]
+
+COUNTERS = """
+    UPDATE artworks a SET likes_count = s.n
+    FROM (SELECT artwork_id, COUNT(*) AS n FROM artwork_likes GROUP BY artwork_id) s
+    WHERE a.id = s.artwork_id;
+    UPDATE artworks a SET comments_count = s.n
+    FROM (SELECT artwork_id, COUNT(*) AS n FROM artwork_comments GROUP BY artwork_id) s
+    WHERE a.id = s.artwork_id;
+    UPDATE forum_threads t SET replies_count = s.n
+    FROM (SELECT thread_id, COUNT(*) AS n FROM thread_comments GROUP BY thread_id) s
+    WHERE t.id = s.thread_id;
+    UPDATE forum_threads t SET votes_score = s.n
+    FROM (SELECT thread_id, SUM(vote_value) AS n FROM thread_votes GROUP BY thread_id) s
+    WHERE t.id = s.thread_id;
+    UPDATE artworks SET hot_score = artwork_hot_score(likes_count, comments_count, created_at);
+    UPDATE forum_threads SET hot_score = thread_hot_score(votes_score, replies_count, created_at);
+    UPDATE users u SET unread_notifications_count = s.n
+    FROM (SELECT user_id, COUNT(*) AS n FROM notifications WHERE is_read = false GROUP BY user_id) s
+    WHERE u.id = s.user_id;
+    UPDATE users u SET followers_count = s.n
+    FROM (SELECT following_id, COUNT(*) AS n FROM user_follows GROUP BY following_id) s
+    WHERE u.id = s.following_id;
+    INSERT INTO artwork_feed (user_id, artwork_id, author_id, created_at)
+    SELECT f.follower_id, a.id, a.user_id, a.created_at
+    FROM user_follows f
+    JOIN users p ON p.id = f.following_id AND p.followers_count < %(feed_fanout_limit)s
+    JOIN artworks a ON a.user_id = f.following_id
+    ON CONFLICT DO NOTHING;
+"""
+
+
+def apply_migrations(conn) -> None:
+    with conn.cursor() as cur:
+        for path in sorted(MIGRATIONS.glob('V*.sql')):
+            cur.execute(path.read_text())
+    conn.commit()
+
+
+def seed(dsn: str, scale: dict, reset: bool) -> None:
+    conn = psycopg2.connect(dsn)
+    try:
+        if reset:
+            with conn.cursor() as cur:
+                cur.execute('DROP SCHEMA public CASCADE; CREATE SCHEMA public')
+            conn.commit()
+        apply_migrations(conn)
+
+        with conn.cursor() as cur:
+            for table, sql in STEPS:
+                started = time.perf_counter()
+                cur.execute(sql, scale)
+                conn.commit()
+                print('%-18s %10d rows  %7.1fs' % (table, cur.rowcount, time.perf_counter() - started))
+
+            started = time.perf_counter()
+            cur.execute(COUNTERS, {'feed_fanout_limit': int(os.environ.get('FEED_FANOUT_LIMIT', '1000'))})
+            cur.execute('ANALYZE')
+            conn.commit()
+            print('%-18s %10s       %7.1fs' % ('counters+analyze', '', time.perf_counter() - started))
+    finally:
+        conn.close()
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--dsn', default=os.environ.get('DATABASE_URL'))
+    parser.add_argument('--scale', choices=sorted(SCALES), default='small')
+    parser.add_argument('--reset', action='store_true', help='drop and recreate the public schema first')
+    for name in SCALES['small']:
+        parser.add_argument('--' + name.replace('_', '-'), type=int, dest=name)
+    args = parser.parse_args()
+
+    if not args.dsn:
+        parser.error('--dsn or DATABASE_URL is required')
+
+    scale = dict(SCALES[args.scale])
+    for name in scale:
+        if getattr(args, name) is not None:
+            scale[name] = getattr(args, name)
+
+    seed(args.dsn, scale, args.reset)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
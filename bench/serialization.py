@@ -0,0 +1,108 @@
+'''
+Business: Micro-benchmark the list-response serialization path against the RealDictCursor + json.dumps baseline
+Args: --rows per payload (default 50), --repeat timing rounds, --number payloads per round
+Returns: best-of-repeat microseconds per payload for both paths; exit code 1 if the bodies differ
+
+The baseline builds each row the way RealDictCursor does (a RealDictRow filled
+column by column), copies it with dict(row) and encodes with
+json.dumps(default=str). The lean path wraps the same tuples in Record rows
+and encodes with backend/artworks/encoding.py. Rows mimic ARTWORK_SELECT output: timestamps, tag arrays, NULLs, floats and non-ASCII
+text. No database is needed, only psycopg2 importable.
+'''
+
+import argparse
+import json
+import random
+import sys
+import timeit
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, List, Tuple
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'backend' / 'artworks'))
+
+from psycopg2.extras import RealDictRow  # noqa: E402
+from encoding import dumps, record_type  # noqa: E402
+
+COLUMNS = (
+    'id', 'user_id', 'title', 'description', 'image_url', 'tags', 'likes_count',
+    'comments_count', 'views', 'hot_score', 'created_at', 'updated_at', 'username', 'avatar_url',
+)
+TAGS = ('живопись', 'digital', 'portrait', 'пейзаж', 'sketch', 'anime', 'концепт')
+
+
+def synthetic_rows(count: int) -> List[Tuple[Any, ...]]:
+    rng = random.Random(42)
+    started = datetime(2024, 1, 1, 12, 0, 0)
+    rows = []
+    for i in range(count):
+        created_at = started + timedelta(seconds=rng.randint(0, 10 ** 7), microseconds=rng.randint(0, 999999))
+        rows.append((
+            100000 + i,
+            rng.randint(1, 5000),
+            'Работа #%d "%s"' % (i, rng.choice(TAGS)),
+            None if i % 3 else 'Описание работы %d\nс переносом строки' % i,
+            'https://cdn.example.com/art/%d.jpg' % i,
+            rng.sample(TAGS, rng.randint(0, 4)),
+            rng.randint(0, 10000),
+            rng.randint(0, 500),
+            rng.randint(0, 10 ** 6),
+            rng.random() * 1000,
+            created_at,
+            created_at + timedelta(hours=rng.randint(0, 48)),
+            'artist%d' % rng.randint(1, 5000),
+            None if i % 5 == 0 else 'https://cdn.example.com/avatars/%d.png' % i,
+        ))
+    return rows
+
+
+def real_dict_row(row: Tuple[Any, ...], mapping: List[str]) -> RealDictRow:
+    # Mirrors the cursor's row factory: one __setitem__ per column index
+    result = RealDictRow()
+    result[RealDictRow] = mapping
+    for i, value in enumerate(row):
+        result[i] = value
+    return result
+
+
+def baseline(rows: List[Tuple[Any, ...]]) -> str:
+    mapping = list(COLUMNS)
+    items = [dict(real_dict_row(row, mapping)) for row in rows]
+    return json.dumps({'items': items, 'next_cursor': 'MjAyNC0wMS0wMVQxMjowMDowMHwxMDA'}, default=str)
+
+
+def lean(rows: List[Tuple[Any, ...]]) -> str:
+    record = record_type(COLUMNS)
+    items = [record(row) for row in rows]
+    return dumps({'items': items, 'next_cursor': 'MjAyNC0wMS0wMVQxMjowMDowMHwxMDA'})
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=50)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--number', type=int, default=2000)
+    args = parser.parse_args()
+
+    rows = synthetic_rows(args.rows)
+    expected, actual = baseline(rows), lean(rows)
+    if expected != actual:
+        print('MISMATCH: lean body differs from json.dumps(default=str)')
+        for offset, (a, b) in enumerate(zip(expected, actual)):
+            if a != b:
+                print('first difference at %d: %r vs %r' % (offset, expected[offset:offset + 60], actual[offset:offset + 60]))
+                break
+        return 1
+
+    print('rows=%d body=%d bytes' % (args.rows, len(expected)))
+    results = {}
+    for name, fn in (('RealDictRow + json.dumps', baseline), ('Record + encoding.dumps', lean)):
+        best = min(timeit.repeat(lambda: fn(rows), repeat=args.repeat, number=args.number))
+        results[name] = best / args.number * 1e6
+        print('%-26s %9.1f us/payload' % (name, results[name]))
+    print('speedup %.2fx' % (results['RealDictRow + json.dumps'] / results['Record + encoding.dumps']))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
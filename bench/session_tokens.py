@@ -0,0 +1,111 @@
+'''
+Business: Micro-benchmark the per-request cost of signed session token verification
+Args: --revoked deny-list size, --repeat timing rounds, --number calls per round, optional --dsn for a session-lookup comparison
+Returns: best-of-repeat microseconds per call for each path; exit code 1 if a forged, expired or revoked token is accepted
+
+Times backend/auth/tokens.py as the handlers use it: decode_token() alone,
+verify_token() with a deny-list of --revoked entries, and the authenticated()
+decorator around a no-op handler for a like request with and without a token.
+With --dsn the same like request is also timed against a primary-key users
+lookup over a live connection. That is the cheapest sessions-table check a
+handler could do per request. Without --dsn no database is needed, only
+psycopg2 importable.
+'''
+
+import argparse
+import json
+import os
+import secrets
+import sys
+import time
+import timeit
+from pathlib import Path
+from typing import Any, Callable, Dict
+
+os.environ.setdefault('AUTH_TOKEN_SECRETS', 'bench-' + secrets.token_hex(16))
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'backend' / 'auth'))
+
+from tokens import authenticated, decode_token, deny_list, issue_token, verify_token  # noqa: E402
+
+
+def best_us(fn: Callable[[], Any], repeat: int, number: int) -> float:
+    return min(timeit.repeat(fn, repeat=repeat, number=number)) / number * 1e6
+
+
+def check_rejections(user_id: int) -> Dict[str, bool]:
+    token = issue_token(user_id, 'user')
+    payload, _, signature = token.rpartition('.')
+    forged = payload.replace('.%d.' % user_id, '.%d.' % (user_id + 1), 1) + '.' + signature
+    expired = issue_token(user_id, 'user', ttl=-1)
+    revoked = issue_token(user_id, 'user')
+    deny_list.add(revoked.split('.')[5], user_id, 0)
+    logged_out = issue_token(user_id + 2, 'user')
+    # Logged out everywhere a second after the token was issued
+    deny_list.add(None, user_id + 2, int(time.time()) + 1)
+    return {
+        'valid token accepted': verify_token(token) is not None,
+        'forged user id rejected': verify_token(forged) is None,
+        'expired token rejected': verify_token(expired) is None,
+        'revoked token rejected': verify_token(revoked) is None,
+        'logged out everywhere rejected': verify_token(logged_out) is None,
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--revoked', type=int, default=10000, help='deny-list entries held in memory')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--number', type=int, default=20000)
+    parser.add_argument('--dsn', help='also time a users primary-key lookup per request for comparison')
+    args = parser.parse_args()
+
+    now = int(time.time())
+    deny_list.replace([(secrets.token_hex(8), i, now) for i in range(args.revoked)])
+
+    failures = [name for name, ok in check_rejections(1).items() if not ok]
+    for name in failures:
+        print('FAIL  ' + name)
+
+    token = issue_token(42, 'user')
+    like = {'action': 'like', 'artworkId': 7, 'userId': 42}
+    plain_event = {'httpMethod': 'POST', 'headers': {}, 'body': json.dumps(like)}
+    token_event = {'httpMethod': 'POST', 'headers': {'Authorization': 'Bearer ' + token}, 'body': json.dumps(like)}
+
+    def noop(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
+        return {'statusCode': 200}
+
+    wrapped = authenticated(('userId', 'followerId'))(noop)
+    if wrapped(token_event, None)['statusCode'] != 200:
+        failures.append('authenticated like refused')
+        print('FAIL  authenticated like refused')
+
+    rows = [
+        ('decode_token', best_us(lambda: decode_token(token), args.repeat, args.number)),
+        ('verify_token', best_us(lambda: verify_token(token), args.repeat, args.number)),
+        ('handler, no decorator', best_us(lambda: noop(token_event, None), args.repeat, args.number)),
+        ('decorated, no token', best_us(lambda: wrapped(plain_event, None), args.repeat, args.number)),
+        ('decorated, with token', best_us(lambda: wrapped(token_event, None), args.repeat, args.number)),
+    ]
+
+    if args.dsn:
+        import psycopg2
+        conn = psycopg2.connect(args.dsn)
+        try:
+            def session_lookup() -> None:
+                body = json.loads(token_event['body'])
+                with conn.cursor() as cur:
+                    cur.execute('SELECT id, role FROM users WHERE id = %s', (body['userId'],))
+                    cur.fetchone()
+                conn.rollback()
+            rows.append(('users lookup per request', best_us(session_lookup, args.repeat, max(1, args.number // 20))))
+        finally:
+            conn.close()
+
+    print('deny-list entries=%d' % args.revoked)
+    for name, us in rows:
+        print('%-28s %10.2f us' % (name, us))
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
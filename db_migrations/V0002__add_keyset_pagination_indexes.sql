@@ -0,0 +1,7 @@
+-- Keyset pagination walks (created_at, id) in descending order
+CREATE INDEX IF NOT EXISTS idx_artworks_created_at_id ON artworks(created_at DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_artworks_user_created_at_id ON artworks(user_id, created_at DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_forum_threads_created_at_id ON forum_threads(created_at DESC, id DESC);
+
+-- Superseded by idx_artworks_created_at_id
+DROP INDEX IF EXISTS idx_artworks_created_at;
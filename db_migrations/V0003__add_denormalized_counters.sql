@@ -0,0 +1,22 @@
+-- Counters maintained by the like/comment/add_comment/vote writes
+ALTER TABLE artworks ADD COLUMN IF NOT EXISTS likes_count INTEGER NOT NULL DEFAULT 0;
+ALTER TABLE artworks ADD COLUMN IF NOT EXISTS comments_count INTEGER NOT NULL DEFAULT 0;
+ALTER TABLE forum_threads ADD COLUMN IF NOT EXISTS replies_count INTEGER NOT NULL DEFAULT 0;
+ALTER TABLE forum_threads ADD COLUMN IF NOT EXISTS votes_score INTEGER NOT NULL DEFAULT 0;
+
+-- Backfill from existing interaction rows
+UPDATE artworks a SET likes_count = s.n
+FROM (SELECT artwork_id, COUNT(*) AS n FROM artwork_likes GROUP BY artwork_id) s
+WHERE a.id = s.artwork_id;
+
+UPDATE artworks a SET comments_count = s.n
+FROM (SELECT artwork_id, COUNT(*) AS n FROM artwork_comments GROUP BY artwork_id) s
+WHERE a.id = s.artwork_id;
+
+UPDATE forum_threads t SET replies_count = s.n
+FROM (SELECT thread_id, COUNT(*) AS n FROM thread_comments GROUP BY thread_id) s
+WHERE t.id = s.thread_id;
+
+UPDATE forum_threads t SET votes_score = s.n
+FROM (SELECT thread_id, SUM(vote_value) AS n FROM thread_votes GROUP BY thread_id) s
+WHERE t.id = s.thread_id;
@@ -0,0 +1,8 @@
+-- Append-only log of cache tags touched by writes; warm instances replay it
+CREATE TABLE IF NOT EXISTS cache_invalidations (
+    id BIGSERIAL PRIMARY KEY,
+    tag TEXT NOT NULL,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT clock_timestamp()
+);
+
+CREATE INDEX IF NOT EXISTS idx_cache_invalidations_created_at ON cache_invalidations(created_at);
@@ -0,0 +1,40 @@
+-- Weighted search documents: title (A), tags (B), body text (C)
+ALTER TABLE artworks ADD COLUMN IF NOT EXISTS search_vector tsvector;
+ALTER TABLE forum_threads ADD COLUMN IF NOT EXISTS search_vector tsvector;
+
+CREATE OR REPLACE FUNCTION artworks_search_vector_update() RETURNS trigger AS $$
+BEGIN
+    NEW.search_vector :=
+        setweight(to_tsvector('russian', coalesce(NEW.title, '')), 'A') ||
+        setweight(to_tsvector('russian', coalesce(array_to_string(NEW.tags, ' '), '')), 'B') ||
+        setweight(to_tsvector('russian', coalesce(NEW.description, '')), 'C');
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION forum_threads_search_vector_update() RETURNS trigger AS $$
+BEGIN
+    NEW.search_vector :=
+        setweight(to_tsvector('russian', coalesce(NEW.title, '')), 'A') ||
+        setweight(to_tsvector('russian', coalesce(array_to_string(NEW.tags, ' '), '')), 'B') ||
+        setweight(to_tsvector('russian', coalesce(NEW.content, '')), 'C');
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_artworks_search_vector ON artworks;
+CREATE TRIGGER trg_artworks_search_vector
+    BEFORE INSERT OR UPDATE OF title, description, tags ON artworks
+    FOR EACH ROW EXECUTE FUNCTION artworks_search_vector_update();
+
+DROP TRIGGER IF EXISTS trg_forum_threads_search_vector ON forum_threads;
+CREATE TRIGGER trg_forum_threads_search_vector
+    BEFORE INSERT OR UPDATE OF title, content, tags ON forum_threads
+    FOR EACH ROW EXECUTE FUNCTION forum_threads_search_vector_update();
+
+-- Backfill existing rows through the triggers
+UPDATE artworks SET title = title WHERE search_vector IS NULL;
+UPDATE forum_threads SET title = title WHERE search_vector IS NULL;
+
+CREATE INDEX IF NOT EXISTS idx_artworks_search_vector ON artworks USING GIN(search_vector);
+CREATE INDEX IF NOT EXISTS idx_forum_threads_search_vector ON forum_threads USING GIN(search_vector);
@@ -0,0 +1,51 @@
+-- Array containment/overlap filters on tags
+CREATE INDEX IF NOT EXISTS idx_artworks_tags ON artworks USING GIN(tags);
+CREATE INDEX IF NOT EXISTS idx_forum_threads_tags ON forum_threads USING GIN(tags);
+
+-- Per-scope tag usage, maintained by triggers so facets never unnest the tables
+CREATE TABLE IF NOT EXISTS tag_counts (
+    scope VARCHAR(20) NOT NULL,
+    tag TEXT NOT NULL,
+    count INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (scope, tag)
+);
+
+CREATE INDEX IF NOT EXISTS idx_tag_counts_scope_count ON tag_counts(scope, count DESC);
+
+CREATE OR REPLACE FUNCTION tag_counts_update() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') AND OLD.tags IS NOT NULL THEN
+        UPDATE tag_counts SET count = count - 1
+        WHERE scope = TG_ARGV[0] AND tag = ANY(OLD.tags);
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') AND NEW.tags IS NOT NULL THEN
+        INSERT INTO tag_counts (scope, tag, count)
+        SELECT DISTINCT TG_ARGV[0], tag, 1 FROM unnest(NEW.tags) AS tag
+        ON CONFLICT (scope, tag) DO UPDATE SET count = tag_counts.count + 1;
+    END IF;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_artworks_tag_counts ON artworks;
+CREATE TRIGGER trg_artworks_tag_counts
+    AFTER INSERT OR UPDATE OF tags OR DELETE ON artworks
+    FOR EACH ROW EXECUTE FUNCTION tag_counts_update('artworks');
+
+DROP TRIGGER IF EXISTS trg_forum_threads_tag_counts ON forum_threads;
+CREATE TRIGGER trg_forum_threads_tag_counts
+    AFTER INSERT OR UPDATE OF tags OR DELETE ON forum_threads
+    FOR EACH ROW EXECUTE FUNCTION tag_counts_update('forum');
+
+-- Rebuild counts from the current rows
+DELETE FROM tag_counts;
+
+INSERT INTO tag_counts (scope, tag, count)
+SELECT 'artworks', tag, COUNT(*)
+FROM (SELECT DISTINCT id, unnest(tags) AS tag FROM artworks) s
+GROUP BY tag;
+
+INSERT INTO tag_counts (scope, tag, count)
+SELECT 'forum', tag, COUNT(*)
+FROM (SELECT DISTINCT id, unnest(tags) AS tag FROM forum_threads) s
+GROUP BY tag;
@@ -0,0 +1,20 @@
+-- Follower counts decide between push (fan-out on write) and pull (at read time)
+ALTER TABLE users ADD COLUMN IF NOT EXISTS followers_count INTEGER NOT NULL DEFAULT 0;
+
+UPDATE users u SET followers_count = s.n
+FROM (SELECT following_id, COUNT(*) AS n FROM user_follows GROUP BY following_id) s
+WHERE u.id = s.following_id;
+
+CREATE INDEX IF NOT EXISTS idx_users_followers_count ON users(followers_count DESC);
+CREATE INDEX IF NOT EXISTS idx_user_follows_following_id ON user_follows(following_id);
+
+-- Per-follower timeline rows pushed when a non-popular artist posts
+CREATE TABLE IF NOT EXISTS artwork_feed (
+    user_id INTEGER NOT NULL REFERENCES users(id),
+    artwork_id INTEGER NOT NULL REFERENCES artworks(id),
+    author_id INTEGER NOT NULL REFERENCES users(id),
+    created_at TIMESTAMP NOT NULL,
+    PRIMARY KEY (user_id, artwork_id)
+);
+
+CREATE INDEX IF NOT EXISTS idx_artwork_feed_user_created ON artwork_feed(user_id, created_at DESC, artwork_id DESC);
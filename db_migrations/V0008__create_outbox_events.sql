@@ -0,0 +1,21 @@
+-- Compact side-effect events written in the same transaction as the interaction
+CREATE TABLE IF NOT EXISTS outbox_events (
+    id BIGSERIAL PRIMARY KEY,
+    event_type VARCHAR(20) NOT NULL,
+    actor_id INTEGER NOT NULL,
+    subject_id INTEGER NOT NULL,
+    created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Coalesced notifications carry how many people they stand for
+ALTER TABLE notifications ADD COLUMN IF NOT EXISTS actor_count INTEGER NOT NULL DEFAULT 1;
+
+CREATE INDEX IF NOT EXISTS idx_notifications_unread
+    ON notifications(user_id, created_at DESC, id DESC) WHERE is_read = false;
+
+-- Maintained by the drainer and mark-read so the badge never counts rows
+ALTER TABLE users ADD COLUMN IF NOT EXISTS unread_notifications_count INTEGER NOT NULL DEFAULT 0;
+
+UPDATE users u SET unread_notifications_count = s.n
+FROM (SELECT user_id, COUNT(*) AS n FROM notifications WHERE is_read = false GROUP BY user_id) s
+WHERE u.id = s.user_id;
@@ -0,0 +1,7 @@
+-- Keyset pagination over a parent's comments in either direction
+CREATE INDEX IF NOT EXISTS idx_artwork_comments_artwork_created_id ON artwork_comments(artwork_id, created_at, id);
+CREATE INDEX IF NOT EXISTS idx_thread_comments_thread_created_id ON thread_comments(thread_id, created_at, id);
+
+-- Superseded by the composite indexes above
+DROP INDEX IF EXISTS idx_artwork_comments_artwork_id;
+DROP INDEX IF EXISTS idx_thread_comments_thread_id;
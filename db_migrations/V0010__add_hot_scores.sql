@@ -0,0 +1,30 @@
+-- Time decay shared by every hot score: (age in hours + 2) ^ -1.5. Writers add
+-- increments at the current decay; the redecay_hot_scores job recomputes
+-- scores from the counters.
+CREATE OR REPLACE FUNCTION hot_decay(created_at TIMESTAMP) RETURNS DOUBLE PRECISION AS $$
+    SELECT COALESCE(power(GREATEST(EXTRACT(EPOCH FROM (now() - created_at)) / 3600.0, 0) + 2, -1.5), 0)
+$$ LANGUAGE SQL STABLE;
+
+CREATE OR REPLACE FUNCTION artwork_hot_score(likes INTEGER, comments INTEGER, created_at TIMESTAMP)
+RETURNS DOUBLE PRECISION AS $$
+    SELECT (likes + 2 * comments) * hot_decay(created_at)
+$$ LANGUAGE SQL STABLE;
+
+CREATE OR REPLACE FUNCTION thread_hot_score(votes INTEGER, replies INTEGER, created_at TIMESTAMP)
+RETURNS DOUBLE PRECISION AS $$
+    SELECT (votes + 2 * replies) * hot_decay(created_at)
+$$ LANGUAGE SQL STABLE;
+
+ALTER TABLE artworks ADD COLUMN IF NOT EXISTS hot_score DOUBLE PRECISION NOT NULL DEFAULT 0;
+ALTER TABLE forum_threads ADD COLUMN IF NOT EXISTS hot_score DOUBLE PRECISION NOT NULL DEFAULT 0;
+
+UPDATE artworks SET hot_score = artwork_hot_score(likes_count, comments_count, created_at)
+WHERE likes_count > 0 OR comments_count > 0;
+UPDATE forum_threads SET hot_score = thread_hot_score(votes_score, replies_count, created_at)
+WHERE votes_score <> 0 OR replies_count > 0;
+
+-- sort=hot and sort=top read their first page straight off these
+CREATE INDEX IF NOT EXISTS idx_artworks_hot_score_id ON artworks(hot_score DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_artworks_likes_count_id ON artworks(likes_count DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_forum_threads_hot_score_id ON forum_threads(hot_score DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_forum_threads_votes_score_id ON forum_threads(votes_score DESC, id DESC);
@@ -0,0 +1,10 @@
+-- userId galleries sorted by hot or top; without these a prolific artist's
+-- page sorts every artwork they have ever posted
+CREATE INDEX IF NOT EXISTS idx_artworks_user_hot_score_id ON artworks(user_id, hot_score DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_artworks_user_likes_count_id ON artworks(user_id, likes_count DESC, id DESC);
+
+-- Leading columns of wider indexes: idx_artworks_created_at_id,
+-- UNIQUE(artwork_id, user_id) and idx_notifications_is_read serve the same lookups
+DROP INDEX IF EXISTS idx_artworks_created_at;
+DROP INDEX IF EXISTS idx_artwork_likes_artwork_id;
+DROP INDEX IF EXISTS idx_notifications_user_id;
@@ -0,0 +1,11 @@
+-- Deny-list for signed session tokens; a NULL token_id revokes every token the
+-- user was issued up to revoked_at. Rows only matter until expires_at.
+CREATE TABLE IF NOT EXISTS revoked_tokens (
+    id BIGSERIAL PRIMARY KEY,
+    token_id VARCHAR(32),
+    user_id INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+    revoked_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+    expires_at TIMESTAMPTZ NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS idx_revoked_tokens_expires_at ON revoked_tokens(expires_at);
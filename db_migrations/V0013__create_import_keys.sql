@@ -0,0 +1,28 @@
+-- Source keys of rows loaded by tools/bulk.py, so later files can reference
+-- users and artworks by the key they had in the system they came from
+CREATE TABLE IF NOT EXISTS import_keys (
+    entity VARCHAR(30) NOT NULL,
+    source_key TEXT NOT NULL,
+    id INTEGER NOT NULL,
+    PRIMARY KEY (entity, source_key)
+);
+
+-- Bulk loads set arthub.bulk_import for their transaction and add the tag
+-- counts of everything they inserted once at the end
+CREATE OR REPLACE FUNCTION tag_counts_update() RETURNS trigger AS $$
+BEGIN
+    IF current_setting('arthub.bulk_import', true) = 'on' THEN
+        RETURN NULL;
+    END IF;
+    IF TG_OP IN ('UPDATE', 'DELETE') AND OLD.tags IS NOT NULL THEN
+        UPDATE tag_counts SET count = count - 1
+        WHERE scope = TG_ARGV[0] AND tag = ANY(OLD.tags);
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') AND NEW.tags IS NOT NULL THEN
+        INSERT INTO tag_counts (scope, tag, count)
+        SELECT DISTINCT TG_ARGV[0], tag, 1 FROM unnest(NEW.tags) AS tag
+        ON CONFLICT (scope, tag) DO UPDATE SET count = tag_counts.count + 1;
+    END IF;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
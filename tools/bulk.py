@@ -0,0 +1,511 @@
+'''
+Business: Bulk import and export of users, artworks, likes, comments and follows through COPY
+Args: import|export, the kind, a .csv or .ndjson file (optionally .gz, or - with --format), --dsn, --batch-size,
+      --since for exports, --rebuild-indexes for imports into an idle database
+Returns: rows read, inserted and skipped (or exported) with rows per second on stderr; exit code 1 on a bad file
+
+Meant for seeding environments, moving data over from another gallery and
+analytics exports, instead of replaying POST /artworks or like/follow
+requests one row and one commit at a time. An import runs in one transaction:
+
+- the file is streamed into a temp table with COPY (NDJSON lines go in as
+  jsonb and are expanded in the database), so memory stays flat whatever the
+  file size,
+- every --batch-size rows are resolved and inserted by one INSERT ... SELECT
+  that joins the references against users, artworks and import_keys,
+- rows with a missing required field or a reference that does not resolve
+  are skipped, and so are duplicates (same email, like or follow),
+- tag counts, likes/comments/followers counters, hot scores, feed rows and
+  cache invalidations are written once at the end, as set-based statements.
+
+References: users by <ref>_id, <ref>_email or <ref>_key, artworks by
+artwork_id or artwork_key. A *_key is the "key" column of an earlier
+imported file, remembered in import_keys. Artworks whose key is already
+there are skipped, so re-running an artworks import adds nothing. Keys must
+be unique within one file. Exports write those same columns, so an export
+can be imported into another database.
+
+--rebuild-indexes drops the target table's secondary indexes for the load and
+recreates them once at the end. That locks the table for the whole import,
+so only use it on a database nothing else is writing to. Likes, comments and
+follows create no notifications or outbox events: they are history, not
+activity.
+'''
+
+import argparse
+import csv
+import gzip
+import os
+import sys
+import time
+from typing import Any, Callable, Dict, IO, List, Set, Tuple
+
+import psycopg2
+from psycopg2.extensions import quote_ident
+
+BATCH_SIZE = 100000
+COPY_BUFFER = 1 << 20
+# Same limits as interactions/app.py and artworks/app.py
+FEED_FANOUT_LIMIT = int(os.environ.get('FEED_FANOUT_LIMIT', '1000'))
+FEED_BACKFILL = 50
+
+# COPY options that pass each NDJSON line through as a single unquoted field
+NDJSON_COPY = "(FORMAT csv, QUOTE E'\\x01', DELIMITER E'\\x02')"
+FORMATS = {'.csv': 'csv', '.ndjson': 'ndjson', '.jsonl': 'ndjson', '.json': 'ndjson'}
+
+CHUNK = 'r.n > %(lo)s AND r.n <= %(hi)s'
+
+
+def _reference(ref: str, present: Set[str], table: str, natural: str = '') -> Tuple[str, str]:
+    # LEFT JOINs for the reference columns the file has, and the id they resolve to
+    joins, ids = [], []
+    if ref + '_id' in present:
+        joins.append('LEFT JOIN {t} {r}_i ON {r}_i.id = r.{r}_id')
+        ids.append('{r}_i.id')
+    if natural and ref + '_' + natural in present:
+        joins.append('LEFT JOIN {t} {r}_n ON {r}_n.{c} = r.{r}_{c}')
+        ids.append('{r}_n.id')
+    if ref + '_key' in present:
+        joins.append("LEFT JOIN import_keys {r}_m ON {r}_m.entity = '{t}' AND {r}_m.source_key = r.{r}_key "
+                     "LEFT JOIN {t} {r}_k ON {r}_k.id = {r}_m.id")
+        ids.append('{r}_k.id')
+    if not ids:
+        columns = [ref + '_id'] + ([ref + '_' + natural] if natural else []) + [ref + '_key']
+        raise ValueError('no %s reference: the file needs one of %s' % (ref, ', '.join(columns)))
+    expression = ids[0] if len(ids) == 1 else 'COALESCE(%s)' % ', '.join(ids)
+    return (' '.join(joins).format(t=table, r=ref, c=natural), expression.format(r=ref))
+
+
+def _insert_users(present: Set[str]) -> List[str]:
+    statements = ["""
+        INSERT INTO users (email, password_hash, username, avatar_url, bio, role, created_at, updated_at)
+        SELECT r.email, r.password_hash, r.username, r.avatar_url, r.bio, COALESCE(r.role, 'user'),
+            COALESCE(r.created_at, now()), COALESCE(r.created_at, now())
+        FROM bulk_input r
+        WHERE """ + CHUNK + """
+            AND r.email IS NOT NULL AND r.password_hash IS NOT NULL AND r.username IS NOT NULL
+        ON CONFLICT (email) DO NOTHING
+    """]
+    if 'key' in present:
+        # Existing users with the same email take the key too, so later files can point at them
+        statements.append("""
+            INSERT INTO import_keys (entity, source_key, id)
+            SELECT 'users', r.key, u.id
+            FROM bulk_input r JOIN users u ON u.email = r.email
+            WHERE """ + CHUNK + """ AND r.key IS NOT NULL
+            ON CONFLICT DO NOTHING
+        """)
+    return statements
+
+
+def _insert_artworks(present: Set[str]) -> List[str]:
+    joins, user_id = _reference('user', present, 'users', 'email')
+    return ["""
+        WITH src AS (
+            SELECT nextval(%(sequence)s::regclass) AS id, r.key, """ + user_id + """ AS user_id,
+                r.title, r.description, r.image_url, r.tags, COALESCE(r.created_at, now()) AS created_at
+            FROM bulk_input r """ + joins + """
+            WHERE """ + CHUNK + """ AND r.title IS NOT NULL AND r.image_url IS NOT NULL
+                AND NOT EXISTS (SELECT 1 FROM import_keys x WHERE x.entity = 'artworks' AND x.source_key = r.key)
+        ),
+        ins AS (
+            INSERT INTO artworks (id, user_id, title, description, image_url, tags, created_at, updated_at)
+            SELECT id, user_id, title, description, image_url, tags, created_at, created_at
+            FROM src WHERE user_id IS NOT NULL
+            RETURNING id
+        ),
+        keys AS (
+            INSERT INTO import_keys (entity, source_key, id)
+            SELECT 'artworks', src.key, src.id FROM src JOIN ins ON ins.id = src.id
+            WHERE src.key IS NOT NULL
+            ON CONFLICT DO NOTHING
+        )
+        INSERT INTO bulk_touched (a) SELECT id FROM ins
+    """]
+
+
+def _insert_interactions(table: str, extra: str, conflict: str, present: Set[str]) -> List[str]:
+    artwork_joins, artwork_id = _reference('artwork', present, 'artworks')
+    user_joins, user_id = _reference('user', present, 'users', 'email')
+    required = ' AND r.comment_text IS NOT NULL' if extra else ''
+    return ["""
+        WITH ins AS (
+            INSERT INTO """ + table + """ (artwork_id, user_id, """ + extra + """created_at)
+            SELECT s.artwork_id, s.user_id, """ + extra + """s.created_at
+            FROM (
+                SELECT """ + artwork_id + """ AS artwork_id, """ + user_id + """ AS user_id,
+                    """ + (('r.' + extra) if extra else '') + """COALESCE(r.created_at, now()) AS created_at
+                FROM bulk_input r """ + artwork_joins + ' ' + user_joins + """
+                WHERE """ + CHUNK + required + """
+            ) s
+            WHERE s.artwork_id IS NOT NULL AND s.user_id IS NOT NULL
+            """ + conflict + """
+            RETURNING artwork_id
+        )
+        INSERT INTO bulk_touched (a) SELECT artwork_id FROM ins
+    """]
+
+
+def _insert_follows(present: Set[str]) -> List[str]:
+    follower_joins, follower_id = _reference('follower', present, 'users', 'email')
+    following_joins, following_id = _reference('following', present, 'users', 'email')
+    return ["""
+        WITH ins AS (
+            INSERT INTO user_follows (follower_id, following_id, created_at)
+            SELECT s.follower_id, s.following_id, s.created_at
+            FROM (
+                SELECT """ + follower_id + """ AS follower_id, """ + following_id + """ AS following_id,
+                    COALESCE(r.created_at, now()) AS created_at
+                FROM bulk_input r """ + follower_joins + ' ' + following_joins + """
+                WHERE """ + CHUNK + """
+            ) s
+            WHERE s.follower_id IS NOT NULL AND s.following_id IS NOT NULL AND s.follower_id <> s.following_id
+            ON CONFLICT (follower_id, following_id) DO NOTHING
+            RETURNING follower_id, following_id
+        )
+        INSERT INTO bulk_touched (a, b) SELECT follower_id, following_id FROM ins
+    """]
+
+
+ARTWORK_COUNTER = """
+    UPDATE artworks a SET {column} = a.{column} + d.n,
+        hot_score = a.hot_score + artwork_hot_score({likes}, {comments}, a.created_at)
+    FROM (SELECT a AS id, COUNT(*)::int AS n FROM bulk_touched GROUP BY a) d
+    WHERE a.id = d.id
+"""
+
+STALE_ARTWORKS = """
+    INSERT INTO cache_invalidations (tag)
+    SELECT 'artworks' UNION ALL SELECT 'tag_counts:artworks'
+    UNION ALL SELECT DISTINCT 'gallery:' || a.user_id FROM bulk_touched t JOIN artworks a ON a.id = t.a
+"""
+
+STALE_INTERACTIONS = """
+    INSERT INTO cache_invalidations (tag)
+    SELECT 'artworks'
+    UNION ALL SELECT DISTINCT 'artwork:' || t.a FROM bulk_touched t
+    UNION ALL SELECT DISTINCT 'gallery:' || a.user_id FROM bulk_touched t JOIN artworks a ON a.id = t.a
+"""
+
+# Per kind: target table, input columns, per-batch inserts, statements run once
+# after the last batch and the export query ({where} takes the --since filter)
+KINDS: Dict[str, Dict[str, Any]] = {
+    'users': {
+        'table': 'users',
+        'columns': (('key', 'text'), ('email', 'text'), ('password_hash', 'text'), ('username', 'text'),
+                    ('avatar_url', 'text'), ('bio', 'text'), ('role', 'text'), ('created_at', 'timestamp')),
+        'insert': _insert_users,
+        'finish': (),
+        'export': """
+            SELECT u.id AS key, u.email, {password_hash}u.username, u.avatar_url, u.bio, u.role, u.created_at
+            FROM users u {where}
+        """,
+        'since': 'u.created_at',
+    },
+    'artworks': {
+        'table': 'artworks',
+        'columns': (('key', 'text'), ('user_id', 'integer'), ('user_email', 'text'), ('user_key', 'text'),
+                    ('title', 'text'), ('description', 'text'), ('image_url', 'text'), ('tags', 'text[]'),
+                    ('created_at', 'timestamp')),
+        'insert': _insert_artworks,
+        'finish': (
+            # The tag count trigger stands down while arthub.bulk_import is on
+            """
+            INSERT INTO tag_counts (scope, tag, count)
+            SELECT 'artworks', tag, COUNT(*)
+            FROM (SELECT DISTINCT a.id, unnest(a.tags) AS tag FROM bulk_touched t JOIN artworks a ON a.id = t.a) s
+            GROUP BY tag
+            ON CONFLICT (scope, tag) DO UPDATE SET count = tag_counts.count + EXCLUDED.count
+            """,
+            # Push the newest imported artworks of each artist below the limit, as a follow would backfill them
+            """
+            INSERT INTO artwork_feed (user_id, artwork_id, author_id, created_at)
+            SELECT f.follower_id, n.id, n.user_id, n.created_at
+            FROM (
+                SELECT a.id, a.user_id, a.created_at,
+                    row_number() OVER (PARTITION BY a.user_id ORDER BY a.created_at DESC, a.id DESC) AS rank
+                FROM bulk_touched t JOIN artworks a ON a.id = t.a
+            ) n
+            JOIN users p ON p.id = n.user_id AND p.followers_count < %(fanout_limit)s
+            JOIN user_follows f ON f.following_id = n.user_id
+            WHERE n.rank <= %(backfill)s
+            ON CONFLICT DO NOTHING
+            """,
+            STALE_ARTWORKS,
+        ),
+        'export': """
+            SELECT a.id AS key, u.email AS user_email, a.title, a.description, a.image_url, a.tags, a.created_at
+            FROM artworks a JOIN users u ON u.id = a.user_id {where}
+        """,
+        'since': 'a.created_at',
+    },
+    'likes': {
+        'table': 'artwork_likes',
+        'columns': (('artwork_id', 'integer'), ('artwork_key', 'text'), ('user_id', 'integer'),
+                    ('user_email', 'text'), ('user_key', 'text'), ('created_at', 'timestamp')),
+        'insert': lambda present: _insert_interactions(
+            'artwork_likes', '', 'ON CONFLICT (artwork_id, user_id) DO NOTHING', present),
+        'finish': (
+            ARTWORK_COUNTER.format(column='likes_count', likes='d.n', comments='0'),
+            STALE_INTERACTIONS,
+        ),
+        'export': """
+            SELECT l.artwork_id AS artwork_key, u.email AS user_email, l.created_at
+            FROM artwork_likes l JOIN users u ON u.id = l.user_id {where}
+        """,
+        'since': 'l.created_at',
+    },
+    'comments': {
+        'table': 'artwork_comments',
+        'columns': (('artwork_id', 'integer'), ('artwork_key', 'text'), ('user_id', 'integer'),
+                    ('user_email', 'text'), ('user_key', 'text'), ('comment_text', 'text'),
+                    ('created_at', 'timestamp')),
+        'insert': lambda present: _insert_interactions('artwork_comments', 'comment_text, ', '', present),
+        'finish': (
+            ARTWORK_COUNTER.format(column='comments_count', likes='0', comments='d.n'),
+            STALE_INTERACTIONS,
+        ),
+        'export': """
+            SELECT c.artwork_id AS artwork_key, u.email AS user_email, c.comment_text, c.created_at
+            FROM artwork_comments c JOIN users u ON u.id = c.user_id {where}
+        """,
+        'since': 'c.created_at',
+    },
+    'follows': {
+        'table': 'user_follows',
+        'columns': (('follower_id', 'integer'), ('follower_email', 'text'), ('follower_key', 'text'),
+                    ('following_id', 'integer'), ('following_email', 'text'), ('following_key', 'text'),
+                    ('created_at', 'timestamp')),
+        'insert': _insert_follows,
+        'finish': (
+            """
+            UPDATE users u SET followers_count = u.followers_count + d.n
+            FROM (SELECT b AS id, COUNT(*)::int AS n FROM bulk_touched GROUP BY b) d
+            WHERE u.id = d.id
+            """,
+            # Same backfill as interactions/app.py _record_follows
+            """
+            INSERT INTO artwork_feed (user_id, artwork_id, author_id, created_at)
+            SELECT t.a, recent.id, recent.user_id, recent.created_at
+            FROM bulk_touched t
+            JOIN users p ON p.id = t.b AND p.followers_count < %(fanout_limit)s
+            CROSS JOIN LATERAL (
+                SELECT id, user_id, created_at FROM artworks
+                WHERE user_id = t.b
+                ORDER BY created_at DESC, id DESC
+                LIMIT %(backfill)s
+            ) recent
+            ON CONFLICT DO NOTHING
+            """,
+            # Feed pages are cached under 'artworks' as well as feed:<viewer>
+            "INSERT INTO cache_invalidations (tag) VALUES ('artworks')",
+        ),
+        'export': """
+            SELECT f.email AS follower_email, g.email AS following_email, uf.created_at
+            FROM user_follows uf JOIN users f ON f.id = uf.follower_id JOIN users g ON g.id = uf.following_id {where}
+        """,
+        'since': 'uf.created_at',
+    },
+}
+
+
+def detect_format(path: str, requested: str) -> str:
+    if requested:
+        return requested
+    name = path[:-3] if path.endswith('.gz') else path
+    fmt = FORMATS.get(os.path.splitext(name)[1].lower())
+    if fmt is None:
+        raise ValueError('cannot tell the format of %s: pass --format csv or ndjson' % path)
+    return fmt
+
+
+def open_stream(path: str, mode: str) -> IO[bytes]:
+    if path == '-':
+        return sys.stdin.buffer if mode == 'rb' else sys.stdout.buffer
+    if path.endswith('.gz'):
+        return gzip.open(path, mode, compresslevel=6) if mode == 'wb' else gzip.open(path, mode)
+    return open(path, mode)
+
+
+def _load(cur: Any, spec: Dict[str, Any], stream: IO[bytes], fmt: str) -> Set[str]:
+    names = [name for name, _ in spec['columns']]
+    if fmt == 'csv':
+        header = stream.readline().decode('utf-8-sig').rstrip('\r\n')
+        columns = next(csv.reader([header]), [])
+        unknown = [column for column in columns if column not in names]
+        if not columns or unknown:
+            raise ValueError('CSV header must name columns out of %s (got %s)' % (', '.join(names), header or 'nothing'))
+        cur.copy_expert('COPY bulk_input (%s) FROM STDIN WITH (FORMAT csv)' % ', '.join(columns), stream, size=COPY_BUFFER)
+        return set(columns)
+
+    cur.copy_expert('COPY bulk_docs (doc) FROM STDIN WITH ' + NDJSON_COPY, stream, size=COPY_BUFFER)
+    cur.execute("SELECT DISTINCT jsonb_object_keys(doc) FROM bulk_docs WHERE jsonb_typeof(doc) = 'object'")
+    present = {row[0] for row in cur.fetchall()}.intersection(names)
+    if present:
+        columns = ', '.join(name for name in names if name in present)
+        cur.execute("""
+            INSERT INTO bulk_input ({columns})
+            SELECT {selected} FROM bulk_docs d, jsonb_populate_record(NULL::bulk_input, d.doc) r
+            WHERE jsonb_typeof(d.doc) = 'object'
+            ORDER BY d.n
+        """.format(columns=columns, selected=', '.join('r.' + name for name in names if name in present)))
+    cur.execute('TRUNCATE bulk_docs')
+    return present
+
+
+def _drop_indexes(cur: Any, table: str) -> List[Tuple[str, str]]:
+    # Primary keys and unique constraints stay: ON CONFLICT and the reference joins need them
+    cur.execute("""
+        SELECT i.relname, pg_get_indexdef(x.indexrelid)
+        FROM pg_index x JOIN pg_class i ON i.oid = x.indexrelid
+        WHERE x.indrelid = %s::regclass
+            AND NOT EXISTS (SELECT 1 FROM pg_constraint c WHERE c.conindid = x.indexrelid)
+    """, (table,))
+    indexes = cur.fetchall()
+    for name, _ in indexes:
+        cur.execute('DROP INDEX ' + quote_ident(name, cur))
+    return indexes
+
+
+def import_file(conn: Any, kind: str, stream: IO[bytes], fmt: str, batch_size: int,
+                rebuild_indexes: bool, work_mem: str, log: Callable[[str], None]) -> Dict[str, Any]:
+    spec = KINDS[kind]
+    started = time.perf_counter()
+    with conn.cursor() as cur:
+        cur.execute("SET LOCAL arthub.bulk_import = 'on'")
+        cur.execute('SET LOCAL work_mem = %s', (work_mem,))
+        cur.execute('SET LOCAL maintenance_work_mem = %s', (work_mem,))
+        cur.execute('CREATE TEMP TABLE bulk_input (n BIGSERIAL, %s) ON COMMIT DROP'
+                    % ', '.join('%s %s' % column for column in spec['columns']))
+        cur.execute('CREATE TEMP TABLE bulk_docs (n BIGSERIAL, doc jsonb) ON COMMIT DROP')
+        cur.execute('CREATE TEMP TABLE bulk_touched (a integer, b integer) ON COMMIT DROP')
+
+        present = _load(cur, spec, stream, fmt)
+        # Temp tables get no autovacuum: without statistics every batch would be planned blind
+        cur.execute('CREATE INDEX ON bulk_input (n)')
+        cur.execute('ANALYZE bulk_input')
+        cur.execute('SELECT COUNT(*), COALESCE(MAX(n), 0) FROM bulk_input')
+        rows, last = cur.fetchone()
+        load_s = time.perf_counter() - started
+        log('%s: loaded %d rows in %.1fs (%d rows/s)' % (kind, rows, load_s, rows / max(load_s, 1e-9)))
+
+        indexes = _drop_indexes(cur, spec['table']) if rebuild_indexes else []
+        statements = spec['insert'](present)
+        params = {'lo': 0, 'hi': 0, 'fanout_limit': FEED_FANOUT_LIMIT, 'backfill': FEED_BACKFILL}
+        if kind == 'artworks':
+            cur.execute("SELECT pg_get_serial_sequence('artworks', 'id')")
+            params['sequence'] = cur.fetchone()[0]
+
+        inserted = 0
+        for lo in range(0, last, batch_size):
+            params.update(lo=lo, hi=lo + batch_size)
+            for position, statement in enumerate(statements):
+                cur.execute(statement, params)
+                if position == 0:
+                    inserted += cur.rowcount
+            elapsed = time.perf_counter() - started
+            log('%s: %d/%d rows, %d inserted, %d rows/s' % (
+                kind, min(lo + batch_size, last), last, inserted, min(lo + batch_size, last) / max(elapsed, 1e-9)))
+
+        for _, definition in indexes:
+            cur.execute(definition)
+        finish_started = time.perf_counter()
+        for statement in spec['finish']:
+            cur.execute(statement, params)
+        finish_s = time.perf_counter() - finish_started
+    conn.commit()
+
+    with conn.cursor() as cur:
+        cur.execute('ANALYZE ' + spec['table'])
+    conn.commit()
+    elapsed = time.perf_counter() - started
+    return {
+        'kind': kind,
+        'read': rows,
+        'inserted': inserted,
+        'skipped': rows - inserted,
+        'indexes_rebuilt': len(indexes),
+        'load_s': round(load_s, 3),
+        'finish_s': round(finish_s, 3),
+        'seconds': round(elapsed, 3),
+        'rows_per_s': round(rows / max(elapsed, 1e-9)),
+    }
+
+
+def export_file(conn: Any, kind: str, stream: IO[bytes], fmt: str, since: str, password_hashes: bool) -> Dict[str, Any]:
+    spec = KINDS[kind]
+    started = time.perf_counter()
+    with conn.cursor() as cur:
+        where = cur.mogrify('WHERE %s >= %%s' % spec['since'], (since,)).decode() if since else ''
+        query = spec['export'].format(where=where, password_hash='u.password_hash, ' if password_hashes else '')
+        if fmt == 'csv':
+            cur.copy_expert('COPY (%s) TO STDOUT WITH (FORMAT csv, HEADER)' % query, stream, size=COPY_BUFFER)
+        else:
+            cur.copy_expert('COPY (SELECT row_to_json(t)::text FROM (%s) t) TO STDOUT WITH %s' % (query, NDJSON_COPY),
+                            stream, size=COPY_BUFFER)
+        rows = cur.rowcount
+    conn.rollback()
+    elapsed = time.perf_counter() - started
+    return {
+        'kind': kind,
+        'exported': rows,
+        'seconds': round(elapsed, 3),
+        'rows_per_s': round(rows / max(elapsed, 1e-9)) if rows >= 0 else None,
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('mode', choices=('import', 'export'))
+    parser.add_argument('kind', choices=tuple(KINDS))
+    parser.add_argument('path', help='.csv, .ndjson or .jsonl file, optionally .gz; - for stdin/stdout')
+    parser.add_argument('--format', choices=('csv', 'ndjson'), help='needed with - or another file extension')
+    parser.add_argument('--dsn', default=os.environ.get('DATABASE_URL'))
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE, help='rows resolved and inserted per statement')
+    parser.add_argument('--work-mem', default='256MB', help='work_mem and maintenance_work_mem for the import')
+    parser.add_argument('--rebuild-indexes', action='store_true',
+                        help='drop secondary indexes of the target table and rebuild them once (locks the table)')
+    parser.add_argument('--since', help='export only rows created at or after this timestamp')
+    parser.add_argument('--with-password-hashes', action='store_true', help='include password_hash in users exports')
+    args = parser.parse_args()
+
+    if not args.dsn:
+        parser.error('--dsn or DATABASE_URL is required')
+    if args.batch_size < 1:
+        parser.error('--batch-size must be at least 1')
+
+    def log(line: str) -> None:
+        print(line, file=sys.stderr, flush=True)
+
+    try:
+        fmt = detect_format(args.path, args.format)
+    except ValueError as e:
+        parser.error(str(e))
+
+    conn = psycopg2.connect(args.dsn)
+    try:
+        stream = open_stream(args.path, 'rb' if args.mode == 'import' else 'wb')
+        try:
+            if args.mode == 'import':
+                result = import_file(conn, args.kind, stream, fmt, args.batch_size,
+                                     args.rebuild_indexes, args.work_mem, log)
+            else:
+                result = export_file(conn, args.kind, stream, fmt, args.since, args.with_password_hashes)
+        finally:
+            if args.path != '-':
+                stream.close()
+            else:
+                stream.flush()
+    except (ValueError, psycopg2.DataError) as e:
+        conn.rollback()
+        log('%s: %s' % (args.kind, str(e).strip()))
+        return 1
+    finally:
+        conn.close()
+
+    log(' '.join('%s=%s' % item for item in result.items()))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())